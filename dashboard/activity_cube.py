@@ -0,0 +1,104 @@
+from typing import Dict, Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dashboard.episode_store import NULL_DAY
+
+
+def popcount(words: np.ndarray) -> np.ndarray:
+    """Set bits per row of a 2-D uint64 array"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(words).sum(axis=-1, dtype=np.int64)
+    # numpy < 2.0
+    return np.unpackbits(words.view(np.uint8), axis=-1).sum(axis=-1, dtype=np.int64)
+
+
+class ActivityCube:
+    """
+    Month-bucketed bitsets of active drugs, per value of each category column.
+
+    bits[column] has shape (values, months, words): bit d of [v, m] is set when
+    drug d has a row with that category value whose first..last update range
+    touches month m. A date-range query ORs the months it covers and popcounts,
+    so its cost depends on months x drugs/64, never on the number of rows.
+    Ranges are resolved to whole months. Rows missing either date have no range:
+    they are kept in undated[column] and only counted when no dates are given.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: Iterable[str], id_column: str = 'drug_identifier',
+                 first_column: str = 'first_update_date', last_column: str = 'last_update_date'):
+        drug_codes, drugs = pd.factorize(df[id_column])
+        self.n_drugs = len(drugs)
+        n_words = max(1, (self.n_drugs + 63) // 64)
+
+        first_month, first_known = self._month_number(df[first_column])
+        last_month, last_known = self._month_number(df[last_column])
+        dated = first_known & last_known
+        self.base_month = int(first_month[dated].min()) if dated.any() else 0
+        self.n_months = int(last_month[dated].max()) - self.base_month + 1 if dated.any() else 0
+        first_month = first_month - self.base_month
+        last_month = np.maximum(last_month - self.base_month, first_month)
+
+        # One entry per (dated row, active month)
+        spans = np.where(dated, last_month - first_month + 1, 0)
+        rows = np.repeat(np.arange(len(df)), spans)
+        month_offset = np.arange(len(rows)) - np.repeat(np.cumsum(spans) - spans, spans)
+        months = first_month[rows] + month_offset
+        drug_rows = drug_codes[rows]
+        words = drug_rows // 64
+        masks = np.left_shift(np.uint64(1), (drug_rows % 64).astype(np.uint64))
+
+        undated_rows = np.flatnonzero(~dated)
+        undated_drugs = drug_codes[undated_rows]
+        undated_masks = np.left_shift(np.uint64(1), (undated_drugs % 64).astype(np.uint64))
+
+        self.values: Dict[str, pd.Index] = {}
+        self.bits: Dict[str, np.ndarray] = {}
+        self.undated: Dict[str, np.ndarray] = {}
+        for column in columns:
+            value_codes, values = pd.factorize(df[column], sort=True)
+            bits = np.zeros((len(values), self.n_months, n_words), dtype=np.uint64)
+            np.bitwise_or.at(bits, (value_codes[rows], months, words), masks)
+            undated = np.zeros((len(values), n_words), dtype=np.uint64)
+            np.bitwise_or.at(undated, (value_codes[undated_rows], undated_drugs // 64), undated_masks)
+            self.values[column] = values
+            self.bits[column] = bits
+            self.undated[column] = undated
+
+    @staticmethod
+    def _month_number(dates: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+        """Months since year 0 and whether each date is known; unknown ones get month 0"""
+        if pd.api.types.is_integer_dtype(dates.dtype):
+            # int32 day numbers from EpisodeStore, NULL_DAY where missing
+            days = dates.to_numpy(dtype=np.int64)
+            days = np.where(days == NULL_DAY, np.iinfo(np.int64).min, days)
+            dates = pd.Series(days.astype('datetime64[D]'))
+        dates = pd.to_datetime(dates)
+        known = dates.notna().to_numpy()
+        months = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.float64, na_value=0)
+        return months.astype(np.int64), known
+
+    def _month_index(self, date) -> int:
+        date = pd.Timestamp(date)
+        return date.year * 12 + date.month - 1 - self.base_month
+
+    @property
+    def nbytes(self) -> int:
+        return sum(bits.nbytes for bits in self.bits.values()) + sum(bits.nbytes for bits in self.undated.values())
+
+    def counts(self, column: str, start_date=None, end_date=None) -> pd.Series:
+        """
+        Distinct active drugs per value of `column` between start_date and end_date.
+        With neither date given, drugs whose rows have no date range count too.
+        """
+        bits = self.bits[column]
+        if start_date is None and end_date is None:
+            active = np.bitwise_or.reduce(bits, axis=1) | self.undated[column]
+            return pd.Series(popcount(active), index=self.values[column], dtype=np.int64)
+        start = 0 if start_date is None else max(self._month_index(start_date), 0)
+        end = self.n_months - 1 if end_date is None else min(self._month_index(end_date), self.n_months - 1)
+        if start > end:
+            return pd.Series(0, index=self.values[column], dtype=np.int64)
+        active = np.bitwise_or.reduce(bits[:, start:end + 1], axis=1)
+        return pd.Series(popcount(active), index=self.values[column], dtype=np.int64)
@@ -2,26 +2,52 @@ import dash
 from dash import dcc, html, Input, Output, callback
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.colors import hex_to_rgb
 import pandas as pd
 import numpy as np
 import os
 import sys
-from supabase import create_client, Client, ClientOptions
+import threading
+import time
 from dotenv import load_dotenv
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.activity_cube import ActivityCube
+from dashboard.episode_store import EpisodeStore
+from dashboard.snapshot import PeriodicRefresher, open_snapshot, publish_lock, publish_snapshot, read_manifest
+from dashboard.survival import KMCurveCache, grouped_kaplan_meier, logrank_test
+from etl.storage import StorageBackend, get_backend
+
 # Load environment variables
 load_dotenv()
 
-# Initialize Supabase
-supabase_url = os.getenv("SUPABASE_URL")
-supabase_key = os.getenv("SUPABASE_ANON_KEY")
-if not supabase_url or not supabase_key:
-    raise RuntimeError("Missing SUPABASE_URL or SUPABASE_ANON_KEY in environment variables")
-supabase = create_client(
-    supabase_url,
-    supabase_key,
-    options=ClientOptions(postgrest_client_timeout=30)
-)
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MART_TABLES = ['mart_shortage_characteristics', 'mart_shortage_survival']
+# Both marts are held dictionary-encoded: categorical strings, int32 day-number dates
+MART_CATEGORIES = ['drug_identifier', 'route_category', 'single_source']
+CHARACTERISTICS_DATES = ['first_update_date', 'last_update_date']
+# One row per (drug_identifier, route_category, single_source), so that order is unique
+CHARACTERISTICS_COLUMNS = MART_CATEGORIES + CHARACTERISTICS_DATES
+SURVIVAL_DATES = ['shortage_start_date', 'resolution_date']
+# One row per shortage episode, so a drug can have several; paged, as it outgrows one PostgREST response
+SURVIVAL_COLUMNS = ['drug_identifier', 'route_category', 'single_source', 'episode_number',
+                    'shortage_start_date', 'resolution_date', 'resolved', 'duration_days']
+SURVIVAL_ORDER = ['drug_identifier', 'route_category', 'single_source', 'episode_number']
+# Versioned Arrow copies of both marts, memory-mapped by every worker, so startup
+# never waits on the database and N workers share one copy of the data
+SNAPSHOT_DIR = os.getenv("DASH_SNAPSHOT_DIR", os.path.join(PROJECT_DIR, 'cache', 'dashboard'))
+# Seconds between background refreshes from storage; 0 disables refreshing
+REFRESH_SECONDS = float(os.getenv("DASH_REFRESH_SECONDS", 3600))
+
+# Storage backend (STORAGE_BACKEND), created on first use so a warm start needs no network
+_storage = None
+
+
+def get_storage() -> StorageBackend:
+    global _storage
+    if _storage is None:
+        _storage = get_backend(read_only=True)
+    return _storage
 
 
 def normalize_single_source(x):
@@ -35,8 +61,7 @@ def normalize_single_source(x):
 
 def load_characteristics_data():
     try:
-        result = supabase.table('mart_shortage_characteristics').select('*').execute()
-        df = pd.DataFrame(result.data)
+        df = get_storage().fetch('mart_shortage_characteristics', CHARACTERISTICS_COLUMNS, order_by=MART_CATEGORIES)
         if not df.empty:
             df['first_update_date'] = pd.to_datetime(df['first_update_date'])
             df['last_update_date'] = pd.to_datetime(df['last_update_date'])
@@ -48,10 +73,16 @@ def load_characteristics_data():
         return pd.DataFrame()
 
 
+def build_characteristics_cube(chars):
+    """Month x category bitsets of active drugs, so pie chart date filters never rescan rows"""
+    if chars.empty:
+        return None
+    return ActivityCube(chars.frame, ['route_category', 'single_source'])
+
+
 def load_survival_data():
     try:
-        result = supabase.table('mart_shortage_survival').select('*').execute()
-        df = pd.DataFrame(result.data)
+        df = get_storage().fetch('mart_shortage_survival', SURVIVAL_COLUMNS, order_by=SURVIVAL_ORDER)
         if not df.empty:
             df['duration_days'] = pd.to_numeric(df['duration_days'], errors='coerce')
             # Drop rows with invalid durations
@@ -64,102 +95,194 @@ def load_survival_data():
         return pd.DataFrame()
 
 
-def kaplan_meier(durations, events):
-    """Compute Kaplan-Meier survival curve. Returns (times, survival_probs)."""
-    df = pd.DataFrame({'t': durations, 'e': events}).sort_values('t')
-    times = sorted(df['t'].unique())
-    n = len(df)
-    surv = 1.0
-    km_times = [0]
-    km_surv = [1.0]
-    for t in times:
-        at_risk = n
-        events_at_t = int(df[(df['t'] == t) & (df['e'] == True)].shape[0])
-        censored_at_t = int(df[(df['t'] == t) & (df['e'] == False)].shape[0])
-        if at_risk > 0 and events_at_t > 0:
-            surv *= (1 - events_at_t / at_risk)
-        km_times.append(t)
-        km_surv.append(surv)
-        n -= (events_at_t + censored_at_t)
-    return km_times, km_surv
-
-
-# Load data
-print("Loading data...", file=sys.stderr)
-chars_df = load_characteristics_data()
-survival_df = load_survival_data()
-print(f"Loaded {len(chars_df)} characteristics, {len(survival_df)} survival rows", file=sys.stderr)
+class DashboardData:
+    """
+    Everything the callbacks read, built completely before it is published.
+    Refreshes swap the module-level `data` reference in one assignment, and each
+    callback reads that reference once, so a callback never mixes old and new data.
+    """
+
+    def __init__(self, chars_df, survival_df, version, loaded_at):
+        self.chars = EpisodeStore(chars_df, MART_CATEGORIES, CHARACTERISTICS_DATES)
+        self.chars_cube = build_characteristics_cube(self.chars)
+        self.survival = EpisodeStore(survival_df, MART_CATEGORIES, SURVIVAL_DATES)
+        self.version = version
+        self.loaded_at = loaded_at
+
+
+# Full KM curves per (data version, grouping); "Max Days" only truncates them for display
+km_cache = KMCurveCache(max_entries=8)
+_swap_lock = threading.Lock()
+data = None
+# How often each worker looks for a version published by another worker
+POLL_SECONDS = min(REFRESH_SECONDS, 60)
+
+
+def publish_data(chars_df, survival_df, version, loaded_at):
+    global data
+    with _swap_lock:
+        data = DashboardData(chars_df, survival_df, version, loaded_at)
+    km_cache.invalidate()
+
+
+def adopt_snapshot():
+    """Serve the latest published version if it is newer than ours; True if one was adopted"""
+    snapshot = open_snapshot(SNAPSHOT_DIR, MART_TABLES)
+    if snapshot is None or (data is not None and snapshot.version <= data.version):
+        return False
+    publish_data(snapshot.frames['mart_shortage_characteristics'], snapshot.frames['mart_shortage_survival'],
+                 snapshot.version, snapshot.published_at)
+    print(f"Serving snapshot v{snapshot.version} ({time.time() - snapshot.published_at:.0f}s old)", file=sys.stderr)
+    return True
+
+
+def reload_data():
+    """
+    Reload both marts from storage (STORAGE_BACKEND) and publish them as a new shared
+    version. A load that comes back empty keeps whatever is already being served.
+    """
+    chars_df = load_characteristics_data()
+    survival_df = load_survival_data()
+    print(f"Loaded {len(chars_df)} characteristics, {len(survival_df)} survival rows", file=sys.stderr)
+    if chars_df.empty or survival_df.empty:
+        if data is None:
+            # Nothing to serve yet; run on these frames until a load succeeds
+            publish_data(chars_df, survival_df, version=0, loaded_at=time.time())
+        else:
+            print("Refresh returned no data; keeping the current data", file=sys.stderr)
+        return
+    # Published already encoded, so snapshots stay small and load without re-encoding
+    publish_snapshot(SNAPSHOT_DIR, {
+        'mart_shortage_characteristics': EpisodeStore(chars_df, MART_CATEGORIES, CHARACTERISTICS_DATES).frame,
+        'mart_shortage_survival': EpisodeStore(survival_df, MART_CATEGORIES, SURVIVAL_DATES).frame,
+    })
+    adopt_snapshot()
+
+
+def refresh_tick():
+    """Adopt a version another worker published, or refresh from storage once the current one is stale"""
+    if adopt_snapshot():
+        return
+    manifest = read_manifest(SNAPSHOT_DIR)
+    if manifest is not None and time.time() - manifest['published_at'] < REFRESH_SECONDS:
+        return
+    # One worker refreshes; the rest adopt its version on a later tick
+    with publish_lock(SNAPSHOT_DIR) as acquired:
+        if acquired and not adopt_snapshot():
+            reload_data()
+
+
+# Warm start from the shared snapshot; only when there is none does one worker load from storage
+if not adopt_snapshot():
+    with publish_lock(SNAPSHOT_DIR, blocking=True):
+        if not adopt_snapshot():
+            print("Loading data...", file=sys.stderr)
+            reload_data()
+
+if REFRESH_SECONDS > 0:
+    PeriodicRefresher(refresh_tick, interval=POLL_SECONDS, initial_delay=0).start()
+
+
+def count_drugs(survival, group_by):
+    """Distinct drug_identifiers per group; a drug with recurring shortages has several episodes"""
+    groups = survival.codes(group_by).astype(np.int64)
+    drugs = survival.codes('drug_identifier').astype(np.int64)
+    width = len(survival.categories('drug_identifier')) + 1
+    pairs = np.unique(groups[groups >= 0] * width + drugs[groups >= 0] + 1)
+    counts = np.bincount(pairs // width, minlength=len(survival.categories(group_by)))
+    return dict(zip(survival.categories(group_by), counts.tolist()))
+
+
+def compute_km_curves(survival, group_by):
+    """
+    Curves over the full follow-up for every group with at least 2 episodes, the
+    log-rank p-value and the number of drugs behind each group's episodes
+    """
+    df = survival.frame
+    curves = grouped_kaplan_meier(df['duration_days'].values, df['resolved'].values, df[group_by].values)
+    curves = {group: curve for group, curve in curves.items() if curve.n >= 2}
+    kept = df[survival.isin(group_by, curves)]
+    _, _, p_value = logrank_test(kept['duration_days'].values, kept['resolved'].values, kept[group_by].values)
+    return curves, p_value, count_drugs(survival, group_by)
 
 # Initialize the Dash app
 app = dash.Dash(__name__, suppress_callback_exceptions=True)
 
-# Layout
-app.layout = html.Div(className='container', children=[
-    # Pie Chart
-    html.Div(className='section', children=[
-        html.H2("Shortage Drug Characteristics"),
-        html.Div(style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px', 'flexWrap': 'wrap'}, children=[
-            html.Div(children=[
-                html.Label("View By"),
-                dcc.Dropdown(
-                    id='pie-chart-category',
-                    options=[
-                        {'label': 'Route Category', 'value': 'route_category'},
-                        {'label': 'Single Source', 'value': 'single_source'}
-                    ],
-                    value='route_category',
-                    clearable=False,
-                    style={'width': '300px', 'fontSize': '13px'}
-                )
+
+def serve_layout():
+    # Rebuilt per page load, so date bounds follow the latest refresh
+    chars = data.chars
+    first_date = chars.min_date('first_update_date') if not chars.empty else None
+    last_date = chars.max_date('last_update_date') if not chars.empty else None
+    return html.Div(className='container', children=[
+        # Pie Chart
+        html.Div(className='section', children=[
+            html.H2("Shortage Drug Characteristics"),
+            html.Div(style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px', 'flexWrap': 'wrap'}, children=[
+                html.Div(children=[
+                    html.Label("View By"),
+                    dcc.Dropdown(
+                        id='pie-chart-category',
+                        options=[
+                            {'label': 'Route Category', 'value': 'route_category'},
+                            {'label': 'Single Source', 'value': 'single_source'}
+                        ],
+                        value='route_category',
+                        clearable=False,
+                        style={'width': '300px', 'fontSize': '13px'}
+                    )
+                ]),
+                html.Div(children=[
+                    html.Label("Date Range"),
+                    dcc.DatePickerRange(
+                        id='pie-date-range',
+                        start_date=str(first_date.date()) if first_date is not None else None,
+                        end_date=str(last_date.date()) if last_date is not None else None,
+                        min_date_allowed=str(first_date.date()) if first_date is not None else None,
+                        max_date_allowed=str(last_date.date()) if last_date is not None else None,
+                        display_format='YYYY-MM-DD'
+                    )
+                ])
             ]),
-            html.Div(children=[
-                html.Label("Date Range"),
-                dcc.DatePickerRange(
-                    id='pie-date-range',
-                    start_date=str(chars_df['first_update_date'].min().date()) if not chars_df.empty else None,
-                    end_date=str(chars_df['last_update_date'].max().date()) if not chars_df.empty else None,
-                    min_date_allowed=str(chars_df['first_update_date'].min().date()) if not chars_df.empty else None,
-                    max_date_allowed=str(chars_df['last_update_date'].max().date()) if not chars_df.empty else None,
-                    display_format='YYYY-MM-DD'
-                )
-            ])
+            dcc.Graph(id='pie-chart')
         ]),
-        dcc.Graph(id='pie-chart')
-    ]),
-
-    # Survival (KM) Chart
-    html.Div(className='section', children=[
-        html.H2("Shortage Resolution Survival Curve (Kaplan-Meier)"),
-        html.Div(style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px', 'flexWrap': 'wrap'}, children=[
-            html.Div(children=[
-                html.Label("Group By"),
-                dcc.Dropdown(
-                    id='km-group-by',
-                    options=[
-                        {'label': 'Route Category', 'value': 'route_category'},
-                        {'label': 'Single Source', 'value': 'single_source'}
-                    ],
-                    value='route_category',
-                    clearable=False,
-                    style={'width': '300px', 'fontSize': '13px'}
-                )
+
+        # Survival (KM) Chart
+        html.Div(className='section', children=[
+            html.H2("Shortage Resolution Survival Curve (Kaplan-Meier)"),
+            html.Div(style={'display': 'flex', 'gap': '20px', 'marginBottom': '20px', 'flexWrap': 'wrap'}, children=[
+                html.Div(children=[
+                    html.Label("Group By"),
+                    dcc.Dropdown(
+                        id='km-group-by',
+                        options=[
+                            {'label': 'Route Category', 'value': 'route_category'},
+                            {'label': 'Single Source', 'value': 'single_source'}
+                        ],
+                        value='route_category',
+                        clearable=False,
+                        style={'width': '300px', 'fontSize': '13px'}
+                    )
+                ]),
+                html.Div(children=[
+                    html.Label("Max Days"),
+                    dcc.Input(
+                        id='km-max-days',
+                        type='number',
+                        value=1500,
+                        min=30,
+                        max=5000,
+                        step=30,
+                        style={'width': '100px', 'fontSize': '13px'}
+                    )
+                ])
             ]),
-            html.Div(children=[
-                html.Label("Max Days"),
-                dcc.Input(
-                    id='km-max-days',
-                    type='number',
-                    value=1500,
-                    min=30,
-                    max=5000,
-                    step=30,
-                    style={'width': '100px', 'fontSize': '13px'}
-                )
-            ])
-        ]),
-        dcc.Graph(id='km-chart')
+            dcc.Graph(id='km-chart')
+        ])
     ])
-])
+
+
+app.layout = serve_layout
 
 
 @callback(
@@ -169,22 +292,21 @@ app.layout = html.Div(className='container', children=[
      Input('pie-date-range', 'end_date')]
 )
 def update_pie_chart(category, start_date, end_date):
-    if chars_df.empty:
+    current = data
+    if current.chars.empty:
         fig = go.Figure()
         fig.add_annotation(text='No data available', xref='paper', yref='paper',
                            x=0.5, y=0.5, showarrow=False, font={'size': 16, 'color': '#666'})
         return fig
 
-    filtered = chars_df.copy()
+    # Drugs active in any month of the range: OR of month bitsets, then popcount
     if start_date and end_date:
-        filtered = filtered[
-            (filtered['last_update_date'] >= pd.Timestamp(start_date)) &
-            (filtered['first_update_date'] <= pd.Timestamp(end_date))
-        ]
-
+        counts = current.chars_cube.counts(category, start_date, end_date)
+    else:
+        counts = current.chars_cube.counts(category)
     drug_counts = (
-        filtered.groupby(category)['drug_identifier']
-        .nunique()
+        counts[counts > 0]
+        .rename_axis(category)
         .reset_index(name='count')
         .sort_values('count', ascending=False)
     )
@@ -215,34 +337,51 @@ def update_pie_chart(category, start_date, end_date):
      Input('km-max-days', 'value')]
 )
 def update_km_chart(group_by, max_days):
-    if survival_df.empty:
+    current = data
+    if current.survival.empty:
         fig = go.Figure()
         fig.add_annotation(text='No survival data available', xref='paper', yref='paper',
                            x=0.5, y=0.5, showarrow=False, font={'size': 16, 'color': '#666'})
         return fig
 
     max_days = max_days or 1500
-    df = survival_df[survival_df['duration_days'] <= max_days].copy()
+    curves, p_value, drug_counts = km_cache.get(
+        (current.version, group_by), lambda: compute_km_curves(current.survival, group_by)
+    )
 
     fig = go.Figure()
-    groups = sorted(df[group_by].unique())
+    colors = px.colors.qualitative.Plotly
 
-    for group in groups:
-        group_data = df[df[group_by] == group]
-        if len(group_data) < 2:
-            continue
-        times, surv = kaplan_meier(group_data['duration_days'].values, group_data['resolved'].values)
+    for i, (group, full_curve) in enumerate(curves.items()):
+        # Episodes longer than max_days stay in the risk set; the horizon only limits what is drawn
+        curve = full_curve.truncate(max_days)
+        color = colors[i % len(colors)]
+        median = full_curve.median()
+        median_label = f', median {median:.0f}d' if median is not None else ''
+        # 95% Greenwood band: lower edge, then upper edge filled down to it
+        red, green, blue = hex_to_rgb(color)
+        for bound, fill in ((curve.ci_lower, None), (curve.ci_upper, 'tonexty')):
+            fig.add_trace(go.Scatter(
+                x=curve.times, y=bound,
+                mode='lines', fill=fill, fillcolor=f'rgba({red}, {green}, {blue}, 0.15)',
+                line={'width': 0, 'shape': 'hv'},
+                hoverinfo='skip', showlegend=False, legendgroup=str(group)
+            ))
         fig.add_trace(go.Scatter(
-            x=times, y=surv,
+            x=curve.times, y=curve.survival,
             mode='lines',
-            name=f'{group} (n={len(group_data)})',
-            line={'shape': 'hv'}
+            name=f'{group} (n={full_curve.n} episodes, {drug_counts[group]} drugs{median_label})',
+            line={'shape': 'hv', 'color': color},
+            legendgroup=str(group),
+            customdata=curve.at_risk,
+            hovertemplate='day %{x}: %{y:.3f} (at risk %{customdata})'
         ))
 
     title_label = 'Route Category' if group_by == 'route_category' else 'Single Source Status'
     fig.update_layout(
-        title=f'Time to Shortage Resolution by {title_label} (excl. discontinued)',
+        title=f'Time to Shortage Resolution by {title_label} (excl. discontinued; log-rank p={p_value:.3g})',
         xaxis_title='Days Since Shortage Start',
+        xaxis_range=[0, max_days],
         yaxis_title='Probability Still in Shortage',
         yaxis_range=[0, 1.05],
         height=550,
@@ -255,5 +394,10 @@ def update_km_chart(group_by, max_days):
 
 server = app.server
 
+
+@server.route('/stats/km-cache')
+def km_cache_stats():
+    return km_cache.stats()
+
 if __name__ == '__main__':
     app.run(debug=True, port=8050)
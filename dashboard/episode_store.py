@@ -0,0 +1,171 @@
+from typing import Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Day number stored for a missing date; sorts before every real date
+NULL_DAY = np.iinfo(np.int32).min
+
+
+def to_day_numbers(values) -> np.ndarray:
+    """Dates (strings, datetimes or existing day numbers) as int32 days since 1970-01-01"""
+    if isinstance(values, (pd.Series, pd.Index)) and pd.api.types.is_integer_dtype(values.dtype):
+        return values.to_numpy(dtype=np.int32, na_value=NULL_DAY)
+    dates = pd.to_datetime(pd.Series(values), errors='coerce')
+    days = dates.to_numpy(dtype='datetime64[D]').astype(np.int64)
+    days[dates.isna().to_numpy()] = NULL_DAY
+    return days.astype(np.int32)
+
+
+def from_day_numbers(days) -> np.ndarray:
+    """int32 day numbers back to datetime64[ns], with NaT for NULL_DAY"""
+    days = np.asarray(days)
+    missing = days == NULL_DAY
+    # NULL_DAY is outside the datetime64[ns] range; mask it before converting units
+    dates = np.where(missing, 0, days).astype('datetime64[D]').astype('datetime64[ns]')
+    dates[missing] = np.datetime64('NaT', 'ns')
+    return dates
+
+
+def _fits_int32(values: pd.Series) -> bool:
+    info = np.iinfo(np.int32)
+    return values.empty or (info.min < values.min() and values.max() <= info.max)
+
+
+def _is_int32(dtype) -> bool:
+    # numpy int32 or the Arrow-backed int32 of a mapped snapshot
+    return getattr(dtype, 'numpy_dtype', dtype) == np.int32
+
+
+class EpisodeStore:
+    """
+    Columnar, dictionary-encoded copy of a mart for the dashboards.
+
+    String columns are pandas categoricals (small integer codes plus one sorted
+    copy of each distinct value), dates are int32 day numbers and integer
+    columns are stored as int32. Filters and group keys are computed on the codes and
+    day numbers; readable values are only rebuilt by to_frame() for whatever
+    subset is being drawn.
+
+    A frame that is already encoded (a published snapshot) is adopted as it is:
+    its Arrow-backed columns keep pointing into the memory map rather than being
+    copied into blocks of this process's own.
+    """
+
+    def __init__(self, df: pd.DataFrame, category_columns: Iterable[str] = (),
+                 date_columns: Iterable[str] = ()):
+        self.category_columns = [c for c in category_columns if c in df.columns]
+        self.date_columns = [c for c in date_columns if c in df.columns]
+        columns = {}
+        for column in df.columns:
+            values = df[column]
+            if column in self.category_columns:
+                if not isinstance(values.dtype, pd.CategoricalDtype):
+                    values = pd.Categorical(values.to_numpy(dtype=object, na_value=None))
+                columns[column] = pd.Series(values, copy=False).cat.remove_unused_categories()
+            elif column in self.date_columns and not (_is_int32(values.dtype) and not values.isna().any()):
+                columns[column] = pd.Series(to_day_numbers(values), copy=False)
+            elif (pd.api.types.is_integer_dtype(values.dtype) and not _is_int32(values.dtype)
+                  and not values.isna().any() and _fits_int32(values)):
+                # int32, not smaller, so sums over codes cannot overflow
+                columns[column] = pd.Series(values.to_numpy(dtype=np.int32), copy=False)
+            else:
+                columns[column] = values.reset_index(drop=True)
+        # No copy and no consolidation into 2-D blocks
+        self.frame = pd.DataFrame(columns, copy=False)
+
+    @classmethod
+    def _wrap(cls, frame: pd.DataFrame, like: 'EpisodeStore') -> 'EpisodeStore':
+        store = cls.__new__(cls)
+        store.category_columns = like.category_columns
+        store.date_columns = like.date_columns
+        store.frame = frame
+        return store
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def memory_usage(self) -> int:
+        return int(self.frame.memory_usage(deep=True).sum())
+
+    def categories(self, column: str) -> pd.Index:
+        return self.frame[column].cat.categories
+
+    def codes(self, column: str) -> np.ndarray:
+        """Category codes of `column`; -1 marks a missing value"""
+        return self.frame[column].cat.codes.to_numpy()
+
+    def days(self, column: str) -> np.ndarray:
+        return self.frame[column].to_numpy()
+
+    def min_date(self, column: str) -> Optional[pd.Timestamp]:
+        days = self.days(column)
+        days = days[days != NULL_DAY]
+        return pd.Timestamp(np.datetime64(int(days.min()), 'D')) if len(days) else None
+
+    def max_date(self, column: str) -> Optional[pd.Timestamp]:
+        days = self.days(column)
+        days = days[days != NULL_DAY]
+        return pd.Timestamp(np.datetime64(int(days.max()), 'D')) if len(days) else None
+
+    def isin(self, column: str, values: Iterable) -> np.ndarray:
+        """Membership test as one table lookup per row on the codes"""
+        categories = self.categories(column)
+        wanted = np.zeros(len(categories) + 1, dtype=bool)  # trailing slot answers code -1
+        positions = categories.get_indexer(list(values))
+        wanted[positions[positions >= 0]] = True
+        return wanted[self.codes(column)]
+
+    def within(self, start_column: str, end_column: str, start_date=None, end_date=None) -> np.ndarray:
+        """Rows whose [start_column, end_column] span lies inside [start_date, end_date]"""
+        mask = np.ones(len(self), dtype=bool)
+        if start_date is not None:
+            mask &= self.days(start_column) >= to_day_numbers([start_date])[0]
+        if end_date is not None:
+            mask &= self.days(end_column) <= to_day_numbers([end_date])[0]
+        return mask
+
+    def group_codes(self, columns: Sequence[str]) -> Tuple[np.ndarray, pd.DataFrame]:
+        """
+        Dense integer key per row for the combination of `columns`, and the labels
+        of each key in key order. Keys mix the per-column codes in one int64, so
+        grouping never touches the strings; rows with a missing label get -1.
+        """
+        key = np.zeros(len(self), dtype=np.int64)
+        missing = np.zeros(len(self), dtype=bool)
+        for column in columns:
+            codes = self.codes(column)
+            key = key * (len(self.categories(column)) + 1) + codes + 1
+            missing |= codes < 0
+        unique_keys, groups = np.unique(key[~missing], return_inverse=True)
+        group = np.full(len(self), -1, dtype=np.int64)
+        group[~missing] = groups
+
+        labels = {}
+        remaining = unique_keys
+        for column in reversed(columns):
+            radix = len(self.categories(column)) + 1
+            labels[column] = self.categories(column)[remaining % radix - 1]
+            remaining = remaining // radix
+        return group, pd.DataFrame({column: labels[column] for column in columns})
+
+    def take(self, mask) -> 'EpisodeStore':
+        """Rows selected by a boolean mask or positions; categories are shared, not re-encoded"""
+        mask = np.asarray(mask)
+        frame = self.frame[mask] if mask.dtype == bool else self.frame.take(mask)
+        return self._wrap(frame.reset_index(drop=True), self)
+
+    def to_frame(self, columns: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """Readable frame for plotting: dates as datetimes, categoricals trimmed to the values present"""
+        frame = self.frame if columns is None else self.frame[list(columns)]
+        frame = frame.copy(deep=False)
+        for column in frame.columns:
+            if column in self.date_columns:
+                frame[column] = from_day_numbers(frame[column].to_numpy())
+            elif column in self.category_columns:
+                frame[column] = frame[column].cat.remove_unused_categories()
+        return frame
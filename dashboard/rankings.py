@@ -0,0 +1,105 @@
+from typing import Iterable, Sequence
+
+import numpy as np
+import pandas as pd
+
+from dashboard.episode_store import EpisodeStore
+
+RANKING_KEYS = ['generic_name', 'company_name', 'therapeutic_category']
+SHORTAGE_STATUSES = ('new', 'continued')
+# Summed per group in one reduceat: episode days, episodes, days in shortage, episodes in shortage
+MEASURES = ['total_days', 'total_episodes', 'shortage_days', 'shortage_episodes']
+
+
+class RankingEngine:
+    """
+    Per-group shortage totals, kept as one int64 row per group in `totals`
+    (columns in MEASURES order) next to the group labels.
+
+    Every measure is computed together: rows are ordered by integer group code
+    and a single np.add.reduceat sums the stacked measure columns. New or
+    retracted episodes are folded in with add()/remove() without recomputing
+    the groups already known.
+    """
+
+    def __init__(self, key_columns: Sequence[str] = RANKING_KEYS,
+                 shortage_statuses: Iterable[str] = SHORTAGE_STATUSES):
+        self.key_columns = list(key_columns)
+        self.shortage_statuses = tuple(shortage_statuses)
+        self.labels = pd.DataFrame({column: pd.Series(dtype=object) for column in self.key_columns})
+        self.totals = np.zeros((0, len(MEASURES)), dtype=np.int64)
+        self._index = pd.MultiIndex.from_frame(self.labels)
+
+    @classmethod
+    def from_store(cls, store: EpisodeStore, key_columns: Sequence[str] = RANKING_KEYS,
+                   shortage_statuses: Iterable[str] = SHORTAGE_STATUSES) -> 'RankingEngine':
+        engine = cls(key_columns, shortage_statuses)
+        engine.add(store)
+        return engine
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+    def _partials(self, store: EpisodeStore):
+        """Labels and summed measures for each group present in `store`"""
+        group, labels = store.group_codes(self.key_columns)
+        keep = group >= 0
+        days = store.frame['episode_duration_days'].to_numpy(dtype=np.int64)
+        in_shortage = store.isin('shortage_status', self.shortage_statuses)
+        measures = np.column_stack([days, np.ones_like(days), days * in_shortage, in_shortage])[keep]
+
+        group = group[keep]
+        order = np.argsort(group, kind='stable')
+        starts = np.flatnonzero(np.diff(group[order], prepend=-1))
+        sums = np.add.reduceat(measures[order], starts, axis=0) if len(starts) else measures[:0]
+        return labels.iloc[group[order][starts]].reset_index(drop=True), sums
+
+    def add(self, store: EpisodeStore, sign: int = 1):
+        """Fold episodes into the totals; groups seen for the first time are appended"""
+        if store.empty:
+            return
+        labels, sums = self._partials(store)
+        labels = labels.astype(object)
+        positions = self._index.get_indexer(pd.MultiIndex.from_frame(labels))
+
+        new = positions < 0
+        if new.any():
+            self.labels = pd.concat([self.labels, labels[new]], ignore_index=True)
+            self.totals = np.vstack([self.totals, np.zeros((new.sum(), len(MEASURES)), dtype=np.int64)])
+            self._index = pd.MultiIndex.from_frame(self.labels)
+            positions[new] = len(self.totals) - new.sum() + np.arange(new.sum())
+        np.add.at(self.totals, positions, sign * sums)
+
+    def remove(self, store: EpisodeStore):
+        """Retract episodes previously added, e.g. before re-adding a revised version"""
+        self.add(store, sign=-1)
+
+    def _frame(self, rows: np.ndarray) -> pd.DataFrame:
+        df = self.labels.iloc[rows].reset_index(drop=True)
+        totals = self.totals[rows]
+        for i, measure in enumerate(MEASURES):
+            df[measure] = totals[:, i]
+        df['shortage_pct'] = np.round(self._metric('shortage_pct')[rows] * 100, 2)
+        return df
+
+    def _metric(self, metric: str) -> np.ndarray:
+        if metric == 'shortage_pct':
+            with np.errstate(divide='ignore', invalid='ignore'):
+                days = self.totals[:, MEASURES.index('total_days')]
+                return np.where(days > 0, self.totals[:, MEASURES.index('shortage_days')] / days, 0.0)
+        return self.totals[:, MEASURES.index(metric)]
+
+    def top(self, k: int, metric: str = 'shortage_days') -> pd.DataFrame:
+        """The k highest groups by `metric`: argpartition picks them, only those k get sorted"""
+        if k <= 0:
+            return self._frame(np.zeros(0, dtype=np.int64))
+        values = self._metric(metric)
+        live = np.flatnonzero(self.totals[:, MEASURES.index('total_episodes')] > 0)
+        if k < len(live):
+            live = live[np.argpartition(-values[live], k - 1)[:k]]
+        rows = live[np.argsort(-values[live], kind='stable')]
+        return self._frame(rows)
+
+    def table(self, metric: str = 'shortage_days') -> pd.DataFrame:
+        """Every group, highest `metric` first"""
+        return self.top(len(self), metric)
@@ -0,0 +1,149 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Optional
+
+import pandas as pd
+import pyarrow as pa
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process publish lock
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = 'CURRENT.json'
+LOCK_FILE = 'publish.lock'
+# Versions kept on disk; older files are unlinked, which is safe for processes still mapping them
+KEEP_VERSIONS = 2
+
+
+class Snapshot:
+    """One published version: frames backed by read-only memory maps of the Arrow files"""
+
+    def __init__(self, version: int, published_at: float, frames: Dict[str, pd.DataFrame]):
+        self.version = version
+        self.published_at = published_at
+        self.frames = frames
+
+
+def _table_path(snapshot_dir: str, table: str, version: int) -> str:
+    return os.path.join(snapshot_dir, f'{table}.v{version}.arrow')
+
+
+def _pandas_dtype(arrow_type: pa.DataType):
+    # Dictionary columns come back as pandas categoricals; everything else stays Arrow-backed
+    return None if pa.types.is_dictionary(arrow_type) else pd.ArrowDtype(arrow_type)
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(snapshot_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def open_snapshot(snapshot_dir: str, tables: Iterable[str]) -> Optional[Snapshot]:
+    """
+    Map the current version read-only. Frames use Arrow-backed dtypes over the
+    mapped buffers, so every process opening the same version shares one copy
+    in the page cache instead of holding its own. Dictionary-encoded columns are
+    the exception: they load as categoricals, copying only their small codes.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return None
+    frames = {}
+    for table in tables:
+        try:
+            source = pa.memory_map(_table_path(snapshot_dir, table, manifest['version']), 'r')
+            frames[table] = pa.ipc.open_file(source).read_all().to_pandas(types_mapper=_pandas_dtype)
+        except (OSError, pa.ArrowInvalid) as e:
+            logger.warning(f"Snapshot v{manifest['version']} of {table} is unreadable ({e})")
+            return None
+    return Snapshot(manifest['version'], manifest['published_at'], frames)
+
+
+def publish_snapshot(snapshot_dir: str, frames: Dict[str, pd.DataFrame]) -> int:
+    """
+    Write every table as an uncompressed Arrow IPC file under a new version
+    number, then point the manifest at it with an atomic rename. Call while
+    holding publish_lock so concurrent publishers cannot pick the same version.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    manifest = read_manifest(snapshot_dir)
+    version = manifest['version'] + 1 if manifest else 1
+
+    for table, df in frames.items():
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        path = _table_path(snapshot_dir, table, version)
+        with pa.OSFile(path + '.tmp', 'wb') as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+        os.replace(path + '.tmp', path)
+
+    manifest_path = os.path.join(snapshot_dir, MANIFEST)
+    with open(manifest_path + '.tmp', 'w') as f:
+        json.dump({'version': version, 'published_at': time.time(), 'tables': sorted(frames)}, f)
+    os.replace(manifest_path + '.tmp', manifest_path)
+
+    for name in os.listdir(snapshot_dir):
+        stem, _, extension = name.rpartition('.')
+        old_version = stem.rpartition('.v')[2]
+        if extension == 'arrow' and old_version.isdigit() and int(old_version) <= version - KEEP_VERSIONS:
+            try:
+                os.remove(os.path.join(snapshot_dir, name))
+            except OSError:
+                pass
+    return version
+
+
+@contextmanager
+def publish_lock(snapshot_dir: str, blocking: bool = False):
+    """Yields True if this process may publish; only one process across workers holds it"""
+    if fcntl is None:
+        yield True
+        return
+    os.makedirs(snapshot_dir, exist_ok=True)
+    with open(os.path.join(snapshot_dir, LOCK_FILE), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class PeriodicRefresher(threading.Thread):
+    """
+    Daemon thread that calls `refresh` every `interval` seconds, first after
+    `initial_delay`. Failures are logged and retried on the next tick, so the
+    data already being served stays in place.
+    """
+
+    def __init__(self, refresh: Callable[[], None], interval: float, initial_delay: Optional[float] = None):
+        super().__init__(name='data-refresh', daemon=True)
+        self.refresh = refresh
+        self.interval = interval
+        self.initial_delay = interval if initial_delay is None else initial_delay
+        self._stopped = threading.Event()
+
+    def run(self):
+        delay = self.initial_delay
+        while not self._stopped.wait(delay):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Background refresh failed: {e}")
+            delay = self.interval
+
+    def stop(self):
+        self._stopped.set()
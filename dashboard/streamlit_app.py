@@ -2,8 +2,29 @@ import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+import numpy as np
 import os
-from supabase import create_client, Client
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.episode_store import EpisodeStore
+from dashboard.rankings import RankingEngine
+from dashboard.timeline import coalesce_episodes, lod_resolution
+from etl.storage import get_backend
+
+# Columns the app reads from drug_shortage_episodes; status_color and
+# drug_display_name are only there for other clients and are never fetched
+EPISODE_COLUMNS = [
+    'generic_name', 'company_name', 'therapeutic_category', 'shortage_status',
+    'episode_start_date', 'episode_end_date', 'episode_duration_days'
+]
+# Unique per row, so offset pages never overlap or skip rows
+EPISODE_ORDER = ['generic_name', 'company_name', 'presentation', 'episode_start_date']
+# Held dictionary-encoded in memory; see dashboard/episode_store.py
+EPISODE_CATEGORIES = ['generic_name', 'company_name', 'presentation', 'therapeutic_category', 'shortage_status']
+EPISODE_DATES = ['episode_start_date', 'episode_end_date']
+# Longer drug lists are filtered locally instead of being sent in the URL
+PUSHDOWN_MAX_DRUGS = 200
 
 # Page config
 st.set_page_config(
@@ -12,85 +33,49 @@ st.set_page_config(
     layout="wide"
 )
 
-# Supabase connection (using secrets for deployment)
+# Storage backend: Supabase by default, or the embedded store with STORAGE_BACKEND=duckdb
 @st.cache_resource
-def init_supabase():
+def init_storage():
+    # Fallback to environment variables (for local development)
+    from dotenv import load_dotenv
+    load_dotenv()
+    settings = dict(os.environ)
     try:
-        # Try to use Streamlit secrets first (for deployment)
-        supabase_url = st.secrets["SUPABASE_URL"]
-        supabase_key = st.secrets["SUPABASE_ANON_KEY"]
-    except:
-        # Fallback to environment variables (for local development)
-        from dotenv import load_dotenv
-        load_dotenv()
-        supabase_url = os.getenv("SUPABASE_URL")
-        supabase_key = os.getenv("SUPABASE_ANON_KEY")
-    
-    return create_client(supabase_url, supabase_key)
+        # Streamlit secrets take precedence (for deployment)
+        settings.update(st.secrets)
+    except Exception:
+        pass
+    return get_backend(settings, read_only=True)
+
+# Episodes matching the filters, with the filters applied by the database
+@st.cache_data(ttl=3600)  # Cache for 1 hour
+def load_episodes(drugs=None, start_date=None, end_date=None):
+    episodes_df = init_storage().fetch(
+        'drug_shortage_episodes',
+        EPISODE_COLUMNS,
+        filters={
+            'generic_name': {'in_': drugs},
+            'episode_start_date': {'gte': start_date and start_date.isoformat()},
+            'episode_end_date': {'lte': end_date and end_date.isoformat()},
+        },
+        order_by=EPISODE_ORDER,
+    )
+    # Strings become categorical codes and dates int32 day numbers
+    return EpisodeStore(episodes_df, EPISODE_CATEGORIES, EPISODE_DATES)
 
 # Load data with caching
 @st.cache_data(ttl=3600)  # Cache for 1 hour
 def load_data():
-    supabase = init_supabase()
-    
     try:
         # Load from drug_shortage_episodes dbt model (already transformed)
-        # result = supabase.table('drug_availability_episodes').select('*').execute()
-        result = supabase.table('drug_shortage_episodes').select('*').execute()
-        episodes_df = pd.DataFrame(result.data)
+        episodes = load_episodes()
         
-        if not episodes_df.empty:
-            # Convert date columns
-            episodes_df['episode_start_date'] = pd.to_datetime(episodes_df['episode_start_date'])
-            episodes_df['episode_end_date'] = pd.to_datetime(episodes_df['episode_end_date'])
-            
-            # Create rankings from episodes data
-            rankings_df = episodes_df.groupby(['generic_name', 'company_name', 'therapeutic_category']).agg({
-                'episode_duration_days': ['sum', 'count'],
-                # 'availability_status': lambda x: (x == 'not available').sum()
-                'shortage_status': lambda x: (x.isin(['new', 'continued'])).sum()
-            }).reset_index()
-            
-            # Flatten column names
-            # rankings_df.columns = ['generic_name', 'company_name', 'therapeutic_category', 
-            #                      'total_days', 'total_episodes', 'not_available_episodes']
-            rankings_df.columns = ['generic_name', 'company_name', 'therapeutic_category', 
-                        'total_days', 'total_episodes', 'shortage_episodes']
-            
-            # 1. Calculate the 'not available' sums and store in a new DataFrame
-            # not_available_summary = episodes_df[
-            #     episodes_df['availability_status'] == 'not available'
-            # ].groupby(['generic_name', 'therapeutic_category'])['episode_duration_days'].sum().reset_index()
-
-            shortage_summary = episodes_df[
-                episodes_df['shortage_status'].isin(['new', 'continued'])
-            ].groupby(['generic_name', 'therapeutic_category'])['episode_duration_days'].sum().reset_index()
+        # Totals, shortage days and shortage % per (drug, company, category) in one pass over integer group codes
+        return episodes, RankingEngine.from_store(episodes)
 
-            # Rename the aggregated column for clarity before merging
-            shortage_summary = shortage_summary.rename(
-                columns={'episode_duration_days': 'shortage_days'}
-            )
-
-            # 2. Merge this summary data back into your main DataFrame
-            rankings_df = rankings_df.merge(
-                shortage_summary,
-                on=['generic_name', 'therapeutic_category'],
-                how='left'  # Use 'left' to keep all rows from rankings_df
-            )
-
-            # 3. Fill any resulting NaN values with 0
-            rankings_df['shortage_days'] = rankings_df['shortage_days'].fillna(0)
-            
-            rankings_df['shortage_pct'] = (rankings_df['shortage_days'] / rankings_df['total_days'] * 100).round(2)
-            rankings_df = rankings_df.sort_values('shortage_days', ascending=False)
-            
-            return episodes_df, rankings_df
-        else:
-            return pd.DataFrame(), pd.DataFrame()
-            
     except Exception as e:
         st.error(f"Error loading data: {e}")
-        return pd.DataFrame(), pd.DataFrame()
+        return EpisodeStore(pd.DataFrame()), RankingEngine()
 
 # Main app
 def main():
@@ -99,9 +84,9 @@ def main():
     
     # Load data
     with st.spinner("Loading data..."):
-        episodes_df, rankings_df = load_data()
+        episodes, rankings = load_data()
     
-    if episodes_df.empty:
+    if episodes.empty:
         st.error("No data available. Please check your database connection.")
         return
     
@@ -109,7 +94,7 @@ def main():
     st.sidebar.header("Filters")
     
     # Drug selection
-    all_drugs = sorted(episodes_df['generic_name'].unique())
+    all_drugs = list(episodes.categories('generic_name'))
     selected_drugs = st.sidebar.multiselect(
         "Select Drugs:", 
         all_drugs, 
@@ -123,10 +108,18 @@ def main():
         format_func=lambda x: x.replace('_', ' ').title()
     )
     
+    # Timeline detail
+    timeline_detail = st.sidebar.radio(
+        "Timeline Detail:",
+        ["Auto", "Exact"],
+        help="Both merge consecutive same-status episodes into one bar. "
+             "Auto also snaps bars to a step that fits the date range, so wide ranges stay fast to draw."
+    )
+    
     # Date range
-    if not episodes_df.empty:
-        min_date = episodes_df['episode_start_date'].min()
-        max_date = episodes_df['episode_end_date'].max()
+    if not episodes.empty:
+        min_date = episodes.min_date('episode_start_date')
+        max_date = episodes.max_date('episode_end_date')
         
         date_range = st.sidebar.date_input(
             "Date Range:",
@@ -141,25 +134,46 @@ def main():
     with col1:
         st.subheader("📅 Shortage Timeline")
         
-        # Filter data
-        filtered_df = episodes_df[
-            (episodes_df['generic_name'].isin(selected_drugs))
-        ]
-        
+        # Filter data; a narrowed selection is fetched with the filters pushed to the database
         if len(date_range) == 2:
-            filtered_df = filtered_df[
-                (filtered_df['episode_start_date'] >= pd.Timestamp(date_range[0])) &
-                (filtered_df['episode_end_date'] <= pd.Timestamp(date_range[1]))
-            ]
+            start_date, end_date = date_range
+        else:
+            start_date = end_date = None
+        narrowed = (
+            len(selected_drugs) < len(all_drugs)
+            or (start_date is not None and pd.Timestamp(start_date) > min_date)
+            or (end_date is not None and pd.Timestamp(end_date) < max_date)
+        )
+        if narrowed and 0 < len(selected_drugs) <= PUSHDOWN_MAX_DRUGS:
+            try:
+                source = load_episodes(tuple(sorted(selected_drugs)), start_date, end_date)
+            except Exception as e:
+                st.warning(f"Filtered query failed, filtering loaded data instead: {e}")
+                source = episodes
+        else:
+            source = episodes
+        # Both filters run on integer codes and day numbers
+        filtered = source.take(
+            source.isin('generic_name', selected_drugs)
+            & source.within('episode_start_date', 'episode_end_date', start_date, end_date)
+        )
         
-        if not filtered_df.empty:
+        if not filtered.empty:
+            # One bar per run of same-status episodes per row; Auto snaps runs to the visible range's resolution
+            if timeline_detail == "Auto":
+                resolution = lod_resolution(start_date or min_date, end_date or max_date)
+            else:
+                resolution = 1
+            bars = coalesce_episodes(filtered, group_by, resolution_days=resolution)
+            
             # Create Gantt chart
             fig = px.timeline(
-                filtered_df,
+                bars,
                 x_start="episode_start_date",
                 x_end="episode_end_date",
                 y=group_by,
                 color="shortage_status",
+                hover_data=['episodes'],
                 color_discrete_map={
                     'new': '#ff4444',
                     'continued': "#ff8800",
@@ -182,10 +196,11 @@ def main():
     with col2:
         st.subheader("📊 Quick Stats")
         
-        if not filtered_df.empty:
-            total_drugs = filtered_df['generic_name'].nunique()
-            avg_episodes = filtered_df.groupby('generic_name').size().mean()
-            not_available_pct = (filtered_df['shortage_status'].isin(['new', 'continued'])).mean() * 100
+        if not filtered.empty:
+            drug_codes = filtered.codes('generic_name')
+            total_drugs = len(np.unique(drug_codes[drug_codes >= 0]))
+            avg_episodes = (drug_codes >= 0).sum() / total_drugs if total_drugs else 0.0
+            not_available_pct = filtered.isin('shortage_status', ['new', 'continued']).mean() * 100
             
             st.metric("Drugs Analyzed", total_drugs)
             st.metric("Avg Episodes per Drug", f"{avg_episodes:.1f}")
@@ -200,8 +215,8 @@ def main():
         format_func=lambda x: "Days In Shortage" if x == "shortage_days" else "Percentage Not Available"
     )
     
-    if not rankings_df.empty:
-        top_20 = rankings_df.head(20)
+    if len(rankings):
+        top_20 = rankings.top(20, ranking_metric)
         
         fig_bar = px.bar(
             top_20,
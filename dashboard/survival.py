@@ -0,0 +1,305 @@
+import math
+import threading
+from collections import OrderedDict
+from statistics import NormalDist
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from dashboard.episode_store import NULL_DAY, from_day_numbers, to_day_numbers
+from dashboard.rankings import SHORTAGE_STATUSES
+
+# Columns that identify a drug in mart_shortage_survival
+SURVIVAL_KEYS = ['drug_identifier', 'route_category', 'single_source']
+
+
+class KMCurve:
+    """
+    Kaplan-Meier estimate for one group. Every array has one entry per distinct
+    duration, after a leading t=0 entry where survival is 1:
+    - times, survival
+    - at_risk: episodes still open just before t
+    - events / censored: episodes resolved / still open at their last observation at t
+    - ci_lower / ci_upper: pointwise band from Greenwood's variance on the log(-log) scale
+    """
+
+    def __init__(self, times, survival, at_risk, events, censored, ci_lower, ci_upper):
+        self.times = times
+        self.survival = survival
+        self.at_risk = at_risk
+        self.events = events
+        self.censored = censored
+        self.ci_lower = ci_lower
+        self.ci_upper = ci_upper
+
+    @property
+    def n(self) -> int:
+        return int(self.at_risk[0])
+
+    def median(self) -> Optional[float]:
+        """First time the survival estimate drops to 0.5 or below; None if it never does"""
+        below = np.flatnonzero(self.survival <= 0.5)
+        return float(self.times[below[0]]) if len(below) else None
+
+    def truncate(self, horizon: float) -> 'KMCurve':
+        """The curve up to and including `horizon`, as views into the full arrays"""
+        end = int(np.searchsorted(self.times, horizon, side='right'))
+        return KMCurve(self.times[:end], self.survival[:end], self.at_risk[:end], self.events[:end],
+                       self.censored[:end], self.ci_lower[:end], self.ci_upper[:end])
+
+
+class KMCurveCache:
+    """
+    LRU cache of full (untruncated) results keyed by (data version, grouping).
+    Display horizons are served by KMCurve.truncate, so they never miss. Bump the
+    version or call invalidate() when the underlying episodes are reloaded.
+    """
+
+    def __init__(self, max_entries: int = 8):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, compute: Callable[[], object]):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries),
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+
+def _within_groups(values: np.ndarray, first: np.ndarray, segment: np.ndarray) -> np.ndarray:
+    """Cumulative sum of `values` restarting at every group; first[segment] is each block's group start"""
+    total = np.cumsum(values)
+    before = total - values
+    return total - before[first][segment]
+
+
+def grouped_kaplan_meier(durations, events, groups=None, alpha: float = 0.05) -> Dict[object, KMCurve]:
+    """
+    Kaplan-Meier curves for every group in one pass: a single lexsort by
+    (group, duration), per-(group, duration) event and censor counts with
+    np.add.reduceat, and at-risk sets, survival and Greenwood variance as
+    cumulative sums that restart at each group boundary.
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events).astype(bool)
+    if groups is None:
+        codes, labels = np.zeros(len(durations), dtype=np.int64), np.array([None], dtype=object)
+    else:
+        codes, labels = pd.factorize(pd.Series(groups), sort=True)
+    valid = ~np.isnan(durations) & (codes >= 0)
+    durations, events, codes = durations[valid], events[valid], codes[valid]
+    if not len(durations):
+        return {}
+
+    order = np.lexsort((durations, codes))
+    durations, events, codes = durations[order], events[order], codes[order]
+
+    # One block per distinct (group, duration)
+    boundary = np.ones(len(durations), dtype=bool)
+    boundary[1:] = (np.diff(codes) != 0) | (np.diff(durations) != 0)
+    starts = np.flatnonzero(boundary)
+    block_events = np.add.reduceat(events.astype(np.int64), starts)
+    block_total = np.diff(np.append(starts, len(durations)))
+    block_censored = block_total - block_events
+    block_codes = codes[starts]
+    block_times = durations[starts]
+
+    # Group boundaries over blocks
+    group_start = np.ones(len(starts), dtype=bool)
+    group_start[1:] = block_codes[1:] != block_codes[:-1]
+    first = np.flatnonzero(group_start)
+    segment = np.cumsum(group_start) - 1
+
+    group_sizes = np.bincount(codes, minlength=len(labels))
+    removed_before = _within_groups(block_total, first, segment) - block_total
+    at_risk = group_sizes[block_codes] - removed_before
+
+    # S(t) = prod(1 - d/n); a block where every at-risk episode ends drives S to 0 for the rest of the group
+    wiped_out = block_events == at_risk
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_terms = np.where(wiped_out, 0.0, np.log1p(-block_events / at_risk))
+        greenwood_terms = np.where(wiped_out, 0.0, block_events / (at_risk * (at_risk - block_events)))
+    survival = np.exp(_within_groups(log_terms, first, segment))
+    survival[_within_groups(wiped_out.astype(np.int64), first, segment) > 0] = 0.0
+    variance = _within_groups(greenwood_terms, first, segment)
+
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_survival = np.log(survival)
+        spread = z * np.sqrt(variance) / log_survival
+        log_log = np.log(-log_survival)
+        ci_lower = np.exp(-np.exp(log_log - spread))
+        ci_upper = np.exp(-np.exp(log_log + spread))
+    interior = (survival > 0) & (survival < 1)
+    ci_lower = np.where(interior, ci_lower, survival)
+    ci_upper = np.where(interior, ci_upper, survival)
+
+    curves = {}
+    ends = np.append(first[1:], len(starts))
+    for code, start, end in zip(block_codes[first], first, ends):
+        block = slice(start, end)
+        n = group_sizes[code]
+        curves[labels[code]] = KMCurve(
+            times=np.concatenate([[0.0], block_times[block]]),
+            survival=np.concatenate([[1.0], survival[block]]),
+            at_risk=np.concatenate([[n], at_risk[block]]),
+            events=np.concatenate([[0], block_events[block]]),
+            censored=np.concatenate([[0], block_censored[block]]),
+            ci_lower=np.concatenate([[1.0], ci_lower[block]]),
+            ci_upper=np.concatenate([[1.0], ci_upper[block]]),
+        )
+    return curves
+
+
+def shortage_runs(keys: np.ndarray, days: np.ndarray, in_shortage: np.ndarray
+                  ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Every shortage episode per key by run-length encoding, the NumPy counterpart
+    of int_shortage_survival_episodes. A day is a shortage day if any of its rows
+    is; an episode starts on a shortage day that follows an ended day (or opens
+    the key's history) and resolves on the next ended day.
+    Returns (keys, start days, resolution days with NULL_DAY while open,
+    1-based episode numbers) with one entry per episode.
+    """
+    order = np.lexsort((days, keys))
+    keys, days, in_shortage = keys[order], days[order].astype(np.int64), in_shortage[order].astype(bool)
+    if not len(keys):
+        return keys, days, days.copy(), np.zeros(0, dtype=np.int64)
+
+    # One state per (key, day)
+    day_start = np.ones(len(keys), dtype=bool)
+    day_start[1:] = (keys[1:] != keys[:-1]) | (days[1:] != days[:-1])
+    first_row = np.flatnonzero(day_start)
+    keys, days = keys[first_row], days[first_row]
+    in_shortage = np.logical_or.reduceat(in_shortage, first_row)
+
+    # Runs of equal state within a key
+    key_start = np.ones(len(keys), dtype=bool)
+    key_start[1:] = keys[1:] != keys[:-1]
+    run_start = key_start.copy()
+    run_start[1:] |= in_shortage[1:] != in_shortage[:-1]
+    runs = np.flatnonzero(run_start)
+    run_keys, run_days, run_shortage = keys[runs], days[runs], in_shortage[runs]
+
+    # Runs alternate, so the next run of the same key is the ended run that resolves a shortage run
+    run_key_start = key_start[runs]
+    resolutions = np.full(len(runs), NULL_DAY, dtype=np.int64)
+    resolutions[:-1] = np.where(run_key_start[1:], NULL_DAY, run_days[1:])
+    first = np.flatnonzero(run_key_start)
+    numbers = _within_groups(run_shortage.astype(np.int64), first, np.cumsum(run_key_start) - 1)
+    return run_keys[run_shortage], run_days[run_shortage], resolutions[run_shortage], numbers[run_shortage]
+
+
+def survival_episodes(df: pd.DataFrame, as_of_date=None, keys: Sequence[str] = SURVIVAL_KEYS) -> pd.DataFrame:
+    """
+    mart_shortage_survival rows from int_shortage_ndc-shaped rows (keys,
+    shortage_status, update_date), without the database. Open episodes are
+    censored at as_of_date, by default the latest update_date.
+    """
+    rows = df[df[keys[0]].notna() & df['update_date'].notna() & df['shortage_status'].notna()
+              & (df['shortage_status'] != 'discontinued')]
+    codes = rows.groupby(list(keys), dropna=False, sort=False).ngroup().to_numpy(dtype=np.int64)
+    days = to_day_numbers(rows['update_date'])
+    in_shortage = rows['shortage_status'].isin(SHORTAGE_STATUSES).to_numpy()
+    episode_codes, starts, resolutions, numbers = shortage_runs(codes, days, in_shortage)
+
+    if as_of_date is None:
+        as_of = int(days.max()) if len(days) else 0
+    else:
+        as_of = int(to_day_numbers([as_of_date])[0])
+    resolved = resolutions != NULL_DAY
+    labels = rows[list(keys)].iloc[np.unique(codes, return_index=True)[1]].reset_index(drop=True)
+    episodes = labels.iloc[episode_codes].reset_index(drop=True)
+    episodes['episode_number'] = numbers
+    episodes['shortage_start_date'] = from_day_numbers(starts)
+    episodes['resolution_date'] = from_day_numbers(resolutions)
+    episodes['resolved'] = resolved
+    episodes['duration_days'] = np.where(resolved, resolutions, as_of) - starts
+    return episodes
+
+
+def kaplan_meier_curve(durations, events, alpha: float = 0.05) -> KMCurve:
+    """Kaplan-Meier curve for a single, ungrouped sample"""
+    return grouped_kaplan_meier(durations, events, alpha=alpha)[None]
+
+
+def _chi2_sf(statistic: float, dof: int) -> float:
+    """Upper tail of the chi-square distribution for integer dof (closed form, no scipy needed)"""
+    if statistic <= 0:
+        return 1.0
+    half = statistic / 2
+    if dof % 2 == 0:
+        term, total = 1.0, 1.0
+        for i in range(1, dof // 2):
+            term *= half / i
+            total += term
+        return min(1.0, math.exp(-half) * total)
+    total = math.erfc(math.sqrt(half))
+    term = math.sqrt(2 * statistic / math.pi) * math.exp(-half)
+    for i in range(1, (dof + 1) // 2):
+        total += term
+        term *= statistic / (2 * i + 1)
+    return min(1.0, total)
+
+
+def logrank_test(durations, events, groups) -> Tuple[float, int, float]:
+    """
+    Log-rank test that all groups share one survival curve.
+    Returns (chi-square statistic, degrees of freedom, p-value).
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events).astype(bool)
+    codes, labels = pd.factorize(pd.Series(groups), sort=True)
+    valid = ~np.isnan(durations) & (codes >= 0)
+    durations, events, codes = durations[valid], events[valid], codes[valid]
+    n_groups = len(labels)
+    if n_groups < 2:
+        return 0.0, 0, 1.0
+
+    # Dense (distinct time x group) counts; durations are whole days, so this stays small
+    times, time_index = np.unique(durations, return_inverse=True)
+    cells = time_index * n_groups + codes
+    deaths = np.bincount(cells, weights=events, minlength=len(times) * n_groups).reshape(len(times), n_groups)
+    removed = np.bincount(cells, minlength=len(times) * n_groups).reshape(len(times), n_groups)
+    at_risk = np.bincount(codes, minlength=n_groups) - (np.cumsum(removed, axis=0) - removed)
+
+    deaths_total = deaths.sum(axis=1)
+    at_risk_total = at_risk.sum(axis=1)
+    informative = (deaths_total > 0) & (at_risk_total > 1)
+    deaths, at_risk = deaths[informative], at_risk[informative]
+    deaths_total, at_risk_total = deaths_total[informative], at_risk_total[informative]
+
+    share = at_risk / at_risk_total[:, None]
+    observed_minus_expected = (deaths - share * deaths_total[:, None]).sum(axis=0)
+    scale = deaths_total * (at_risk_total - deaths_total) / (at_risk_total - 1)
+    covariance = (np.einsum('t,tg->g', scale, share) * np.eye(n_groups)
+                  - np.einsum('t,tg,th->gh', scale, share, share))
+
+    # Drop one group: the differences sum to zero
+    statistic = float(observed_minus_expected[:-1] @ np.linalg.pinv(covariance[:-1, :-1]) @ observed_minus_expected[:-1])
+    dof = n_groups - 1
+    return statistic, dof, _chi2_sf(statistic, dof)
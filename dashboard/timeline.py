@@ -0,0 +1,75 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from dashboard.episode_store import NULL_DAY, EpisodeStore, from_day_numbers, to_day_numbers
+
+# Intervals per timeline row and status the level-of-detail mode aims for across the visible range
+TIMELINE_BINS = 400
+
+
+def lod_resolution(start_date, end_date, bins: int = TIMELINE_BINS) -> int:
+    """Snapping step in days so the visible range spans about `bins` steps"""
+    if start_date is None or end_date is None:
+        return 1
+    span = int(to_day_numbers([end_date])[0]) - int(to_day_numbers([start_date])[0])
+    return max(1, span // bins)
+
+
+def coalesce_intervals(keys: np.ndarray, starts: np.ndarray, ends: np.ndarray
+                       ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Union of overlapping or touching [start, end] intervals per key.
+    Returns (keys, starts, ends, rows merged) with one entry per merged interval.
+    """
+    order = np.lexsort((starts, keys))
+    keys, starts, ends = keys[order], starts[order].astype(np.int64), ends[order].astype(np.int64)
+    if not len(keys):
+        return keys, starts, ends, np.zeros(0, dtype=np.int64)
+
+    # Running max of ends restarting at each key: lift every key's block above the previous ones
+    key_start = np.ones(len(keys), dtype=bool)
+    key_start[1:] = keys[1:] != keys[:-1]
+    lift = (np.cumsum(key_start) - 1) * (ends.max() - starts.min() + 1)
+    reach = np.maximum.accumulate(ends + lift) - lift
+
+    begins = key_start.copy()
+    begins[1:] |= starts[1:] > reach[:-1]
+    first = np.flatnonzero(begins)
+    return keys[first], starts[first], np.maximum.reduceat(ends, first), np.diff(np.append(first, len(keys)))
+
+
+def coalesce_episodes(store: EpisodeStore, group_column: str, status_column: str = 'shortage_status',
+                      start_column: str = 'episode_start_date', end_column: str = 'episode_end_date',
+                      resolution_days: int = 1) -> pd.DataFrame:
+    """
+    One bar per run of same-status episodes on each timeline row, instead of one
+    per episode. With resolution_days > 1, starts are floored and ends ceiled to
+    that grid first, so runs separated by less than one step merge as well and
+    each (row, status) keeps at most one bar per step.
+    """
+    group_codes = store.codes(group_column).astype(np.int64)
+    status_codes = store.codes(status_column).astype(np.int64)
+    n_status = len(store.categories(status_column)) + 1
+    # -1 (missing) codes shift to 0, so missing labels keep their own bars
+    keys = (group_codes + 1) * n_status + status_codes + 1
+
+    starts = store.days(start_column).astype(np.int64)
+    ends = store.days(end_column).astype(np.int64)
+    dated = (starts != NULL_DAY) & (ends != NULL_DAY)
+    keys, starts, ends = keys[dated], starts[dated], ends[dated]
+    if resolution_days > 1:
+        starts = starts // resolution_days * resolution_days
+        ends = -(-ends // resolution_days) * resolution_days
+
+    keys, starts, ends, merged = coalesce_intervals(keys, starts, ends)
+    groups = keys // n_status - 1
+    statuses = keys % n_status - 1
+    return pd.DataFrame({
+        group_column: pd.Categorical.from_codes(groups, categories=store.categories(group_column)),
+        status_column: pd.Categorical.from_codes(statuses, categories=store.categories(status_column)),
+        start_column: from_day_numbers(starts),
+        end_column: from_day_numbers(ends),
+        'episodes': merged,
+    })
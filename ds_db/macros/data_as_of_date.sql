@@ -0,0 +1,7 @@
+{% macro data_as_of_date() %}
+    -- Date the loaded data runs to: the most recent load. Open episodes end here instead
+    -- of at current_date, so results depend on the data alone, not on when they are read.
+    -- source_created_at, not created_at: historical rows carry a fixed created_at, so
+    -- once staging is promoted or emptied max(created_at) would snap back to that date.
+    (select max(source_created_at)::date from {{ ref('drug_shortages_combined') }})
+{% endmacro %}
@@ -1,44 +1,25 @@
 {{ config(materialized='view') }}
 -- REDO, the data lineage should be stem from int_shortage_ndc, not stg_drug_shortages.
-with base_data as (
-    select
-        generic_name,
-        company_name,
-        shortage_status,
-        update_date,
-        presentation,
-        therapeutic_category
-    from {{ ref('stg_drug_shortages') }}
-    where generic_name is not null
-      and update_date is not null
+
+-- Episodes are computed and stored incrementally in int_shortage_episodes. Open episodes
+-- end at data_as_of_date() instead of current_date, so a read depends on the loaded data
+-- alone and returns the same rows until the next build.
+with as_of as (
+    select {{ data_as_of_date() }} as as_of_date
 ),
 
 episodes as (
     select
-        generic_name,
-        company_name,
-        presentation,
-        therapeutic_category,
-        shortage_status,
-        update_date as episode_start_date,
-        
-        coalesce(
-            lead(update_date) over (
-                partition by generic_name, company_name, presentation 
-                order by update_date
-            ),
-            current_date
-        ) as episode_end_date,
-        
-        coalesce(
-            lead(update_date) over (
-                partition by generic_name, company_name, presentation 
-                order by update_date
-            ),
-            current_date
-        ) - update_date as episode_duration_days
-        
-    from base_data
+        e.generic_name,
+        e.company_name,
+        e.presentation,
+        e.therapeutic_category,
+        e.shortage_status,
+        e.episode_start_date,
+        coalesce(e.episode_end_date, a.as_of_date) as episode_end_date,
+        e.episode_end_date is null as is_open
+    from {{ ref('int_shortage_episodes') }} e
+    cross join as_of a
 )
 
 select
@@ -49,7 +30,8 @@ select
     shortage_status,
     episode_start_date,
     episode_end_date,
-    episode_duration_days,
+    episode_end_date - episode_start_date as episode_duration_days,
+    is_open,
     
     -- For Plotly Gantt charts
     generic_name || ' (' || company_name || ')' as drug_display_name,
@@ -63,5 +45,4 @@ select
     end as status_color
     
 from episodes
-where episode_duration_days > 0
-order by generic_name, episode_start_date
\ No newline at end of file
+where episode_end_date > episode_start_date
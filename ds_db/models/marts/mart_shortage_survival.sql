@@ -1,45 +1,24 @@
-{{ config(materialized='table') }}
+{{ config(materialized='view') }}
 
--- Kaplan-Meier survival data: one row per drug_identifier shortage episode.
--- Duration = days from first 'new' status to resolution ('ended').
--- Censored if not yet resolved.
+-- Kaplan-Meier survival data: one row per shortage episode of each drug_identifier.
+-- A drug that goes back into shortage after resolving has one row per episode;
+-- episodes are found and stored incrementally in int_shortage_survival_episodes.
+-- Duration = days from shortage start to resolution ('ended').
+-- Censored if not yet resolved, at the date of the most recent load (data_as_of_date()).
 -- Excludes discontinued drugs.
 
-with shortage_data as (
-    select
-        drug_identifier,
-        route_category,
-        "single_source",
-        shortage_status,
-        update_date
-    from {{ ref('int_shortage_ndc') }}
-    where drug_identifier is not null
-      and update_date is not null
-      and shortage_status is not null
-      and shortage_status != 'discontinued'
-),
-
-episodes as (
-    select
-        drug_identifier,
-        route_category,
-        "single_source",
-        min(case when shortage_status in ('new', 'continued') then update_date end) as shortage_start_date,
-        min(case when shortage_status = 'ended' then update_date end) as resolution_date
-    from shortage_data
-    group by drug_identifier, route_category, "single_source"
+with as_of as (
+    select {{ data_as_of_date() }} as as_of_date
 )
 
 select
-    drug_identifier,
-    route_category,
-    "single_source",
-    shortage_start_date,
-    resolution_date,
-    case when resolution_date is not null then true else false end as resolved,
-    case
-        when resolution_date is not null then resolution_date - shortage_start_date
-        else current_date - shortage_start_date
-    end as duration_days
-from episodes
-where shortage_start_date is not null
+    e.drug_identifier,
+    e.route_category,
+    e."single_source",
+    e.episode_number,
+    e.shortage_start_date,
+    e.resolution_date,
+    case when e.resolution_date is not null then true else false end as resolved,
+    coalesce(e.resolution_date, a.as_of_date) - e.shortage_start_date as duration_days
+from {{ ref('int_shortage_survival_episodes') }} e
+cross join as_of a
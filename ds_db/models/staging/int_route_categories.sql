@@ -0,0 +1,39 @@
+{{ config(
+    materialized='incremental',
+    unique_key='route_name_raw',
+    indexes=[
+        {'columns': ['route_name_raw'], 'unique': True}
+    ]
+) }}
+
+-- One row per distinct ndc_fda ROUTENAME with its route_category, so int_shortage_ndc
+-- joins on equality instead of evaluating every LIKE pattern for every shortage row.
+-- Rules live in seeds/route_category_rules.csv: the lowest-priority pattern matching
+-- lower(ROUTENAME) wins, and a route matching none is 'other'. etl/route_category.py
+-- applies the same file in Python. Incremental runs only classify routes not seen
+-- before; after editing the rules run
+--   dbt build --select route_category_rules+ --full-refresh
+
+with routes as (
+    select distinct n."ROUTENAME" as route_name_raw
+    from {{ source('drug_shortages', 'ndc_fda') }} n
+    where n."ROUTENAME" is not null
+    {% if is_incremental() %}
+      and not exists (
+          select 1 from {{ this }} existing
+          where existing.route_name_raw = n."ROUTENAME"
+      )
+    {% endif %}
+)
+
+select
+    r.route_name_raw,
+    coalesce(matched.route_category, 'other') as route_category
+from routes r
+left join lateral (
+    select rules.route_category
+    from {{ ref('route_category_rules') }} rules
+    where lower(r.route_name_raw) like rules.pattern
+    order by rules.priority
+    limit 1
+) matched on true
@@ -0,0 +1,77 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='series_key',
+    on_schema_change='append_new_columns',
+    post_hook='ANALYZE {{ this }}',
+    indexes=[
+        {'columns': ['series_key']},
+        {'columns': ['series_loaded_at']},
+        {'columns': ['generic_name', 'company_name', 'presentation', 'episode_start_date']}
+    ]
+) }}
+
+-- Shortage episodes per (generic_name, company_name, presentation) series, stored so
+-- drug_shortage_episodes does not rerun the lead() windows on every read. Incremental
+-- runs recompute only series with stg rows loaded since the last build; dbt deletes
+-- their stored episodes and inserts the new ones in one transaction. Load time is
+-- source_created_at, as historical rows carry a fixed created_at. A series' last
+-- episode is open: episode_end_date is null here and drug_shortage_episodes closes it
+-- at data_as_of_date(), so untouched series never need rewriting as time moves on.
+
+with
+{% if is_incremental() %}
+changed_series as (
+    select distinct generic_name, company_name, presentation
+    from {{ ref('stg_drug_shortages') }}
+    -- >= so rows sharing the last build's timestamp are picked up again; recomputing is idempotent
+    where source_created_at >= (
+        select coalesce(max(series_loaded_at), '-infinity'::timestamp)
+        from {{ this }}
+    )
+),
+{% endif %}
+
+base_data as (
+    select
+        s.generic_name,
+        s.company_name,
+        s.shortage_status,
+        s.update_date,
+        s.presentation,
+        s.therapeutic_category,
+        s.source_created_at
+    from {{ ref('stg_drug_shortages') }} s
+    {% if is_incremental() %}
+    join changed_series c
+        on s.generic_name = c.generic_name
+       and s.company_name is not distinct from c.company_name
+       and s.presentation is not distinct from c.presentation
+    {% endif %}
+    where s.generic_name is not null
+      and s.update_date is not null
+),
+
+episodes as (
+    select
+        md5(row(generic_name, company_name, presentation)::text)::uuid as series_key,
+        generic_name,
+        company_name,
+        presentation,
+        therapeutic_category,
+        shortage_status,
+        update_date as episode_start_date,
+        lead(update_date) over (
+            partition by generic_name, company_name, presentation
+            order by update_date
+        ) as episode_end_date,
+        max(source_created_at) over (
+            partition by generic_name, company_name, presentation
+        ) as series_loaded_at
+    from base_data
+)
+
+select *
+from episodes
+where episode_end_date > episode_start_date
+   or episode_end_date is null
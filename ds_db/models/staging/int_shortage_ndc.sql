@@ -1,4 +1,10 @@
-{{ config(materialized='view') }}
+{{ config(
+    materialized='view',
+    pre_hook='CREATE INDEX IF NOT EXISTS idx_ndc_fda_productndc ON {{ source("drug_shortages", "ndc_fda") }} ("PRODUCTNDC")'
+) }}
+
+-- stg_drug_shortages stores the normalized ndc with an index, and ndc_fda gets one on
+-- PRODUCTNDC above, so the join below can use either side's index.
 
 with shortages as (
     select * from {{ ref('stg_drug_shortages') }}
@@ -28,49 +34,13 @@ joined as (
 ),
 
 classified as (
+    -- Route categories are precomputed once per distinct ROUTENAME (int_route_categories)
     select
-        *,
-        case
-            when lower(route_name_raw) like any(array[
-                '%intravenous%', '%intramuscular%', '%subcutaneous%', '%parenteral%',
-                '%epidural%', '%intrathecal%', '%intradermal%', '%intraperitoneal%',
-                '%intrapleural%', '%intravascular%', '%intracardiac%', '%intracavitary%',
-                '%intracoronary%', '%intraventricular%', '%intracerebral%', '%intramedullary%',
-                '%intralesional%', '%subarachnoid%', '%intraspinal%', '%perineural%',
-                '%infiltration%', '%submucosal%', '%intrathoracic%', '%intrauterine%',
-                '%intragastric%', '%intraepidermal%', '%intrasinal%', '%hemodialysis%',
-                '%extracorporeal%', '%retrobulbar%', '%subgingival%', '%endocervical%',
-                '%intraluminal%', '%intramedullary%', '%intracavernous%', '%intratympanic%'
-            ]) then 'injectable'
-            when lower(route_name_raw) like any(array[
-                '%inhalation%', '%endotracheal%', '%intrabronchial%',
-                '%laryngeal%', '%transtracheal%'
-            ]) then 'inhalation'
-            when lower(route_name_raw) like any(array[
-                '%ophthalmic%', '%intraocular%', '%intravitreal%',
-                '%intracameral%', '%intracanalicular%', '%suprachoroidal%', '%conjunctival%'
-            ]) then 'ophthalmic'
-            when lower(route_name_raw) like any(array[
-                '%oral%', '%sublingual%', '%buccal%', '%enteral%',
-                '%oropharyngeal%', '%nasogastric%', '%transmucosal%'
-            ]) then 'oral'
-            when lower(route_name_raw) like any(array[
-                '%topical%', '%cutaneous%', '%transdermal%', '%percutaneous%'
-            ]) then 'topical'
-            when lower(route_name_raw) like '%nasal%' then 'nasal'
-            when lower(route_name_raw) like any(array['%otic%', '%intratympanic%']) then 'otic'
-            when lower(route_name_raw) like '%rectal%' then 'rectal'
-            when lower(route_name_raw) like '%vaginal%' then 'vaginal'
-            when lower(route_name_raw) like any(array[
-                '%dental%', '%periodontal%', '%subgingival%'
-            ]) then 'dental'
-            when lower(route_name_raw) like any(array[
-                '%ureteral%', '%urethral%', '%intravesical%', '%irrigation%'
-            ]) then 'urological'
-            when route_name_raw is null then null
-            else 'other'
-        end as route_category
-    from joined
+        j.*,
+        r.route_category
+    from joined j
+    left join {{ ref('int_route_categories') }} r
+        on r.route_name_raw = j.route_name_raw
 )
 
 select
@@ -0,0 +1,158 @@
+{{ config(
+    materialized='incremental',
+    incremental_strategy='delete+insert',
+    unique_key='drug_key',
+    on_schema_change='append_new_columns',
+    post_hook=[
+        "delete from {{ this }} stored
+         where not exists (
+             select 1 from {{ ref('int_shortage_ndc') }} s
+             where md5(row(s.drug_identifier, s.route_category, s.\"single_source\")::text)::uuid = stored.drug_key
+               and s.update_date is not null
+               and s.shortage_status in ('new', 'continued')
+         )",
+        'ANALYZE {{ this }}'
+    ],
+    indexes=[
+        {'columns': ['drug_key']},
+        {'columns': ['drug_loaded_at']}
+    ]
+) }}
+
+-- Every shortage episode per (drug_identifier, route_category, single_source), found
+-- with one ordered scan (gaps and islands). Each date is a shortage day if any update
+-- that day is new or continued, and an ended day otherwise. An episode starts on a
+-- shortage day that follows an ended day (or opens the history) and resolves on the
+-- next ended day; until then resolution_date is null and mart_shortage_survival
+-- censors it at data_as_of_date(). Discontinued updates are excluded.
+-- dashboard/survival.shortage_runs is the NumPy equivalent.
+-- Incremental runs recompute only drugs with rows loaded (source_created_at, as
+-- historical rows carry a fixed created_at) since the last build, or whose number of
+-- rows differs from the source_rows stored with their episodes, and
+-- replace their episodes in one transaction. The count catches rows that changed key
+-- without being reloaded (ndc_fda or the route rules changed), and a key that lost
+-- all its shortage rows is dropped by the post-hook. A change that moves rows but
+-- leaves every count equal goes unnoticed; after editing ndc_fda or the rules, run
+--   dbt build --select route_category_rules+ --full-refresh
+
+with
+{% if is_incremental() %}
+changed_drugs as (
+    select distinct drug_identifier, route_category, "single_source"
+    from {{ ref('int_shortage_ndc') }}
+    -- >= so rows sharing the last build's timestamp are picked up again; recomputing is idempotent
+    where source_created_at >= (
+        select coalesce(max(drug_loaded_at), '-infinity'::timestamp)
+        from {{ this }}
+    )
+
+    union
+
+    -- Drugs whose row count moved, including new keys: every drug with a shortage row
+    -- has episodes stored. Before source_rows existed every drug is recomputed once.
+    select drug_identifier, route_category, "single_source"
+    from (
+        select drug_identifier, route_category, "single_source", count(*) as source_rows
+        from {{ ref('int_shortage_ndc') }}
+        where drug_identifier is not null
+          and update_date is not null
+          and shortage_status is not null
+          and shortage_status != 'discontinued'
+        group by drug_identifier, route_category, "single_source"
+        having bool_or(shortage_status in ('new', 'continued'))
+    ) current_drugs
+    {% set stored_columns = adapter.get_columns_in_relation(this) | map(attribute='name') | list %}
+    {% if 'source_rows' in stored_columns %}
+    where not exists (
+        select 1 from {{ this }} stored
+        where stored.drug_key = md5(row(current_drugs.drug_identifier, current_drugs.route_category,
+                                        current_drugs."single_source")::text)::uuid
+          and stored.source_rows = current_drugs.source_rows
+    )
+    {% endif %}
+),
+{% endif %}
+
+shortage_data as (
+    select
+        s.drug_identifier,
+        s.route_category,
+        s."single_source",
+        s.shortage_status,
+        s.update_date,
+        s.source_created_at
+    from {{ ref('int_shortage_ndc') }} s
+    {% if is_incremental() %}
+    join changed_drugs c
+        on s.drug_identifier = c.drug_identifier
+       and s.route_category is not distinct from c.route_category
+       and s."single_source" is not distinct from c."single_source"
+    {% endif %}
+    where s.drug_identifier is not null
+      and s.update_date is not null
+      and s.shortage_status is not null
+      and s.shortage_status != 'discontinued'
+),
+
+daily as (
+    select
+        drug_identifier,
+        route_category,
+        "single_source",
+        update_date,
+        bool_or(shortage_status in ('new', 'continued')) as in_shortage,
+        max(source_created_at) as loaded_at,
+        count(*) as day_rows
+    from shortage_data
+    group by drug_identifier, route_category, "single_source", update_date
+),
+
+state_changes as (
+    -- The ordered scan: a day whose state differs from the previous day's starts a run
+    select
+        *,
+        lag(in_shortage) over (
+            partition by drug_identifier, route_category, "single_source"
+            order by update_date
+        ) as previous_in_shortage,
+        max(loaded_at) over (
+            partition by drug_identifier, route_category, "single_source"
+        ) as drug_loaded_at,
+        sum(day_rows) over (
+            partition by drug_identifier, route_category, "single_source"
+        ) as source_rows
+    from daily
+),
+
+runs as (
+    -- Runs alternate, so the run after a shortage run is the ended run that resolves it
+    select
+        drug_identifier,
+        route_category,
+        "single_source",
+        in_shortage,
+        update_date as run_start_date,
+        lead(update_date) over drug_runs as next_run_start_date,
+        count(*) filter (where in_shortage) over drug_runs as episode_number,
+        drug_loaded_at,
+        source_rows
+    from state_changes
+    where in_shortage is distinct from previous_in_shortage
+    window drug_runs as (
+        partition by drug_identifier, route_category, "single_source"
+        order by update_date
+    )
+)
+
+select
+    md5(row(drug_identifier, route_category, "single_source")::text)::uuid as drug_key,
+    drug_identifier,
+    route_category,
+    "single_source",
+    episode_number,
+    run_start_date as shortage_start_date,
+    next_run_start_date as resolution_date,
+    drug_loaded_at,
+    source_rows::bigint as source_rows
+from runs
+where in_shortage
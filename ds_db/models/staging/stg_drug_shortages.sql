@@ -1,9 +1,36 @@
-{{ config(materialized='view') }}
+{{ config(
+    materialized='incremental',
+    incremental_strategy='append',
+    on_schema_change='append_new_columns',
+    post_hook='ANALYZE {{ this }}',
+    indexes=[
+        {'columns': ['ndc']},
+        {'columns': ['content_hash']},
+        {'columns': ['created_at']},
+        {'columns': ['source_created_at']},
+        {'columns': ['generic_name', 'company_name', 'presentation', 'update_date']}
+    ]
+) }}
 
--- This model performs light data cleaning and transformation on the combined drug shortages data
+-- This model performs light data cleaning and transformation on the combined drug shortages data.
+-- It is stored with one row per (record, NDC) so the NDC split and normalization run once
+-- per record, and int_shortage_ndc joins an indexed ndc column instead of recomputing it on
+-- every read. drug_shortages_combined is append-only, so incremental runs append the
+-- exploded rows of records added since the last run. The watermark is source_created_at:
+-- historical rows carry a fixed created_at, so one merged into drug_shortages_combined
+-- after newer staging rows would fall below a created_at watermark.
 
 with source_data as (
     select * from {{ ref('drug_shortages_combined') }}
+    {% if is_incremental() %}
+    where source_created_at >= (
+        select coalesce(max(source_created_at), '-infinity'::timestamp) from {{ this }}
+    )
+      and not exists (
+          select 1 from {{ this }} existing
+          where existing.content_hash = drug_shortages_combined.content_hash
+      )
+    {% endif %}
 ),
 
 cleaned as (
@@ -33,7 +60,9 @@ cleaned as (
         end as date_discontinued,
         shortage_status,
         ndc,
-        created_at
+        created_at,
+        source_created_at,
+        content_hash
     from source_data
 ),
 
@@ -55,7 +84,9 @@ exploded as (
         date_discontinued,
         shortage_status,
         trim(regexp_replace(unnest(coalesce(string_to_array(ndc, ','), array[null::text])),'-[^-]*$', '')) as ndc_raw,
-        created_at
+        created_at,
+        source_created_at,
+        content_hash
     from cleaned
 )
 
@@ -76,5 +107,7 @@ select
     date_discontinued,
     shortage_status,
     nullif(ndc_raw, '') as ndc,
-    created_at
+    created_at,
+    source_created_at,
+    content_hash
 from exploded
\ No newline at end of file
@@ -0,0 +1,120 @@
+import io
+import json
+import zipfile
+from typing import IO, Dict, Iterator, List, Optional
+
+# openFDA bulk downloads are one JSON document: {"meta": {...}, "results": [ ... ]}
+RESULTS_KEY = 'results'
+READ_SIZE = 1024 * 1024
+WHITESPACE = ' \t\r\n'
+# Characters a JSON number can continue with
+NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+
+class _Scanner:
+    """Incremental reader over a text stream; holds at most one record plus READ_SIZE in memory"""
+
+    def __init__(self, stream: IO[str], read_size: int = READ_SIZE):
+        self.stream = stream
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, or '' at end of stream"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in bulk JSON, found {found!r}")
+        self.pos += 1
+
+    def _runs_to_edge(self, start: int) -> bool:
+        """Whether only number characters follow `start` up to the end of the buffer"""
+        return all(self.buffer[i] in NUMBER_CHARS for i in range(start, len(self.buffer)))
+
+    def value(self):
+        """Decode the next complete JSON value, reading more input until it parses"""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut at the buffer edge decodes as its prefix ('4444.' as 4444,
+            # '1e' as 1): unless something other than number characters follows it,
+            # read more and decode again
+            if isinstance(value, (int, float)) and self._runs_to_edge(end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_results(stream: IO[str], read_size: int = READ_SIZE) -> Iterator[Dict]:
+    """Yield the elements of the top-level "results" array one at a time"""
+    scanner = _Scanner(stream, read_size)
+    scanner.expect('{')
+    while scanner.peek() != '}':
+        key = scanner.value()
+        scanner.expect(':')
+        if key != RESULTS_KEY:
+            scanner.value()
+        else:
+            scanner.expect('[')
+            while scanner.peek() != ']':
+                yield scanner.value()
+                if scanner.peek() == ',':
+                    scanner.pos += 1
+            scanner.expect(']')
+        if scanner.peek() == ',':
+            scanner.pos += 1
+
+
+def iter_zip_records(path: str, member: Optional[str] = None, read_size: int = READ_SIZE) -> Iterator[Dict]:
+    """Stream records from a zipped openFDA download (or a plain .json file)"""
+    if not zipfile.is_zipfile(path):
+        with open(path, encoding='utf-8') as f:
+            yield from iter_results(f, read_size)
+        return
+
+    with zipfile.ZipFile(path) as archive:
+        if member is None:
+            members = [name for name in archive.namelist() if name.endswith('.json')]
+            if len(members) != 1:
+                raise ValueError(f"Expected one .json member in {path}, found {members}")
+            member = members[0]
+        with archive.open(member) as raw:
+            yield from iter_results(io.TextIOWrapper(raw, encoding='utf-8'), read_size)
+
+
+def batched(records: Iterator[Dict], batch_size: int) -> Iterator[List[Dict]]:
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
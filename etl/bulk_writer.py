@@ -0,0 +1,198 @@
+import json
+import logging
+import random
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+import numpy as np
+import pandas as pd
+
+# HTTP statuses worth retrying: request timeout, too early, rate limited, and the
+# server and gateway errors a restart or overload produces
+TRANSIENT_HTTP_STATUSES = {'408', '425', '429', '500', '502', '503', '504'}
+# Postgres SQLSTATEs worth retrying: statement timeout, serialization failure, deadlock,
+# and the classes insufficient resources (53) and connection exception (08)
+TRANSIENT_SQLSTATES = {'57014', '40001', '40P01'}
+TRANSIENT_SQLSTATE_CLASSES = {'08', '53'}
+STATEMENT_TIMEOUT_SQLSTATE = '57014'
+# SQLSTATE classes caused by particular rows: cardinality violation (a key twice in one
+# upsert), data exception (a bad date or number), integrity constraint violation
+ROW_LEVEL_SQLSTATE_CLASSES = {'21', '22', '23'}
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+        return True
+    code = str(getattr(error, 'code', '') or '')
+    return (code in TRANSIENT_HTTP_STATUSES or code in TRANSIENT_SQLSTATES
+            or (len(code) == 5 and code[:2] in TRANSIENT_SQLSTATE_CLASSES) or 'timeout' in str(error).lower())
+
+
+def is_statement_timeout(error: Exception) -> bool:
+    """A query cancelled for running too long, which a smaller chunk can get past"""
+    code = str(getattr(error, 'code', '') or '')
+    return code == STATEMENT_TIMEOUT_SQLSTATE or 'statement timeout' in str(error).lower()
+
+
+def is_row_level(error: Exception) -> bool:
+    """An error some rows of the chunk cause, which a smaller chunk can get past"""
+    code = str(getattr(error, 'code', '') or '')
+    return code[:2] in ROW_LEVEL_SQLSTATE_CLASSES or code == '413' or 'too large' in str(error).lower()
+
+
+def scrub_records(df: pd.DataFrame) -> List[Dict]:
+    """JSON-ready records: NaN/NaT become None and datetimes become ISO strings, column-wise"""
+    df = df.copy()
+    for column in df.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        df[column] = df[column].map(lambda ts: ts.isoformat(), na_action='ignore')
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+
+class WriteStats:
+    def __init__(self, table: str):
+        self.table = table
+        self.rows_written = 0
+        self.chunks = 0
+        self.retries = 0
+        self.latencies: List[float] = []
+        self.failed_records: List[Dict] = []
+        self.errors: List[str] = []
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows_written / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        p50, p95 = np.percentile(self.latencies, [50, 95]) if self.latencies else (0.0, 0.0)
+        return (f"{self.table}: wrote {self.rows_written} rows in {self.chunks} chunks over {self.elapsed:.2f}s "
+                f"({self.rows_per_sec:.0f} rows/sec; chunk latency p50 {p50:.2f}s, p95 {p95:.2f}s; "
+                f"{self.retries} retries, {len(self.failed_records)} failed rows)")
+
+
+class BulkWriter:
+    """
+    Chunked, concurrent, retrying upsert into one Supabase table.
+
+    Records are cut into chunks of roughly `target_chunk_bytes` of JSON. The target
+    shrinks when chunks come back slow and grows while they are fast. Chunks are sent
+    on a bounded thread pool over the caller's client. Transient errors (timeouts,
+    429 and 5xx responses, lock/serialization failures) are retried with backoff. A
+    chunk that still fails on a row-level error (a constraint violation, a bad value,
+    an oversized payload) or a statement timeout is split in half and resent, so one
+    bad row ends up isolated in `failed_records` and does not sink the whole load. Any
+    other error (auth, a missing table or column, an outage that outlasts the retries)
+    would fail every row alike, so it fails the chunk and everything not yet sent at
+    once instead of being bisected request by request.
+    """
+
+    def __init__(self, client, table: str, on_conflict: str = 'id', ignore_duplicates: bool = False,
+                 max_workers: int = 4, target_chunk_bytes: int = 256 * 1024,
+                 min_chunk_bytes: int = 16 * 1024, max_chunk_bytes: int = 2 * 1024 * 1024,
+                 target_latency: float = 5.0, max_retries: int = 3, backoff_base: float = 0.5):
+        self.client = client
+        self.table = table
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.max_workers = max_workers
+        self.target_chunk_bytes = target_chunk_bytes
+        self.min_chunk_bytes = min_chunk_bytes
+        self.max_chunk_bytes = max_chunk_bytes
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.logger = logging.getLogger(__name__)
+
+    def _send(self, records: List[Dict]) -> Tuple[bool, float, int, Optional[Exception]]:
+        """Upsert one chunk; returns (ok, latency of the last attempt, retries, error)"""
+        for attempt in range(self.max_retries + 1):
+            started = time.perf_counter()
+            try:
+                self.client.table(self.table).upsert(
+                    records,
+                    on_conflict=self.on_conflict,
+                    ignore_duplicates=self.ignore_duplicates
+                ).execute()
+                return True, time.perf_counter() - started, attempt, None
+            except Exception as e:
+                latency = time.perf_counter() - started
+                if attempt == self.max_retries or not is_transient(e):
+                    return False, latency, attempt, e
+                time.sleep(self.backoff_base * (2 ** attempt) * random.uniform(0.5, 1.0))
+
+    def _adapt(self, latency: float, ok: bool):
+        # Halve the chunk size when a chunk is slow or fails, grow it gently while fast
+        if not ok or latency > self.target_latency:
+            self.target_chunk_bytes = max(self.min_chunk_bytes, self.target_chunk_bytes // 2)
+        elif latency < self.target_latency / 4:
+            self.target_chunk_bytes = min(self.max_chunk_bytes, int(self.target_chunk_bytes * 1.25))
+
+    def write(self, df: pd.DataFrame) -> WriteStats:
+        stats = WriteStats(self.table)
+        records = scrub_records(df)
+        if not records:
+            return stats
+
+        # Cumulative payload size, so chunk boundaries are a binary search away
+        sizes = np.fromiter((len(json.dumps(r, default=str)) + 1 for r in records), dtype=np.int64, count=len(records))
+        offsets = np.concatenate([[0], np.cumsum(sizes)])
+
+        def next_end(start: int) -> int:
+            end = int(np.searchsorted(offsets, offsets[start] + self.target_chunk_bytes, side='right')) - 1
+            return min(max(end, start + 1), len(records))
+
+        retry_ranges = deque()
+        cursor = 0
+        in_flight = {}
+        aborted = False
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            while cursor < len(records) or retry_ranges or in_flight:
+                while len(in_flight) < self.max_workers and (retry_ranges or cursor < len(records)):
+                    if retry_ranges:
+                        start, end = retry_ranges.popleft()
+                    else:
+                        start, end = cursor, next_end(cursor)
+                        cursor = end
+                    in_flight[pool.submit(self._send, records[start:end])] = (start, end)
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end = in_flight.pop(future)
+                    ok, latency, retries, error = future.result()
+                    stats.retries += retries
+                    self._adapt(latency, ok)
+
+                    if ok:
+                        stats.chunks += 1
+                        stats.rows_written += end - start
+                        stats.latencies.append(latency)
+                        self.logger.debug(f"{self.table}: chunk of {end - start} rows "
+                                          f"({offsets[end] - offsets[start]} bytes) in {latency:.2f}s")
+                    elif aborted or not (is_row_level(error) or is_statement_timeout(error)):
+                        # Sending the rest would only repeat the error
+                        unsent = [(start, end), *retry_ranges, (cursor, len(records))]
+                        retry_ranges.clear()
+                        cursor = len(records)
+                        aborted = True
+                        for first, last in unsent:
+                            stats.failed_records.extend(records[first:last])
+                        stats.errors.append(str(error))
+                        self.logger.error(f"{self.table}: chunk of {end - start} rows failed ({error}); "
+                                          f"not sending the remaining rows")
+                    elif end - start > 1:
+                        mid = (start + end) // 2
+                        self.logger.warning(f"{self.table}: chunk of {end - start} rows failed ({error}); splitting")
+                        retry_ranges.extend([(start, mid), (mid, end)])
+                    else:
+                        stats.failed_records.append(records[start])
+                        stats.errors.append(str(error))
+                        self.logger.error(f"{self.table}: row with id {records[start].get('id')} failed: {error}")
+
+        stats.elapsed = time.perf_counter() - stats.started
+        self.logger.info(str(stats))
+        return stats
@@ -0,0 +1,236 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from etl.response_cache import ResponseCache
+
+# openFDA serves at most 1000 rows per page and refuses skip values above 25000,
+# so a single query can reach at most MAX_SKIP + page_size rows.
+MAX_LIMIT = 1000
+MAX_SKIP = 25000
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+DATE_FORMAT = '%Y-%m-%d'
+
+Window = Tuple[str, str]
+
+
+class CacheMiss(requests.RequestException):
+    """A replayed request has no cached response (replay never goes to the network)"""
+
+
+class FetchStats:
+    """Counters for one fetch() call; shared by the worker threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.records = 0
+        self.requests = 0
+        self.retries = 0
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+
+    def add_request(self, retries: int = 0):
+        with self._lock:
+            self.requests += 1
+            self.retries += retries
+
+    def finish(self, records: int):
+        # Probe pages of bisected windows are discarded, so count what was returned
+        self.records = records
+        self.elapsed = time.perf_counter() - self.started
+
+    @property
+    def records_per_sec(self) -> float:
+        return self.records / self.elapsed if self.elapsed > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.records} records in {self.elapsed:.2f}s "
+                f"({self.records_per_sec:.0f} records/sec, {self.requests} requests, {self.retries} retries)")
+
+
+class OpenFDAFetcher:
+    """
+    Paginated, concurrent client for the openFDA search API.
+
+    A date range is split into sub-windows of `window_days`; each window is paged
+    with skip/limit and all pages are fetched on a bounded thread pool over one
+    pooled session. Windows whose total exceeds the skip cap are bisected until
+    every page is reachable. Results come back in (window, skip) order.
+
+    With a ResponseCache every response is also written to disk. With
+    replay=True pages are served only from that cache, so a recorded run can be
+    re-transformed and reloaded offline.
+    """
+
+    def __init__(self, base_url: str, max_workers: int = 4, window_days: int = 30,
+                 page_size: int = MAX_LIMIT, max_retries: int = 5, backoff_base: float = 1.0,
+                 backoff_max: float = 60.0, timeout: float = 30.0, api_key: Optional[str] = None,
+                 session: Optional[requests.Session] = None, cache: Optional[ResponseCache] = None,
+                 replay: bool = False):
+        if replay and cache is None:
+            raise ValueError("replay needs a response cache")
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self.window_days = window_days
+        self.page_size = min(page_size, MAX_LIMIT)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.api_key = api_key
+        self.session = session or self._build_session()
+        self.cache = cache
+        self.replay = replay
+        self.last_stats: Optional[FetchStats] = None
+        self.logger = logging.getLogger(__name__)
+
+    def _build_session(self) -> requests.Session:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def split_windows(self, start_date: str, end_date: str) -> List[Window]:
+        """Split an inclusive date range into consecutive, non-overlapping windows"""
+        start = datetime.strptime(start_date, DATE_FORMAT)
+        end = datetime.strptime(end_date, DATE_FORMAT)
+        step = timedelta(days=self.window_days)
+        windows = []
+        while start <= end:
+            window_end = min(start + step - timedelta(days=1), end)
+            windows.append((start.strftime(DATE_FORMAT), window_end.strftime(DATE_FORMAT)))
+            start = window_end + timedelta(days=1)
+        return windows
+
+    @staticmethod
+    def _bisect(window: Window) -> Optional[List[Window]]:
+        start = datetime.strptime(window[0], DATE_FORMAT)
+        end = datetime.strptime(window[1], DATE_FORMAT)
+        if start >= end:
+            return None
+        mid = start + (end - start) // 2
+        return [
+            (window[0], mid.strftime(DATE_FORMAT)),
+            ((mid + timedelta(days=1)).strftime(DATE_FORMAT), window[1]),
+        ]
+
+    def _backoff(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        # Honour the server's Retry-After on 429/503, otherwise exponential backoff with jitter
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after is not None:
+                try:
+                    return min(float(retry_after), self.backoff_max)
+                except ValueError:
+                    pass
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _get(self, params: Dict, stats: FetchStats) -> Dict:
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            response = None
+            try:
+                response = self.session.get(self.base_url, params=params, timeout=self.timeout)
+                # openFDA answers an empty search with 404 NOT_FOUND rather than an empty page
+                if response.status_code == 404:
+                    stats.add_request(retries=attempt)
+                    return {'meta': {'results': {'total': 0}}, 'results': []}
+                if response.status_code not in RETRY_STATUSES:
+                    response.raise_for_status()
+                    data = response.json()
+                    stats.add_request(retries=attempt)
+                    return data
+                last_error = requests.HTTPError(
+                    f"{response.status_code} from {self.base_url}", response=response
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                last_error = e
+
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, response)
+                self.logger.warning(f"Retrying openFDA request ({last_error}); sleeping {delay:.1f}s")
+                time.sleep(delay)
+
+        stats.add_request(retries=self.max_retries)
+        raise last_error
+
+    def _cached_get(self, params: Dict, stats: FetchStats) -> Dict:
+        if self.replay:
+            data = self.cache.get(self.base_url, params)
+            if data is None:
+                raise CacheMiss(f"No cached response for {params}")
+            stats.add_request()
+            return data
+
+        request_params = dict(params, api_key=self.api_key) if self.api_key else params
+        data = self._get(request_params, stats)
+        if self.cache is not None:
+            self.cache.put(self.base_url, params, data)
+        return data
+
+    def fetch_page(self, window: Window, skip: int, stats: FetchStats,
+                   page_size: Optional[int] = None) -> Tuple[List[Dict], int]:
+        params = {
+            'search': f"update_date:[{window[0]} TO {window[1]}]",
+            'limit': page_size or self.page_size,
+            'skip': skip,
+        }
+        data = self._cached_get(params, stats)
+        total = data.get('meta', {}).get('results', {}).get('total', 0)
+        return data.get('results', []), total
+
+    def fetch(self, start_date: str, end_date: str, page_size: Optional[int] = None) -> List[Dict]:
+        """Fetch every record updated between start_date and end_date (inclusive)"""
+        page_size = min(page_size or self.page_size, MAX_LIMIT)
+        max_reachable = MAX_SKIP + page_size
+        stats = FetchStats()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            # Probe the first page of each window; oversized windows are bisected and re-probed
+            resolved = []
+            pending = self.split_windows(start_date, end_date)
+            while pending:
+                first_pages = list(pool.map(lambda w: self.fetch_page(w, 0, stats, page_size), pending))
+                next_pending = []
+                for window, (results, total) in zip(pending, first_pages):
+                    halves = self._bisect(window) if total > max_reachable else None
+                    if halves:
+                        next_pending.extend(halves)
+                        continue
+                    if total > max_reachable:
+                        self.logger.warning(
+                            f"{total} records on {window[0]} exceed the openFDA skip cap; "
+                            f"only the first {max_reachable} are reachable"
+                        )
+                    resolved.append((window, results, total))
+                pending = next_pending
+            resolved.sort(key=lambda r: r[0][0])
+
+            # Remaining pages of every window, all in flight at once on the bounded pool
+            futures = [
+                [pool.submit(self.fetch_page, window, skip, stats, page_size)
+                 for skip in range(page_size, min(total, max_reachable), page_size)]
+                for window, _, total in resolved
+            ]
+
+            merged: List[Dict] = []
+            for (_, first_results, _), window_futures in zip(resolved, futures):
+                merged.extend(first_results)
+                for future in window_futures:
+                    merged.extend(future.result()[0])
+
+        if self.cache is not None and not self.replay:
+            self.cache.record_run(start_date, end_date, self.window_days, page_size)
+        stats.finish(len(merged))
+        self.last_stats = stats
+        self.logger.info(f"Fetched {stats}")
+        return merged
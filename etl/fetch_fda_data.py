@@ -1,29 +1,67 @@
+import argparse
 import requests
 import json
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from typing import List, Dict, Optional, Set, Union
+from typing import List, Dict, Optional, Tuple, Union
 import os
+import resource
+import sys
+import time
 from dotenv import load_dotenv
-from supabase import create_client, Client, ClientOptions
 import logging
-import hashlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.bulk_download import batched, iter_zip_records
+from etl.fetch_engine import CacheMiss, OpenFDAFetcher
+from etl.response_cache import ResponseCache
+from etl.ids import content_id, normalize_date, row_fingerprints
+from etl.state import ETLState, to_day
+from etl.storage import StorageBackend, SupabaseBackend, get_backend
+from etl.transform import records_to_frame, transform_columnar
 
 load_dotenv()
 
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
 class OpenFDAETL:
-    def __init__(self):
-        # set up connection to PostgreSQL database
-        self.supabase_url = os.getenv("SUPABASE_URL")
-        self.supabase_key = os.getenv("SUPABASE_ANON_KEY")
-        self.supabase: Client = create_client(
-            self.supabase_url,
-            self.supabase_key,
-            options=ClientOptions(postgrest_client_timeout=30)
-        )
+    def __init__(self, max_workers: int = 4, window_days: int = 30,
+                 state_dir: Optional[str] = None, overlap_days: Optional[int] = None,
+                 cache_dir: Optional[str] = None, replay: bool = False,
+                 storage: Optional[StorageBackend] = None):
+        # Storage backend: `storage` when given, otherwise the one STORAGE_BACKEND
+        # selects (Supabase by default), opened on first use
+        self._storage: Optional[StorageBackend] = storage
 
         # OpenFDA API base URL
         self.base_url = "https://api.fda.gov/drug/shortages.json"
+
+        # Every raw response is kept in a gzipped on-disk cache; replay=True serves
+        # fetches from it alone so transform/load can be re-run without the API
+        self.cache = ResponseCache(
+            cache_dir or os.getenv("OPENFDA_CACHE_DIR", os.path.join(PROJECT_DIR, 'cache', 'openfda')),
+            max_bytes=int(os.getenv("OPENFDA_CACHE_MAX_MB", 512)) * 1024 * 1024,
+            max_age_days=float(os.getenv("OPENFDA_CACHE_MAX_AGE_DAYS", 180))
+        )
+        self.replay = replay
+
+        # Paginated, concurrent fetcher sharing one pooled HTTP session
+        self.fetcher = OpenFDAFetcher(
+            self.base_url,
+            max_workers=max_workers,
+            window_days=window_days,
+            api_key=os.getenv("OPENFDA_API_KEY"),
+            cache=self.cache,
+            replay=replay
+        )
+
+        # Incremental fetch state: update_date watermark plus fingerprints of loaded records.
+        # Delete the state directory after wiping the database to force a fresh backfill.
+        self.state = ETLState(state_dir or os.getenv("ETL_STATE_DIR", os.path.join(PROJECT_DIR, 'state')))
+        if overlap_days is None:
+            overlap_days = int(os.getenv("ETL_WATERMARK_OVERLAP_DAYS", 3))
+        self.overlap_days = overlap_days
         
         # create logging for debugging
         logging.basicConfig(
@@ -31,7 +69,12 @@ class OpenFDAETL:
             format='%(asctime)s - %(levelname)s - %(message)s'
         )
         self.logger = logging.getLogger(__name__)
-        
+
+    @property
+    def storage(self) -> StorageBackend:
+        if self._storage is None:
+            self._storage = get_backend()
+        return self._storage
         
     def classify_shortage_status(self, update_type: str, status: str) -> str:
             """
@@ -65,27 +108,27 @@ class OpenFDAETL:
             end_date.strftime('%Y-%m-%d')
         )
 
+    def get_fetch_window(self) -> Tuple[str, str]:
+        """Fetch from the watermark minus a small overlap; the first run falls back to the last 15 days"""
+        if self.state.watermark is None:
+            return self.get_date_range(days_back=15)
+        start_date = datetime.strptime(self.state.watermark, '%Y-%m-%d') - timedelta(days=self.overlap_days)
+        return start_date.strftime('%Y-%m-%d'), datetime.now().strftime('%Y-%m-%d')
+
     def fetch_shortage_data(self, start_date: str, end_date: str, limit: int = 1000) -> Optional[List[Dict]]:
-        search_query = f"update_date:[{start_date} TO {end_date}]"
-        params = {
-            "search": search_query,
-            "limit": limit
-        }
-        
         try:
             self.logger.info(f"Fetching drug shortage data from {start_date} to {end_date}")
-            response = requests.get(self.base_url, params=params)
-            response.raise_for_status()
-            
-            data = response.json()
+            results = self.fetcher.fetch(start_date, end_date, page_size=limit)
             
-            if 'results' in data:
-                self.logger.info(f"Successfully fetched {len(data['results'])} records")
-                return data['results']
+            if results:
+                self.logger.info(f"Successfully fetched {len(results)} records")
             else:
                 self.logger.warning("No results found in API response")
-                return []
+            return results
                 
+        except CacheMiss as e:
+            self.logger.error(f"Replay failed, response not in cache: {e}")
+            return None
         # handle request exception
         except requests.RequestException as e:
             self.logger.error(f"Error fetching data from OpenFDA API: {e}")
@@ -95,47 +138,59 @@ class OpenFDAETL:
             self.logger.error(f"Error parsing JSON response: {e}")
             return None
 
-    def get_existing_ids(self) -> Set[int]:
-        """Fetch existing IDs from the staging table to avoid duplicates"""
-        try:
-            result = self.supabase.table('drug_shortages_staging').select('id').execute()
-            existing_ids = {int(row['id']) for row in result.data if row['id'] is not None} if result.data else set()
-            self.logger.info(f"Found {len(existing_ids)} existing records in database")
-            return existing_ids
-        except Exception as e:
-            self.logger.warning(f"Could not fetch existing IDs: {e}")
-            return set()
-
-    def generate_unique_id(self, record: Dict, existing_ids: Set[int]) -> int:
-        """Generate a unique integer ID based on record content"""
-        # Create a hash from key fields that make a record unique
-        key_fields = [
-            str(record.get('generic_name', '')),
-            str(record.get('company_name', '')),
-            str(record.get('presentation', '')),
-            str(record.get('update_date', '')),
-            str(record.get('package_ndc', ''))
-        ]
-        
-        # Create base hash and convert to integer
-        content = '|'.join(key_fields)
-        hash_obj = hashlib.md5(content.encode())
-        base_id = int(hash_obj.hexdigest()[:8], 16)  # Use first 8 hex chars as int
-        
-        # Ensure uniqueness by incrementing if needed
-        unique_id = base_id
-        while unique_id in existing_ids:
-            unique_id += 1
-            
-        existing_ids.add(unique_id)
-        return unique_id
+    def fingerprint(self, raw_data: List[Dict]) -> Tuple[np.ndarray, np.ndarray, Optional[str]]:
+        """Content fingerprint and update day of every record, plus the batch's latest update_date"""
+        frame = records_to_frame(raw_data)
+        fingerprints = row_fingerprints(frame, frame.columns)
+
+        dates = frame['update_date'].map({v: normalize_date(v) for v in frame['update_date'].dropna().unique()})
+        dates = pd.to_datetime(dates, format='%Y-%m-%d', errors='coerce')
+        watermark = dates.max().strftime('%Y-%m-%d') if dates.notna().any() else None
+        # Undated records are kept for a full window
+        update_days = (dates.fillna(pd.Timestamp.now().normalize()).to_numpy().astype('datetime64[D]')
+                       .astype(np.int64)).astype(np.int32)
+        return fingerprints, update_days, watermark
+
+    def drop_unchanged(self, raw_data: List[Dict]) -> Tuple[List[Dict], np.ndarray, np.ndarray, Optional[str]]:
+        """
+        Fingerprint every fetched record and drop those already loaded unchanged.
+        Returns the changed records plus what to commit to the state once they are loaded.
+        """
+        fingerprints, update_days, watermark = self.fingerprint(raw_data)
+        unchanged = self.state.seen(fingerprints)
+
+        changed = [record for record, seen in zip(raw_data, unchanged) if not seen]
+        self.logger.info(f"{len(changed)} of {len(raw_data)} fetched records are new or changed")
+        return changed, fingerprints[~unchanged], update_days[~unchanged], watermark
+
+    def commit_state(self, fingerprints: np.ndarray, update_days: np.ndarray, watermark: Optional[str]):
+        # Anything older than the next window's start can never be re-served
+        keep_from_day = to_day(watermark) - self.overlap_days if watermark else None
+        self.state.commit(fingerprints, update_days, watermark, keep_from_day=keep_from_day)
+        self.logger.info(f"Watermark now {self.state.watermark} ({len(self.state.fingerprints)} fingerprints kept)")
+
+    def generate_unique_id(self, record: Dict) -> int:
+        """Generate a deterministic 64-bit ID from the record's key fields"""
+        return content_id({
+            'generic_name': record.get('generic_name'),
+            'company_name': record.get('company_name'),
+            'presentation': record.get('presentation'),
+            'update_date': record.get('update_date'),
+            'ndc': record.get('package_ndc')
+        })
+
+    def transform_data(self, raw_data: List[Dict], columnar: bool = True) -> pd.DataFrame:
+        """
+        Transform raw API records into the staging schema.
+        columnar=True normalizes the batch once and classifies/hashes in bulk;
+        columnar=False is the original per-record loop (same output).
+        """
+        if columnar:
+            return transform_columnar(raw_data)
 
-    def transform_data(self, raw_data: List[Dict]) -> pd.DataFrame:
         transformed_records = []
-        existing_ids = self.get_existing_ids()
-        
         for record in raw_data:
-            unique_id = self.generate_unique_id(record, existing_ids)
+            unique_id = self.generate_unique_id(record)
             transformed_record = {
                 'id': unique_id,
                 'generic_name': record.get('generic_name'),
@@ -169,19 +224,18 @@ class OpenFDAETL:
     
     def load_to_staging(self, df: pd.DataFrame) -> bool:
         try:
-            records = df.to_dict('records')
-            
-            for record in records:
-                for key, value in record.items():
-                    if pd.isna(value):
-                        record[key] = None
-            
-            result = self.supabase.table('drug_shortages_staging').upsert(
-                records, 
-                on_conflict='id'
-            ).execute()
+            # Content ids make repeated records identical; keep one per id so the
+            # upsert never touches the same row twice
+            df = df.drop_duplicates('id', keep='last')
+
+            # On Supabase a chunked, concurrent upsert; a bad row or a timeout only fails its own chunk
+            stats = self.storage.write('drug_shortages_staging', df, on_conflict='id')
             
-            self.logger.info(f"Successfully loaded {len(records)} records to staging table")
+            if stats.failed_records:
+                self.logger.error(f"{len(stats.failed_records)} of {len(df)} records failed to load to staging table")
+                return False
+
+            self.logger.info(f"Successfully loaded {stats.rows_written} records to staging table")
             return True
             
         except Exception as e:
@@ -190,6 +244,9 @@ class OpenFDAETL:
 
     def ensure_schema_exists(self):
         """Ensure the required views and indexes exist"""
+        # The embedded store creates its tables when opened
+        if not isinstance(self.storage, SupabaseBackend):
+            return
         try:
             # Check if combined view exists, create if not
             check_view_sql = """
@@ -197,13 +254,13 @@ class OpenFDAETL:
             FROM information_schema.views 
             WHERE table_name = 'drug_shortages_combined'
             """
-            result = self.supabase.rpc('exec_sql', {'sql': check_view_sql}).execute()
+            result = self.storage.client.rpc('exec_sql', {'sql': check_view_sql}).execute()
             
             if result.data[0]['view_count'] == 0:
                 self.logger.info("Creating drug_shortages_combined view...")
                 with open('sql/create_staging_table.sql', 'r') as f:
                     sql_content = f.read()
-                self.supabase.rpc('exec_sql', {'sql': sql_content}).execute()
+                self.storage.client.rpc('exec_sql', {'sql': sql_content}).execute()
                 self.logger.info("Schema setup completed")
         except Exception as e:
             self.logger.warning(f"Could not auto-create schema: {e}")
@@ -238,7 +295,7 @@ class OpenFDAETL:
         #     return False
 
         try:
-            self.supabase.rpc('promote_staging_to_historical').execute()
+            self.storage.promote_staging_to_historical()
             self.logger.info("Promoted staging data to historical table and cleared staging successfully")
             return True
         except Exception as e:
@@ -257,8 +314,8 @@ class OpenFDAETL:
             self.logger.error("Failed to promote staging data to historical")
             return False
         
-        # Fetch new data (last 15 days)
-        start_date, end_date = self.get_date_range(days_back=15)
+        # Fetch only from the watermark (minus a small overlap) onwards
+        start_date, end_date = self.get_fetch_window()
         raw_data = self.fetch_shortage_data(start_date, end_date)
         
         if raw_data is None:
@@ -268,31 +325,126 @@ class OpenFDAETL:
         if not raw_data:
             self.logger.info("No new data to process")
             return True
+
+        # Drop records the overlap re-served unchanged
+        raw_data, fingerprints, update_days, watermark = self.drop_unchanged(raw_data)
+
+        if not raw_data:
+            self.logger.info("No changed records to process")
+            self.commit_state(fingerprints, update_days, watermark)
+            return True
         
         # Transform and load new data to staging
         df = self.transform_data(raw_data)
         
         if self.load_to_staging(df):
+            self.commit_state(fingerprints, update_days, watermark)
             self.logger.info("Weekly ETL process completed successfully")
             return True
         else:
             self.logger.error("Weekly ETL process failed during loading stage")
             return False
 
+    def replay_etl(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> bool:
+        """
+        Re-run transform and load for a recorded fetch using cached responses only.
+        Defaults to the most recently recorded run. Staging is upserted by content id,
+        so replaying is idempotent; promotion and the watermark state are left alone.
+        """
+        runs = self.cache.recorded_runs()
+        if start_date is None or end_date is None:
+            if not runs:
+                self.logger.error(f"No recorded runs in {self.cache.cache_dir} to replay")
+                return False
+            start_date, end_date = runs[-1]['start_date'], runs[-1]['end_date']
+
+        # The recorded window and page sizes reproduce the recorded sequence of requests, hence cache hits
+        matching = [run for run in runs if (run['start_date'], run['end_date']) == (start_date, end_date)]
+        page_size = self.fetcher.page_size
+        if matching:
+            self.fetcher.window_days = matching[-1]['window_days']
+            page_size = matching[-1]['page_size']
+
+        self.logger.info(f"Replaying cached fetch from {start_date} to {end_date}")
+        raw_data = self.fetch_shortage_data(start_date, end_date, limit=page_size)
+        if raw_data is None:
+            return False
+        if not raw_data:
+            self.logger.info("Cached run holds no records")
+            return True
+
+        if self.load_to_staging(self.transform_data(raw_data)):
+            self.logger.info(f"Replay completed ({self.cache.hits} cache hits)")
+            return True
+        self.logger.error("Replay failed during loading stage")
+        return False
+
+    def run_bulk_load(self, path: str, batch_size: int = 5000) -> bool:
+        """
+        Full rebuild from a downloaded openFDA bulk file (drug-shortages-*.json.zip).
+        Records are streamed out of the archive and sent through transform/load in
+        fixed-size batches, so peak memory depends on batch_size, not on file size.
+        Each loaded batch advances the watermark so weekly runs continue from there.
+        """
+        self.logger.info(f"Bulk loading {path} in batches of {batch_size}")
+        started = time.perf_counter()
+        loaded = 0
+
+        for batch_number, raw_data in enumerate(batched(iter_zip_records(path), batch_size), start=1):
+            fingerprints, update_days, watermark = self.fingerprint(raw_data)
+            if not self.load_to_staging(self.transform_data(raw_data)):
+                self.logger.error(f"Bulk load stopped at batch {batch_number} after {loaded} records")
+                return False
+            self.commit_state(fingerprints, update_days, watermark)
+
+            loaded += len(raw_data)
+            elapsed = time.perf_counter() - started
+            # ru_maxrss is reported in KB on Linux
+            peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+            self.logger.info(f"Batch {batch_number}: {loaded} records, {loaded / elapsed:.0f} records/sec, "
+                             f"peak RSS {peak_mb:.0f} MB")
+
+        self.logger.info(f"Bulk load completed: {loaded} records in {time.perf_counter() - started:.1f}s")
+        return True
+
 def main():
+    parser = argparse.ArgumentParser(description='Weekly openFDA drug shortage ETL')
+    parser.add_argument('--replay', action='store_true',
+                        help='transform and load cached responses without calling the API')
+    parser.add_argument('--start-date', help='replay window start (default: last recorded run)')
+    parser.add_argument('--end-date', help='replay window end (default: last recorded run)')
+    parser.add_argument('--bulk', metavar='PATH', help='load a downloaded openFDA bulk file instead of paging the API')
+    parser.add_argument('--batch-size', type=int, default=5000, help='records per transform/load batch in --bulk mode')
+    args = parser.parse_args()
+
+    if args.bulk:
+        if not OpenFDAETL().run_bulk_load(args.bulk, batch_size=args.batch_size):
+            print("❌ Bulk load failed")
+            exit(1)
+        print("✅ Bulk load completed")
+        return
+
+    if args.replay:
+        etl = OpenFDAETL(replay=True)
+        if not etl.replay_etl(args.start_date, args.end_date):
+            print("❌ Replay failed")
+            exit(1)
+        print("✅ Replay completed")
+        return
+
     etl = OpenFDAETL()
     
     # Count records before ETL
-    staging_before = etl.supabase.table('drug_shortages_staging').select('id', count='exact').execute().count or 0
-    historical_before = etl.supabase.table('drug_shortages_classified_raw').select('id', count='exact').execute().count or 0
+    staging_before = etl.storage.count('drug_shortages_staging')
+    historical_before = etl.storage.count('drug_shortages_classified_raw')
     
     # Run ETL
     success = etl.run_weekly_etl()
     
     if success:
         # Count records after ETL
-        staging_after = etl.supabase.table('drug_shortages_staging').select('id', count='exact').execute().count or 0
-        historical_after = etl.supabase.table('drug_shortages_classified_raw').select('id', count='exact').execute().count or 0
+        staging_after = etl.storage.count('drug_shortages_staging')
+        historical_after = etl.storage.count('drug_shortages_classified_raw')
         
         # Verify promotion worked correctly (upsert handles duplicates)
         if historical_after >= historical_before:
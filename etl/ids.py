@@ -0,0 +1,74 @@
+from functools import lru_cache
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+# Fields that identify a shortage record, in hashing order
+ID_KEY_FIELDS = ['generic_name', 'company_name', 'presentation', 'update_date', 'ndc']
+
+# Fixed 16-byte SipHash key. Changing it changes every id in the database.
+HASH_KEY = 'drug-shortage-id'
+# Keep ids within a signed BIGINT
+ID_MASK = np.uint64(2 ** 63 - 1)
+
+
+@lru_cache(maxsize=65536)
+def normalize_date(value) -> str:
+    """ISO date for hashing, so '4/26/24', '04/26/2024' and '2024-04-26' agree"""
+    ts = pd.to_datetime(value, errors='coerce')
+    if pd.isna(ts):
+        return str(value).strip()
+    return ts.strftime('%Y-%m-%d')
+
+
+def _key_part(series: pd.Series) -> pd.Series:
+    return series.astype(object).where(series.notna(), '').astype(str).str.strip()
+
+
+def _date_part(series: pd.Series) -> pd.Series:
+    # Parse once per distinct value; date columns repeat heavily
+    mapping = {value: normalize_date(value) for value in series.dropna().unique()}
+    return series.map(mapping).fillna('')
+
+
+def _hash_keys(keys: np.ndarray) -> np.ndarray:
+    hashed = pd.util.hash_array(keys, encoding='utf8', hash_key=HASH_KEY, categorize=False)
+    return (hashed & ID_MASK).astype(np.int64)
+
+
+def content_ids(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Deterministic 63-bit ids for every row of `frame`, hashed from ID_KEY_FIELDS.
+    Missing and null fields hash as ''. Identical content gives identical ids, so
+    duplicates are resolved by the database's ON CONFLICT instead of client-side probing.
+    """
+    keys = None
+    for field in ID_KEY_FIELDS:
+        column = frame[field] if field in frame else pd.Series('', index=frame.index)
+        part = _date_part(column) if field == 'update_date' else _key_part(column)
+        keys = part if keys is None else keys + '|' + part
+    return _hash_keys(keys.to_numpy(dtype=object))
+
+
+def content_id(record: Dict) -> int:
+    """Scalar form of content_ids for a single record dict"""
+    parts = []
+    for field in ID_KEY_FIELDS:
+        value = record.get(field)
+        if value is None or (isinstance(value, float) and np.isnan(value)):
+            parts.append('')
+        elif field == 'update_date':
+            parts.append(normalize_date(value))
+        else:
+            parts.append(str(value).strip())
+    return int(_hash_keys(np.array(['|'.join(parts)], dtype=object))[0])
+
+
+def row_fingerprints(frame: pd.DataFrame, columns) -> np.ndarray:
+    """64-bit hash of the full content of each row over `columns`, to detect unchanged records"""
+    keys = None
+    for column in columns:
+        part = _key_part(frame[column])
+        keys = part if keys is None else keys + '\x1f' + part
+    return _hash_keys(keys.to_numpy(dtype=object))
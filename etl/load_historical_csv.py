@@ -1,130 +1,174 @@
 # this is not meant to be run once, to update historical data from 2014-2025
-
+#
+# Streams the CSV in chunks: each chunk is transformed column-wise and written
+# before the next one is read, so memory stays flat regardless of file size.
+# Progress is checkpointed after every committed chunk; re-running the same
+# command after a crash resumes from the last committed row.
+#
+#   python etl/load_historical_csv.py [csv_path] [--chunksize 20000] [--restart]
+
+import argparse
+import json
 import pandas as pd
-import hashlib
 import os
+import sys
+import time
 from datetime import datetime
+from typing import Optional
 from dotenv import load_dotenv
-from supabase import create_client, Client
 import logging
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.ids import content_ids
+from etl.storage import StorageBackend, get_backend
+from etl.transform import classify_shortage_status
+
 load_dotenv()
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 CSV_PATH = 'data/drug_shortage_historical/shortage_2014_2025_full.csv'
+CHUNK_SIZE = 20000
+
+# Columns read from the CSV; anything else is never materialized
+CSV_COLUMNS = [
+    'generic_name', 'company_name', 'presentation', 'update_type', 'update_date',
+    'therapeutic_category', 'status', 'ndc', 'year', 'month',
+]
+HISTORICAL_COLUMNS = [
+    'id', 'generic_name', 'company_name', 'presentation', 'update_type', 'update_date',
+    'availability', 'related_info', 'resolved_note', 'reason_for_shortage',
+    'therapeutic_category', 'status', 'status_change_date', 'change_date', 'date_discontinued',
+    'shortage_status', 'ndc', 'created_at',
+]
+
+# The historical export also uses 'Currently in Shortage' and 'Discontinuation'
+HISTORICAL_STATUS_RULES = [
+    (['new'], ['current'], 'new'),
+    (['revised', 'reverified'], ['current'], 'continued'),
+    (None, ['currently in shortage'], 'continued'),
+    (None, ['resolved'], 'ended'),
+    (None, ['to be discontinued', 'discontinuation'], 'discontinued'),
+]
+
+
+def parse_update_dates(chunk: pd.DataFrame) -> pd.Series:
+    """Parse update_date once per distinct value, falling back to year+month"""
+    uniques = chunk['update_date'].dropna().unique()
+    parsed = pd.Series(pd.to_datetime(uniques, errors='coerce', format='mixed'), index=uniques)
+    dates = chunk['update_date'].map(parsed)
+
+    if 'year' in chunk and 'month' in chunk:
+        fallback = pd.to_datetime(
+            chunk['year'].astype(str) + '-' + chunk['month'].astype(str).str.zfill(2) + '-01',
+            errors='coerce'
+        )
+        dates = dates.fillna(fallback)
+
+    return dates.dt.strftime('%Y-%m-%d').where(dates.notna(), None)
+
+
+def transform_chunk(chunk: pd.DataFrame, created_at: str) -> pd.DataFrame:
+    chunk = chunk.copy()
+    for column in CSV_COLUMNS:
+        if column not in chunk:
+            chunk[column] = None
+
+    chunk['update_date'] = parse_update_dates(chunk)
+    # Rows missing update_type or status stay unclassified, as before
+    classifiable = chunk['update_type'].notna() & chunk['status'].notna()
+    chunk['shortage_status'] = classify_shortage_status(
+        chunk['update_type'], chunk['status'], rules=HISTORICAL_STATUS_RULES
+    ).where(classifiable, None)
+    chunk['id'] = content_ids(chunk)
+    chunk['created_at'] = created_at
+
+    for column in HISTORICAL_COLUMNS:
+        if column not in chunk:
+            chunk[column] = None
+
+    return chunk[HISTORICAL_COLUMNS].drop_duplicates('id')
+
+
+def _file_signature(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {'csv_path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def read_checkpoint(checkpoint_path: str, csv_path: str) -> int:
+    """Rows already committed for this exact file, or 0"""
+    if not os.path.exists(checkpoint_path):
+        return 0
+    with open(checkpoint_path) as f:
+        checkpoint = json.load(f)
+    if {k: checkpoint.get(k) for k in ('csv_path', 'size', 'mtime')} != _file_signature(csv_path):
+        logger.warning(f"Checkpoint {checkpoint_path} is for a different file version; starting from the top")
+        return 0
+    return int(checkpoint['rows_committed'])
+
+
+def write_checkpoint(checkpoint_path: str, csv_path: str, rows_committed: int, chunks_committed: int):
+    checkpoint = dict(_file_signature(csv_path), rows_committed=rows_committed,
+                      chunks_committed=chunks_committed, updated_at=datetime.now().isoformat())
+    tmp_path = checkpoint_path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def load_csv_to_historical(csv_path: str, chunksize: int = CHUNK_SIZE,
+                           checkpoint_path: Optional[str] = None, restart: bool = False,
+                           storage: Optional[StorageBackend] = None) -> bool:
+    storage = storage or get_backend()
+
+    checkpoint_path = checkpoint_path or csv_path + '.checkpoint.json'
+    rows_committed = 0 if restart else read_checkpoint(checkpoint_path, csv_path)
+    if rows_committed:
+        logger.info(f"Resuming {csv_path} after {rows_committed} committed rows")
+
+    logger.info(f"Streaming CSV: {csv_path} in chunks of {chunksize}")
+    # Rows a previous run committed are skipped by the parser (the header is kept),
+    # so resuming does not read and parse them again
+    reader = pd.read_csv(
+        csv_path,
+        chunksize=chunksize,
+        dtype=str,
+        usecols=lambda column: column in CSV_COLUMNS,
+        skiprows=range(1, rows_committed + 1),
+    )
 
+    rows_seen = rows_committed
+    chunks_committed = 0
+    started = time.perf_counter()
+    rows_loaded = 0
 
-def generate_id(generic_name: str, company_name: str, presentation: str, update_date: str, ndc: str) -> int:
-    key_fields = [
-        str(generic_name or ''),
-        str(company_name or ''),
-        str(presentation or ''),
-        str(update_date or ''),
-        str(ndc or '')
-    ]
-    content = '|'.join(key_fields)
-    hash_obj = hashlib.md5(content.encode())
-    return int(hash_obj.hexdigest()[:8], 16)
-
-
-def classify_shortage_status(update_type: str, status: str) -> str:
-    if pd.isna(update_type) or pd.isna(status):
-        return None
-    update_type = str(update_type).strip().lower()
-    status = str(status).strip().lower()
-
-    if update_type == 'new' and status == 'current':
-        return 'new'
-    elif (update_type in ['revised', 'reverified'] and status == 'current') or (status == 'currently in shortage'):
-        return 'continued'
-    elif status == 'resolved':
-        return 'ended'
-    elif status in ['to be discontinued', 'discontinuation']
-        return 'discontinued'
-    return None
-
-
-def load_csv_to_historical(csv_path: str):
-    supabase_url = os.getenv("SUPABASE_URL")
-    supabase_key = os.getenv("SUPABASE_ANON_KEY")
-    supabase: Client = create_client(supabase_url, supabase_key)
-
-    logger.info(f"Reading CSV: {csv_path}")
-    df = pd.read_csv(csv_path)
-    logger.info(f"Loaded {len(df)} rows")
-
-    # Parse update_date, fall back to year+month from columns if missing
-    df['update_date'] = pd.to_datetime(df['update_date'], errors='coerce')
-    fallback_dates = pd.to_datetime(
-        df['year'].astype(str) + '-' + df['month'].astype(str).str.zfill(2) + '-01',
-        errors='coerce'
-    )
-    df['update_date'] = df['update_date'].fillna(fallback_dates)
-    df['update_date'] = df['update_date'].dt.strftime('%Y-%m-%d').where(df['update_date'].notna(), None)
-
-    # Fetch existing IDs to detect collisions
-    result = supabase.table('drug_shortages_classified_raw').select('id').execute()
-    existing_ids = {int(row['id']) for row in result.data if row['id'] is not None}
-    logger.info(f"Found {len(existing_ids)} existing records in historical table")
-
-    records = []
-    seen_ids = set(existing_ids)
-
-    for _, row in df.iterrows():
-        update_date = row.get('update_date')
-
-        base_id = generate_id(
-            row.get('generic_name'),
-            row.get('company_name'),
-            row.get('presentation'),
-            update_date,
-            row.get('ndc')
-        )
+    for chunk in reader:
+        rows_seen += len(chunk)
+        records = transform_chunk(chunk, created_at=datetime.now().isoformat())
+        stats = storage.write('drug_shortages_classified_raw', records, on_conflict='id', ignore_duplicates=True)
+        if stats.failed_records:
+            logger.error(f"{len(stats.failed_records)} rows failed in the chunk ending at row {rows_seen}; "
+                         f"stopping so a re-run retries it from row {rows_committed}")
+            return False
+
+        rows_committed = rows_seen
+        rows_loaded += len(chunk)
+        chunks_committed += 1
+        write_checkpoint(checkpoint_path, csv_path, rows_committed, chunks_committed)
+        elapsed = time.perf_counter() - started
+        logger.info(f"Committed rows up to {rows_committed} ({rows_loaded / elapsed:.0f} rows/sec)")
 
-        # Resolve collision the same way the ETL does
-        unique_id = base_id
-        while unique_id in seen_ids:
-            unique_id += 1
-        seen_ids.add(unique_id)
-
-        records.append({
-            'id': unique_id,
-            'generic_name': row.get('generic_name') if not pd.isna(row.get('generic_name')) else None,
-            'company_name': row.get('company_name') if not pd.isna(row.get('company_name')) else None,
-            'presentation': row.get('presentation') if not pd.isna(row.get('presentation')) else None,
-            'update_type': row.get('update_type') if not pd.isna(row.get('update_type')) else None,
-            'update_date': update_date,
-            'availability': None,
-            'related_info': None,
-            'resolved_note': None,
-            'reason_for_shortage': None,
-            'therapeutic_category': row.get('therapeutic_category') if not pd.isna(row.get('therapeutic_category')) else None,
-            'status': row.get('status') if not pd.isna(row.get('status')) else None,
-            'status_change_date': None,
-            'change_date': None,
-            'date_discontinued': None,
-            'shortage_status': classify_shortage_status(row.get('update_type'), row.get('status')),
-            'ndc': row.get('ndc') if not pd.isna(row.get('ndc')) else None,
-            'created_at': datetime.now().isoformat()
-        })
-
-    # Insert in batches of 500
-    batch_size = 500
-    inserted = 0
-    for i in range(0, len(records), batch_size):
-        batch = records[i:i + batch_size]
-        supabase.table('drug_shortages_classified_raw').upsert(
-            batch,
-            on_conflict='id',
-            ignore_duplicates=True
-        ).execute()
-        inserted += len(batch)
-        logger.info(f"Inserted batch {i // batch_size + 1}: {inserted}/{len(records)} rows")
-
-    logger.info(f"Done. {len(records)} rows processed.")
+    logger.info(f"Done. {rows_committed} rows processed.")
+    return True
 
 
 if __name__ == '__main__':
-    load_csv_to_historical(CSV_PATH)
+    parser = argparse.ArgumentParser(description='Stream a historical shortage CSV into drug_shortages_classified_raw')
+    parser.add_argument('csv_path', nargs='?', default=CSV_PATH)
+    parser.add_argument('--chunksize', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--restart', action='store_true', help='ignore any checkpoint and start from the top')
+    args = parser.parse_args()
+
+    if not load_csv_to_historical(args.csv_path, chunksize=args.chunksize, restart=args.restart):
+        sys.exit(1)
@@ -0,0 +1,190 @@
+# Compile the FDA shortage-list snapshots in data/vedika_recompiled_historical
+# ("Drug Shortage Data(MMDDYYYY).csv") into one parquet file in the staging schema.
+#
+# Each snapshot is a full copy of the list on that date, so most rows repeat
+# across files. Snapshots are parsed in a process pool, repaired (cp1252 bytes,
+# nbsp-mangled headers, UTF-8 mojibake, "\n" placeholders) and deduplicated by a
+# hash of their content. first_seen/last_seen record which snapshots held each row.
+#
+#   python etl/load_vedika_snapshots.py [snapshot_dir] [--output data/vedika_snapshots.parquet] [--workers 4]
+
+import argparse
+import glob
+import logging
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import List, Optional
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.ids import content_ids, row_fingerprints
+from etl.transform import PASSTHROUGH_FIELDS, STAGING_COLUMNS, classify_shortage_status
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_DIR = 'data/vedika_recompiled_historical'
+OUTPUT_PATH = 'data/vedika_snapshots.parquet'
+SNAPSHOT_ENCODING = 'cp1252'
+SNAPSHOT_DATE_RE = re.compile(r'\((\d{8})\)')
+
+# Normalized snapshot header -> staging column; unmapped columns (links, notes, contact info) are dropped
+HEADER_MAP = {
+    'generic_name': 'generic_name',
+    'company_name': 'company_name',
+    'presentation': 'presentation',
+    'type_of_update': 'update_type',
+    'update_type': 'update_type',
+    'date_of_update': 'update_date',
+    'update_date': 'update_date',
+    'availability_information': 'availability',
+    'availability': 'availability',
+    'related_information': 'related_info',
+    'related_info': 'related_info',
+    'resolved_note': 'resolved_note',
+    'reason_for_shortage': 'reason_for_shortage',
+    'therapeutic_category': 'therapeutic_category',
+    'status': 'status',
+    'change_date': 'change_date',
+    'date_discontinued': 'date_discontinued',
+}
+DATE_COLUMNS = ['update_date', 'change_date', 'date_discontinued']
+NDC_RE = r'NDC\s*#?\s*(\d{4,5}-\d{3,4}-\d{1,2})'
+# UTF-8 text that was decoded as cp1252 somewhere upstream ('â€™', 'Â®', ...)
+MOJIBAKE_RE = re.compile('[ÂÃâ][^\x00-\x7f]')
+
+# Content columns that make two snapshot rows the same record
+CONTENT_COLUMNS = PASSTHROUGH_FIELDS + ['ndc']
+OUTPUT_COLUMNS = STAGING_COLUMNS + ['content_hash', 'first_seen', 'last_seen']
+
+
+def snapshot_date(path: str) -> str:
+    match = SNAPSHOT_DATE_RE.search(os.path.basename(path))
+    if not match:
+        raise ValueError(f"No (MMDDYYYY) snapshot date in {path}")
+    return datetime.strptime(match.group(1), '%m%d%Y').strftime('%Y-%m-%d')
+
+
+def normalize_header(name: str) -> str:
+    name = name.replace('\xa0', ' ').strip().lower()
+    return re.sub(r'\W+', '_', name).strip('_')
+
+
+def _fix_mojibake(value: str) -> str:
+    if not MOJIBAKE_RE.search(value):
+        return value
+    try:
+        return value.encode(SNAPSHOT_ENCODING).decode('utf-8')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return value
+
+
+def repair_text(column: pd.Series) -> pd.Series:
+    """nbsp -> space, strip, '\\n' placeholders -> None and mojibake undone, once per distinct value"""
+    uniques = column.dropna().unique()
+    repaired = {}
+    for value in uniques:
+        text = _fix_mojibake(str(value)).replace('\xa0', ' ').strip()
+        repaired[value] = text or None
+    return column.map(repaired)
+
+
+def parse_dates(frame: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """M/D/YYYY -> ISO, parsed once per distinct value across all date columns"""
+    uniques = pd.unique(pd.concat([frame[column] for column in columns]).dropna())
+    parsed = pd.to_datetime(pd.Series(uniques), format='%m/%d/%Y', errors='coerce')
+    # The odd ISO or two-digit-year value falls back to a general parse
+    missing = parsed.isna()
+    if missing.any():
+        parsed[missing] = pd.to_datetime(pd.Series(uniques[missing.to_numpy()]), format='mixed', errors='coerce')
+    mapping = pd.Series(parsed.dt.strftime('%Y-%m-%d').to_numpy(), index=uniques)
+    for column in columns:
+        frame[column] = frame[column].map(mapping)
+    return frame
+
+
+def read_snapshot(path: str) -> pd.DataFrame:
+    """One snapshot in the staging schema plus content_hash and snapshot_date"""
+    frame = pd.read_csv(path, encoding=SNAPSHOT_ENCODING, dtype=str, keep_default_na=False, na_values=[''])
+    frame.columns = [normalize_header(column) for column in frame.columns]
+    frame = frame[[column for column in frame.columns if column in HEADER_MAP]]
+    frame = frame.rename(columns=HEADER_MAP)
+    frame = frame.loc[:, ~frame.columns.duplicated()]
+
+    for column in PASSTHROUGH_FIELDS:
+        frame[column] = repair_text(frame[column]) if column in frame else None
+    frame = frame[frame['generic_name'].notna()]
+    frame = parse_dates(frame, DATE_COLUMNS)
+
+    frame['ndc'] = (
+        frame['presentation'].str.extractall(NDC_RE)[0]
+        .groupby(level=0).agg(', '.join)
+        .reindex(frame.index)
+    )
+    frame['shortage_status'] = classify_shortage_status(frame['update_type'], frame['status'])
+    frame['content_hash'] = row_fingerprints(frame, CONTENT_COLUMNS)
+    frame['snapshot_date'] = snapshot_date(path)
+    return frame.reset_index(drop=True)
+
+
+def compile_snapshots(paths: List[str], workers: Optional[int] = None) -> pd.DataFrame:
+    """
+    Parse snapshots in parallel and keep one row per record. Rows repeated verbatim
+    collapse by content_hash. A record edited in place between snapshots (same id,
+    e.g. new availability text under the same update_date) keeps its latest version,
+    so ids stay unique for the upsert.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        frames = list(pool.map(read_snapshot, paths))
+    combined = pd.concat(frames, ignore_index=True)
+
+    seen = combined.groupby('content_hash')['snapshot_date'].agg(first_seen='min', last_seen='max')
+    versions = (
+        combined.sort_values('snapshot_date', kind='stable')
+        .drop_duplicates('content_hash', keep='last')
+        .drop(columns='snapshot_date')
+        .join(seen, on='content_hash')
+    )
+    versions['id'] = content_ids(versions)
+
+    first_seen = versions.groupby('id')['first_seen'].min()
+    records = versions.sort_values('last_seen', kind='stable').drop_duplicates('id', keep='last')
+    records['first_seen'] = records['id'].map(first_seen)
+    records['created_at'] = datetime.now().isoformat()
+    logger.info(f"{len(combined)} snapshot rows -> {len(versions)} distinct versions -> {len(records)} records")
+    return records[OUTPUT_COLUMNS].reset_index(drop=True)
+
+
+def write_snapshots(records: pd.DataFrame, output_path: str):
+    # Dictionary-encoded, zstd-compressed; repeated names and dates cost almost nothing
+    tmp_path = output_path + '.tmp'
+    records.to_parquet(tmp_path, engine='pyarrow', compression='zstd', index=False)
+    os.replace(tmp_path, output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile FDA shortage-list snapshots into one parquet file')
+    parser.add_argument('snapshot_dir', nargs='?', default=SNAPSHOT_DIR)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: CPU count)')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.snapshot_dir, 'Drug Shortage Data(*).csv')), key=snapshot_date)
+    if not paths:
+        logger.error(f"No snapshots found in {args.snapshot_dir}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    records = compile_snapshots(paths, workers=args.workers)
+    write_snapshots(records, args.output)
+    logger.info(f"Wrote {len(records)} records from {len(paths)} snapshots to {args.output} "
+                f"({os.path.getsize(args.output) / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import pandas as pd
+
+# Supabase caps every PostgREST response at max-rows (1000 by default), so pages
+# must not be larger or rows past the cap are silently dropped
+PAGE_SIZE = 1000
+MAX_WORKERS = 8
+
+
+def apply_filters(query, filters: Optional[Dict[str, Dict[str, Any]]]):
+    """
+    Push filters down to PostgREST. `filters` maps a column to {operator: value},
+    where operator is a filter builder method such as 'in_', 'eq', 'gte' or 'lte'.
+    None values are skipped so callers can pass unset bounds straight through.
+    """
+    for column, conditions in (filters or {}).items():
+        for operator, value in conditions.items():
+            if value is None:
+                continue
+            if operator == 'in_':
+                value = list(value)
+            query = getattr(query, operator)(column, value)
+    return query
+
+
+def fetch_table(client, table: str, columns: Sequence[str],
+                filters: Optional[Dict[str, Dict[str, Any]]] = None,
+                order_by: Iterable[str] = (), page_size: int = PAGE_SIZE,
+                max_workers: int = MAX_WORKERS) -> pd.DataFrame:
+    """
+    Read only `columns` of `table` as a DataFrame. The first page also asks for
+    the exact row count; the remaining pages are requested in parallel as
+    offset ranges over the client's shared keep-alive session. `order_by` should
+    identify rows uniquely, otherwise rows can move between pages.
+    Rows from every page go into one DataFrame constructor, with no per-page frames.
+    """
+    columns = list(columns)
+    # Build the PostgREST client once here; its lazy init is not thread-safe
+    postgrest = client.postgrest
+
+    def page(start: int, count=None):
+        query = apply_filters(postgrest.from_(table).select(','.join(columns), count=count), filters)
+        for column in order_by:
+            query = query.order(column)
+        return query.range(start, start + page_size - 1).execute()
+
+    first = page(0, count='exact')
+    total = first.count if first.count is not None else len(first.data)
+    pages: List[list] = [first.data]
+    starts = range(page_size, total, page_size)
+    if starts:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(starts))) as pool:
+            pages.extend(response.data for response in pool.map(page, starts))
+
+    return pd.DataFrame.from_records(chain.from_iterable(pages), columns=columns)
@@ -0,0 +1,93 @@
+# One-off migration: rekey existing rows from the old 32-bit md5 ids to the
+# 64-bit content ids in etl/ids.py. Run sql/migrate_ids_to_bigint.sql first.
+#
+#   python etl/rekey_ids.py                      # both tables
+#   python etl/rekey_ids.py --table drug_shortages_staging --batch-size 500 --dry-run
+
+import argparse
+import logging
+import os
+import sys
+
+import pandas as pd
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.ids import content_ids
+
+load_dotenv()
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+TABLES = ['drug_shortages_classified_raw', 'drug_shortages_staging']
+
+# Old ids were md5[:8] (< 2**32) plus a few linear-probe increments. Only rows below
+# this ceiling are scanned, so rows that were already rekeyed are not visited again.
+LEGACY_ID_CEILING = 2 ** 32 + 2 ** 20
+
+
+def rekey_table(supabase: Client, table: str, batch_size: int = 1000, dry_run: bool = False):
+    """
+    Walk `table` in id order, `batch_size` rows at a time. For each batch, insert the
+    rows under their content id, then delete the old ids. Insert-before-delete makes
+    the migration safe to re-run after a crash. Rows whose content is identical
+    collapse into one.
+    """
+    cursor = -1
+    scanned = moved = 0
+
+    while True:
+        result = (
+            supabase.table(table)
+            .select('*')
+            .gt('id', cursor)
+            .lt('id', LEGACY_ID_CEILING)
+            .order('id')
+            .limit(batch_size)
+            .execute()
+        )
+        if not result.data:
+            break
+
+        batch = pd.DataFrame(result.data)
+        cursor = int(batch['id'].iloc[-1])
+        scanned += len(batch)
+
+        new_ids = content_ids(batch)
+        changed = new_ids != batch['id'].to_numpy()
+        if changed.any():
+            old_ids = batch.loc[changed, 'id'].astype(int).tolist()
+            rekeyed = batch.loc[changed].assign(id=new_ids[changed]).drop_duplicates('id')
+            rekeyed = rekeyed.astype(object).where(rekeyed.notna(), None)
+            moved += len(old_ids)
+
+            if not dry_run:
+                supabase.table(table).upsert(
+                    rekeyed.to_dict('records'),
+                    on_conflict='id',
+                    ignore_duplicates=True
+                ).execute()
+                supabase.table(table).delete().in_('id', old_ids).execute()
+
+        logger.info(f"{table}: scanned {scanned} rows, rekeyed {moved} (cursor id {cursor})")
+
+    logger.info(f"{'Dry run: ' if dry_run else ''}{table} done, {moved}/{scanned} rows rekeyed")
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rekey shortage tables to 64-bit content ids')
+    parser.add_argument('--table', choices=TABLES, action='append', help='table to rekey (default: all)')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--dry-run', action='store_true')
+    args = parser.parse_args()
+
+    supabase: Client = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    for table in args.table or TABLES:
+        rekey_table(supabase, table, batch_size=args.batch_size, dry_run=args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Request parameters that identify a response; api_key is deliberately excluded
+KEY_PARAMS = ('search', 'skip', 'limit')
+
+
+class ResponseCache:
+    """
+    Gzipped on-disk cache of raw openFDA responses.
+
+    Entries are keyed by a sha256 of (endpoint, search window, skip, limit) and
+    stored as <dir>/<key[:2]>/<key>.json.gz. Reads refresh an entry's mtime, so
+    eviction drops expired entries first and then the least recently used ones
+    until the cache fits in max_bytes. Each fetched date range is appended to
+    runs.jsonl so a run can be replayed with exactly the same requests.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 512 * 1024 * 1024, max_age_days: float = 180):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.runs_path = os.path.join(cache_dir, 'runs.jsonl')
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._size = None
+        self.logger = logging.getLogger(__name__)
+
+    def key(self, base_url: str, params: Dict) -> str:
+        identity = {'url': base_url, **{name: params.get(name) for name in KEY_PARAMS}}
+        return hashlib.sha256(json.dumps(identity, sort_keys=True).encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f'{key}.json.gz')
+
+    def get(self, base_url: str, params: Dict) -> Optional[Dict]:
+        path = self._path(self.key(base_url, params))
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age:
+                raise FileNotFoundError(path)
+            with gzip.open(path, 'rt', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)
+        except (FileNotFoundError, OSError, ValueError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, base_url: str, params: Dict, data: Dict):
+        path = self._path(self.key(base_url, params))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8', compresslevel=6) as f:
+            json.dump(data, f)
+        size = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, size, _ in self._entries())
+            else:
+                self._size += size
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self) -> List[Tuple[str, int, float]]:
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith('.json.gz'):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def _evict(self):
+        now = time.time()
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for path, size, mtime in entries:
+            if total <= self.max_bytes and now - mtime <= self.max_age:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        self._size = total
+        self.logger.info(f"Evicted {removed} cached responses; cache now {total / 1e6:.1f} MB")
+
+    def evict(self):
+        with self._lock:
+            self._evict()
+
+    def record_run(self, start_date: str, end_date: str, window_days: int, page_size: int):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with self._lock, open(self.runs_path, 'a') as f:
+            f.write(json.dumps({'start_date': start_date, 'end_date': end_date, 'window_days': window_days,
+                                'page_size': page_size, 'fetched_at': datetime.now().isoformat()}) + '\n')
+
+    def recorded_runs(self) -> List[Dict]:
+        if not os.path.exists(self.runs_path):
+            return []
+        with open(self.runs_path) as f:
+            return [json.loads(line) for line in f if line.strip()]
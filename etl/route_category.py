@@ -0,0 +1,51 @@
+import csv
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+# The rules int_route_categories applies in the database
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                          'ds_db', 'seeds', 'route_category_rules.csv')
+# Category for a route that matches no rule
+OTHER_CATEGORY = 'other'
+
+
+def like_to_regex(pattern: str) -> str:
+    """SQL LIKE pattern as an anchored regex: % is any run of characters, _ any one character"""
+    parts = []
+    for char in pattern:
+        if char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return ''.join(parts)
+
+
+@lru_cache(maxsize=None)
+def load_rules(path: str = RULES_PATH) -> List[Tuple[str, re.Pattern]]:
+    """(route_category, compiled pattern) in priority order"""
+    with open(path, newline='') as f:
+        rows = sorted(csv.DictReader(f), key=lambda row: int(row['priority']))
+    return [(row['route_category'], re.compile(like_to_regex(row['pattern']), re.DOTALL)) for row in rows]
+
+
+def classify_route(route_name) -> Optional[str]:
+    """Route category for an ndc_fda ROUTENAME, or None when the route is missing"""
+    if route_name is None or pd.isna(route_name):
+        return None
+    lowered = str(route_name).lower()
+    for category, pattern in load_rules():
+        if pattern.fullmatch(lowered):
+            return category
+    return OTHER_CATEGORY
+
+
+def classify_routes(route_names: pd.Series) -> pd.Series:
+    """classify_route over a column, evaluated once per distinct route"""
+    mapping = {route: classify_route(route) for route in route_names.dropna().unique()}
+    return route_names.map(mapping).astype(object).where(route_names.notna(), None)
@@ -0,0 +1,167 @@
+# Derive shortage_status change events from consecutive full snapshots of the
+# FDA shortage list, so history can be rebuilt from snapshots and only deltas
+# are sent to drug_shortages_staging.
+#
+#   python etl/snapshot_diff.py [snapshot_dir] [--output data/vedika_events.parquet] [--load]
+
+import argparse
+import glob
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Collection, List, Optional
+
+import numpy as np
+import pandas as pd
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.ids import content_ids, row_fingerprints
+from etl.load_vedika_snapshots import CONTENT_COLUMNS, SNAPSHOT_DIR, read_snapshot, snapshot_date
+from etl.storage import get_backend
+from etl.transform import STAGING_COLUMNS, classify_shortage_status
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+OUTPUT_PATH = 'data/vedika_events.parquet'
+
+# A listing is identified by these; everything else is its (changeable) content
+KEY_COLUMNS = ['generic_name', 'company_name', 'presentation', 'ndc']
+EVENT_COLUMNS = STAGING_COLUMNS + ['change_type', 'previous_status', 'snapshot_date']
+
+# Statuses that are still a shortage; a listing that disappears while in one of these has ended
+OPEN_STATUSES = ['new', 'continued']
+# A listing first seen while current is a new shortage regardless of its update_type
+INSERT_STATUS_RULES = [
+    (None, ['current'], 'new'),
+    (None, ['resolved'], 'ended'),
+    (None, ['to be discontinued'], 'discontinued'),
+]
+
+
+def prepare(snapshot: pd.DataFrame) -> pd.DataFrame:
+    """Key hash, content hash and status per listing; one row per key (the last one wins)"""
+    snapshot = snapshot.copy()
+    snapshot['key_hash'] = row_fingerprints(snapshot, KEY_COLUMNS)
+    if 'content_hash' not in snapshot:
+        snapshot['content_hash'] = row_fingerprints(snapshot, CONTENT_COLUMNS)
+    if 'shortage_status' not in snapshot:
+        snapshot['shortage_status'] = classify_shortage_status(snapshot['update_type'], snapshot['status'])
+
+    duplicated = snapshot['key_hash'].duplicated(keep='last')
+    if duplicated.any():
+        logger.debug(f"{int(duplicated.sum())} repeated listings in snapshot; keeping the last")
+    return snapshot[~duplicated]
+
+
+def diff_snapshots(old: pd.DataFrame, new: pd.DataFrame, observed_date: Optional[str] = None,
+                   removed_keys: Collection[int] = ()) -> pd.DataFrame:
+    """
+    Events turning snapshot `old` into snapshot `new`, hash-joined on KEY_COLUMNS:
+    - inserted: listing only in `new`; current -> 'new', resolved -> 'ended', ...
+    - changed:  listing in both with different content; status of the new version
+    - removed:  listing only in `old` while still open; 'ended' (status Resolved) as of observed_date
+    Unchanged listings and removals of already-closed listings produce nothing.
+    A listing whose key is in `removed_keys` (an earlier removal) is back: its insert
+    is dated observed_date, or it would share the id of its first insert and be lost.
+    """
+    old, new = prepare(old), prepare(new)
+    joined = old[['key_hash', 'content_hash', 'shortage_status']].merge(
+        new[['key_hash', 'content_hash']], on='key_hash', how='outer',
+        suffixes=('_old', '_new'), indicator=True
+    )
+    side = joined['_merge'].to_numpy()
+
+    inserted = new[new['key_hash'].isin(joined.loc[side == 'right_only', 'key_hash'])].copy()
+    inserted['change_type'] = 'inserted'
+    inserted['previous_status'] = None
+    inserted['shortage_status'] = classify_shortage_status(
+        inserted['update_type'], inserted['status'], rules=INSERT_STATUS_RULES
+    )
+    if len(removed_keys) and observed_date is not None:
+        returned = inserted['key_hash'].isin(np.fromiter(removed_keys, dtype=np.int64))
+        inserted.loc[returned, 'update_date'] = observed_date
+        inserted.loc[returned, 'previous_status'] = 'ended'
+
+    both = joined[side == 'both']
+    changed_keys = both.loc[both['content_hash_old'] != both['content_hash_new'], ['key_hash', 'shortage_status']]
+    changed = new.merge(changed_keys.rename(columns={'shortage_status': 'previous_status'}), on='key_hash')
+    changed['change_type'] = 'changed'
+
+    gone_keys = joined.loc[(side == 'left_only') & joined['shortage_status'].isin(OPEN_STATUSES), 'key_hash']
+    removed = old[old['key_hash'].isin(gone_keys)].copy()
+    removed['change_type'] = 'removed'
+    removed['previous_status'] = removed['shortage_status']
+    removed['shortage_status'] = 'ended'
+    # The old listing's status/update_type describe the open shortage; the event is its
+    # resolution, inferred rather than issued by the FDA, so there is no update_type
+    removed['status'] = 'Resolved'
+    removed['update_type'] = None
+    if observed_date is not None:
+        removed['update_date'] = observed_date
+
+    events = pd.concat([inserted, changed, removed], ignore_index=True)
+    events['snapshot_date'] = observed_date
+    events['id'] = content_ids(events) if len(events) else np.empty(0, dtype=np.int64)
+    events['created_at'] = datetime.now().isoformat()
+    for column in EVENT_COLUMNS:
+        if column not in events:
+            events[column] = None
+    return events[EVENT_COLUMNS]
+
+
+def diff_sequence(snapshots: List[pd.DataFrame], dates: List[str]) -> pd.DataFrame:
+    """Events for a date-ordered list of snapshots; the first snapshot is all inserts"""
+    empty = snapshots[0].iloc[0:0]
+    previous = [empty] + snapshots[:-1]
+    events = []
+    # Keys of listings removed while open and not yet back
+    removed_keys = set()
+    for old, new, date in zip(previous, snapshots, dates):
+        batch = diff_snapshots(old, new, observed_date=date, removed_keys=removed_keys)
+        keys = row_fingerprints(batch, KEY_COLUMNS)
+        removed_keys.difference_update(keys[(batch['change_type'] == 'inserted').to_numpy()].tolist())
+        removed_keys.update(keys[(batch['change_type'] == 'removed').to_numpy()].tolist())
+        events.append(batch)
+    for date, batch in zip(dates, events):
+        counts = batch['change_type'].value_counts().to_dict()
+        logger.info(f"{date}: {counts.get('inserted', 0)} inserted, {counts.get('changed', 0)} changed, "
+                    f"{counts.get('removed', 0)} removed")
+    return pd.concat(events, ignore_index=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Derive shortage_status events from consecutive list snapshots')
+    parser.add_argument('snapshot_dir', nargs='?', default=SNAPSHOT_DIR)
+    parser.add_argument('--output', default=OUTPUT_PATH)
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: CPU count)')
+    parser.add_argument('--load', action='store_true', help='also upsert the events into drug_shortages_staging')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.snapshot_dir, 'Drug Shortage Data(*).csv')), key=snapshot_date)
+    if not paths:
+        logger.error(f"No snapshots found in {args.snapshot_dir}")
+        sys.exit(1)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        snapshots = list(pool.map(read_snapshot, paths))
+    events = diff_sequence(snapshots, [snapshot_date(path) for path in paths])
+    events = events.drop_duplicates('id', keep='last')
+    events.to_parquet(args.output, engine='pyarrow', compression='zstd', index=False)
+    logger.info(f"Wrote {len(events)} events from {len(paths)} snapshots to {args.output} "
+                f"in {time.perf_counter() - started:.1f}s")
+
+    if args.load:
+        load_dotenv()
+        stats = get_backend().write('drug_shortages_staging', events[STAGING_COLUMNS], on_conflict='id')
+        if stats.failed_records:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
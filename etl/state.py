@@ -0,0 +1,79 @@
+import json
+import os
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def to_day(date: str) -> int:
+    """Days since 1970-01-01 for an ISO date"""
+    return int((np.datetime64(date, 'D') - EPOCH).astype(int))
+
+
+class ETLState:
+    """
+    Incremental-fetch state persisted between weekly runs:
+    - watermark: the latest update_date successfully loaded
+    - fingerprints: content hashes of loaded records, with their update day, so
+      records re-served by the overlap window can be dropped when unchanged
+
+    Fingerprints older than the next fetch window can never be re-served, so
+    they are pruned on commit and the set stays bounded.
+    """
+
+    def __init__(self, state_dir: str):
+        self.state_dir = state_dir
+        self.state_path = os.path.join(state_dir, 'etl_state.json')
+        self.fingerprint_path = os.path.join(state_dir, 'fingerprints.npz')
+        self.watermark: Optional[str] = None
+        self.fingerprints = np.empty(0, dtype=np.int64)
+        self.update_days = np.empty(0, dtype=np.int32)
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path) as f:
+                self.watermark = json.load(f).get('watermark')
+        if os.path.exists(self.fingerprint_path):
+            with np.load(self.fingerprint_path) as data:
+                self.fingerprints = data['fingerprints']
+                self.update_days = data['update_days']
+
+    def seen(self, fingerprints: np.ndarray) -> np.ndarray:
+        """Boolean mask of fingerprints already loaded (self.fingerprints is kept sorted)"""
+        if not len(self.fingerprints):
+            return np.zeros(len(fingerprints), dtype=bool)
+        positions = np.searchsorted(self.fingerprints, fingerprints)
+        positions = np.minimum(positions, len(self.fingerprints) - 1)
+        return self.fingerprints[positions] == fingerprints
+
+    def commit(self, fingerprints: np.ndarray, update_days: np.ndarray, watermark: Optional[str],
+               keep_from_day: Optional[int] = None):
+        """Record newly loaded fingerprints, advance the watermark and persist"""
+        all_fingerprints = np.concatenate([self.fingerprints, fingerprints.astype(np.int64)])
+        all_days = np.concatenate([self.update_days, update_days.astype(np.int32)])
+        if keep_from_day is not None:
+            keep = all_days >= keep_from_day
+            all_fingerprints, all_days = all_fingerprints[keep], all_days[keep]
+
+        self.fingerprints, first = np.unique(all_fingerprints, return_index=True)
+        self.update_days = all_days[first]
+        if watermark and (self.watermark is None or watermark > self.watermark):
+            self.watermark = watermark
+        self.save()
+
+    def save(self):
+        os.makedirs(self.state_dir, exist_ok=True)
+        tmp_path = self.fingerprint_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, fingerprints=self.fingerprints, update_days=self.update_days)
+        os.replace(tmp_path, self.fingerprint_path)
+
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'watermark': self.watermark, 'updated_at': datetime.now().isoformat(),
+                       'fingerprints': int(len(self.fingerprints))}, f)
+        os.replace(tmp_path, self.state_path)
@@ -0,0 +1,290 @@
+"""
+Where the pipeline's tables live. Every reader and writer (the ETL loaders and both
+dashboards) goes through a StorageBackend, chosen by configuration:
+
+    STORAGE_BACKEND=supabase   (default) SUPABASE_URL / SUPABASE_ANON_KEY; dbt builds the marts
+    STORAGE_BACKEND=duckdb     an embedded DuckDB file at DUCKDB_PATH
+                               (default cache/drug_shortage.duckdb)
+
+The DuckDB store holds the same source tables and marts, loads the seed CSVs under
+data/, and builds the marts itself (sql/duckdb_marts.sql), so the whole pipeline
+runs offline, in CI and under a profiler. See scripts/run_local_pipeline.py.
+"""
+
+import os
+import re
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence
+
+import pandas as pd
+
+from etl.paged_query import fetch_table
+from etl.bulk_writer import BulkWriter, WriteStats
+from etl.ids import content_ids
+from etl.transform import classify_shortage_status
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCHEMA_SQL = os.path.join(PROJECT_DIR, 'sql', 'duckdb_schema.sql')
+MARTS_SQL = os.path.join(PROJECT_DIR, 'sql', 'duckdb_marts.sql')
+ROUTE_RULES_CSV = os.path.join(PROJECT_DIR, 'ds_db', 'seeds', 'route_category_rules.csv')
+SEED_CSV = os.path.join(PROJECT_DIR, 'data', 'shortage_2019_2024_classified.csv')
+DEFAULT_DUCKDB_PATH = os.path.join(PROJECT_DIR, 'cache', 'drug_shortage.duckdb')
+
+# Seed columns, in table order; created_at is left to the table default
+SEED_COLUMNS = [
+    'id', 'generic_name', 'company_name', 'presentation', 'update_type', 'update_date',
+    'availability', 'related_info', 'resolved_note', 'reason_for_shortage',
+    'therapeutic_category', 'status', 'status_change_date', 'change_date', 'date_discontinued',
+    'shortage_status', 'ndc',
+]
+# PostgREST filter operators (see etl/paged_query.apply_filters) as SQL
+FILTER_OPERATORS = {'eq': '=', 'neq': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+
+
+def quote(column: str) -> str:
+    return f'"{column}"'
+
+
+def seed_records(csv_path: str = SEED_CSV) -> pd.DataFrame:
+    """The classified 2019-2024 export as drug_shortages_classified_raw rows, oldest first"""
+    df = pd.read_csv(csv_path, dtype=str)
+    for column in ['update_date', 'change_date', 'date_discontinued']:
+        df[column] = pd.to_datetime(df[column], format='%m/%d/%y', errors='coerce').dt.date
+    df['status_change_date'] = None
+    df['shortage_status'] = classify_shortage_status(df['update_type'], df['status'])
+    df['id'] = content_ids(df)
+    df = df.drop_duplicates('id').sort_values('update_date', na_position='first', ignore_index=True)
+    return df[SEED_COLUMNS]
+
+
+class StorageBackend(ABC):
+    """
+    Table access the pipeline needs. Writes upsert on the table's primary key (id for
+    every table written here); reads return only the requested columns, with filters
+    given as {column: {operator: value}} as in etl/paged_query.apply_filters.
+    """
+
+    name = None
+
+    @abstractmethod
+    def write(self, table: str, df: pd.DataFrame, on_conflict: str = 'id',
+              ignore_duplicates: bool = False) -> WriteStats:
+        ...
+
+    @abstractmethod
+    def count(self, table: str) -> int:
+        ...
+
+    @abstractmethod
+    def fetch(self, table: str, columns: Sequence[str],
+              filters: Optional[Dict[str, Dict[str, Any]]] = None,
+              order_by: Iterable[str] = ()) -> pd.DataFrame:
+        ...
+
+    @abstractmethod
+    def promote_staging_to_historical(self):
+        """Move staging rows into drug_shortages_classified_raw and clear staging"""
+
+    def close(self):
+        """Release any connection the backend holds"""
+
+
+class SupabaseBackend(StorageBackend):
+    """The hosted database, over PostgREST. Marts are built there by dbt (ds_db)."""
+
+    name = 'supabase'
+
+    def __init__(self, url: Optional[str], key: Optional[str]):
+        self.url = url
+        self.key = key
+        self._client = None
+
+    @property
+    def client(self):
+        # Created on first use, so constructing a backend needs no network
+        if self._client is None:
+            if not self.url or not self.key:
+                raise RuntimeError("Missing SUPABASE_URL or SUPABASE_ANON_KEY")
+            from supabase import ClientOptions, create_client
+            self._client = create_client(self.url, self.key, options=ClientOptions(postgrest_client_timeout=30))
+        return self._client
+
+    def write(self, table, df, on_conflict='id', ignore_duplicates=False):
+        # Chunked, concurrent upsert; a bad row or a timeout only fails its own chunk
+        writer = BulkWriter(self.client, table, on_conflict=on_conflict, ignore_duplicates=ignore_duplicates)
+        return writer.write(df)
+
+    def count(self, table):
+        return self.client.table(table).select('id', count='exact').execute().count or 0
+
+    def fetch(self, table, columns, filters=None, order_by=()):
+        return fetch_table(self.client, table, columns, filters=filters, order_by=order_by)
+
+    def promote_staging_to_historical(self):
+        self.client.rpc('promote_staging_to_historical').execute()
+
+
+class DuckDBBackend(StorageBackend):
+    """
+    An embedded DuckDB file with the same tables. Each call runs on its own cursor,
+    so threads can share the backend. With read_only=True the file is opened for each
+    read and closed after it, so long-lived readers (the dashboards) neither block the
+    pipeline from writing between reads nor keep serving a stale connection.
+    """
+
+    name = 'duckdb'
+
+    def __init__(self, path: str = DEFAULT_DUCKDB_PATH, read_only: bool = False):
+        import duckdb
+
+        self._duckdb = duckdb
+        self.path = path
+        self.read_only = read_only
+        self._connection = None
+        self._lock = threading.Lock()
+        self._date_columns: Dict[str, list] = {}
+        if not read_only:
+            if path != ':memory:':
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection = duckdb.connect(path)
+            self.execute_script(SCHEMA_SQL)
+
+    def cursor(self):
+        if self.read_only:
+            return self._duckdb.connect(self.path, read_only=True)
+        with self._lock:
+            return self._connection.cursor()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def execute_script(self, path: str):
+        with open(path) as f:
+            sql = f.read()
+        with self.cursor() as cursor:
+            cursor.execute(sql)
+
+    def date_columns(self, table: str) -> list:
+        if table not in self._date_columns:
+            with self.cursor() as cursor:
+                described = cursor.execute(f'DESCRIBE {table}').fetchall()
+            self._date_columns[table] = [row[0] for row in described if row[1] == 'DATE']
+        return self._date_columns[table]
+
+    def write(self, table, df, on_conflict='id', ignore_duplicates=False):
+        stats = WriteStats(table)
+        # One row per key, the last one winning, as consecutive upserts would leave it
+        df = df.drop_duplicates(on_conflict, keep='last')
+        # Postgres reads openFDA's 04/26/2024 as a date; DuckDB casts ISO strings only.
+        # Parsed once per distinct value; anything unparseable is stored as null.
+        text_dates = [column for column in self.date_columns(table) if column in df and (
+            pd.api.types.is_string_dtype(df[column]) or pd.api.types.is_object_dtype(df[column]))]
+        if text_dates:
+            df = df.copy()
+            for column in text_dates:
+                uniques = df[column].dropna().unique()
+                parsed = pd.to_datetime(pd.Series(uniques, dtype=object).astype(str), format='mixed',
+                                        errors='coerce')
+                dates = df[column].map(dict(zip(uniques, parsed.dt.date)))
+                df[column] = dates.where(dates.notna(), None)
+        verb = 'INSERT OR IGNORE' if ignore_duplicates else 'INSERT OR REPLACE'
+        with self.cursor() as cursor:
+            cursor.register('incoming', df)
+            cursor.execute(f'{verb} INTO {table} BY NAME SELECT * FROM incoming')
+        stats.rows_written = len(df)
+        stats.chunks = 1
+        stats.elapsed = time.perf_counter() - stats.started
+        stats.latencies.append(stats.elapsed)
+        return stats
+
+    def count(self, table):
+        with self.cursor() as cursor:
+            return cursor.execute(f'SELECT count(*) FROM {table}').fetchone()[0]
+
+    def fetch(self, table, columns, filters=None, order_by=()):
+        conditions, params = [], []
+        for column, operators in (filters or {}).items():
+            for operator, value in operators.items():
+                if value is None:
+                    continue
+                if operator == 'in_':
+                    value = list(value)
+                    conditions.append(f'{quote(column)} IN ({", ".join("?" * len(value))})' if value else 'false')
+                    params.extend(value)
+                else:
+                    conditions.append(f'{quote(column)} {FILTER_OPERATORS[operator]} ?')
+                    params.append(value)
+        sql = f'SELECT {", ".join(map(quote, columns))} FROM {table}'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        order_by = list(order_by)
+        if order_by:
+            sql += ' ORDER BY ' + ', '.join(map(quote, order_by))
+        with self.cursor() as cursor:
+            return cursor.execute(sql, params).df()
+
+    def promote_staging_to_historical(self):
+        with self.cursor() as cursor:
+            cursor.execute("""
+                BEGIN TRANSACTION;
+                INSERT OR REPLACE INTO drug_shortages_classified_raw BY NAME SELECT * FROM drug_shortages_staging;
+                DELETE FROM drug_shortages_staging;
+                COMMIT;
+            """)
+
+    def load_seeds(self, records: Optional[pd.DataFrame] = None, ndc_fda: Optional[pd.DataFrame] = None,
+                   staging_rows: int = 0) -> int:
+        """
+        Load shortage records (default: seed_records() from the CSV under data/) into
+        drug_shortages_classified_raw, the most recent `staging_rows` of them into
+        drug_shortages_staging instead, and replace ndc_fda with `ndc_fda` when given.
+        The NDC product directory is not part of data/; without one every
+        drug_identifier is null and the drug-level marts are empty.
+        Returns the number of shortage rows loaded.
+        """
+        records = seed_records() if records is None else records
+        split = len(records) - staging_rows
+        self.write('drug_shortages_classified_raw', records.iloc[:split], ignore_duplicates=True)
+        if staging_rows:
+            self.write('drug_shortages_staging', records.iloc[split:], ignore_duplicates=True)
+        if ndc_fda is not None:
+            with self.cursor() as cursor:
+                cursor.execute('DELETE FROM ndc_fda')
+                cursor.register('incoming', ndc_fda)
+                cursor.execute('INSERT INTO ndc_fda BY NAME SELECT * FROM incoming')
+        return len(records)
+
+    def build_marts(self) -> Dict[str, float]:
+        """Rebuild every model in sql/duckdb_marts.sql; seconds taken per statement"""
+        with open(MARTS_SQL) as f:
+            statements = re.split(r';[ \t]*$', f.read(), flags=re.MULTILINE)
+        rules = pd.read_csv(ROUTE_RULES_CSV, dtype={'priority': 'int32', 'route_category': str, 'pattern': str})
+        timings = {}
+        with self.cursor() as cursor:
+            cursor.register('route_category_rules_csv', rules)
+            cursor.execute('CREATE OR REPLACE TABLE route_category_rules AS SELECT * FROM route_category_rules_csv')
+            for statement in statements:
+                # Comment-only chunks carry no statement
+                body = '\n'.join(line for line in statement.splitlines() if not line.lstrip().startswith('--'))
+                if not body.strip():
+                    continue
+                started = time.perf_counter()
+                cursor.execute(statement)
+                relation = body.split(' AS', 1)[0].split()[-1]
+                timings[relation] = time.perf_counter() - started
+        return timings
+
+
+def get_backend(settings: Optional[Mapping[str, str]] = None, read_only: bool = False) -> StorageBackend:
+    """The backend STORAGE_BACKEND selects in `settings` (default: the environment)"""
+    settings = os.environ if settings is None else settings
+    name = (settings.get('STORAGE_BACKEND') or 'supabase').lower()
+    if name == 'supabase':
+        return SupabaseBackend(settings.get('SUPABASE_URL'), settings.get('SUPABASE_ANON_KEY'))
+    if name == 'duckdb':
+        return DuckDBBackend(settings.get('DUCKDB_PATH') or DEFAULT_DUCKDB_PATH, read_only=read_only)
+    raise ValueError(f"Unknown STORAGE_BACKEND {name!r}; expected 'supabase' or 'duckdb'")
@@ -0,0 +1,65 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from etl.ids import content_ids
+
+# Raw openFDA fields copied straight into the staging schema
+PASSTHROUGH_FIELDS = [
+    'generic_name', 'company_name', 'presentation', 'update_type', 'update_date',
+    'availability', 'related_info', 'resolved_note', 'reason_for_shortage',
+    'therapeutic_category', 'status', 'change_date', 'date_discontinued',
+]
+SOURCE_FIELDS = PASSTHROUGH_FIELDS + ['package_ndc']
+
+STAGING_COLUMNS = ['id'] + PASSTHROUGH_FIELDS + ['shortage_status', 'ndc', 'created_at']
+
+# (update_types, statuses, shortage_status) checked in order; None matches any update_type.
+# Mirrors OpenFDAETL.classify_shortage_status.
+SHORTAGE_STATUS_RULES = [
+    (['new'], ['current'], 'new'),
+    (['revised', 'reverified'], ['current'], 'continued'),
+    (None, ['resolved'], 'ended'),
+    (None, ['to be discontinued'], 'discontinued'),
+]
+
+
+def records_to_frame(raw_data: List[Dict]) -> pd.DataFrame:
+    """Normalize raw openFDA records into one DataFrame of the fields we keep"""
+    frame = pd.DataFrame.from_records(raw_data, columns=SOURCE_FIELDS)
+    # therapeutic_category arrives as a list; staging keeps the first entry
+    if frame['therapeutic_category'].dtype == object:
+        frame['therapeutic_category'] = frame['therapeutic_category'].str[0]
+    return frame.rename(columns={'package_ndc': 'ndc'})
+
+
+def classify_shortage_status(update_type: pd.Series, status: pd.Series,
+                             rules=SHORTAGE_STATUS_RULES) -> pd.Series:
+    """Vectorized shortage_status classification; unmatched rows get None"""
+    update_type = update_type.fillna('').astype(str).str.strip().str.lower()
+    status = status.fillna('').astype(str).str.strip().str.lower()
+
+    conditions = []
+    labels = []
+    for update_types, statuses, label in rules:
+        matched = status.isin(statuses)
+        if update_types is not None:
+            matched &= update_type.isin(update_types)
+        conditions.append(matched.to_numpy())
+        labels.append(label)
+
+    return pd.Series(np.select(conditions, labels, default=None), index=status.index, dtype=object)
+
+
+def transform_columnar(raw_data: List[Dict], created_at: Optional[str] = None) -> pd.DataFrame:
+    """Columnar equivalent of the row-wise OpenFDAETL.transform_data loop"""
+    frame = records_to_frame(raw_data)
+    frame['shortage_status'] = classify_shortage_status(frame['update_type'], frame['status'])
+    frame['id'] = content_ids(frame)
+    frame['created_at'] = created_at or datetime.now().isoformat()
+
+    frame = frame[STAGING_COLUMNS]
+    # Missing values as None, like the dicts built by the row-wise path
+    return frame.astype(object).where(frame.notna(), None).astype({'id': np.int64})
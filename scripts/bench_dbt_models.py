@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Build-time benchmark for the ds_db dbt project on a local Postgres.
+
+Seeds the three source tables from files in data/:
+- drug_shortages_classified_raw from shortage_2019_2024_classified.csv
+- drug_shortages_staging from the most recent slice of the same file
+- ndc_fda as a synthetic directory covering the shortage NDCs, since the
+  real directory is not in the repo
+
+It then times:
+- a full `dbt run`
+- each model, from target/run_results.json
+- reads through the downstream views
+- an incremental run after a new batch of staging rows
+
+Point DBT_* at a scratch database; the source tables are dropped and recreated.
+
+    DBT_HOST=localhost DBT_PORT=5432 DBT_USER=postgres DBT_PASSWORD= \\
+    DBT_DATABASE=postgres DBT_SCHEMA=public python scripts/bench_dbt_models.py
+
+Run it against an older checkout (--project-dir) to compare before and after.
+"""
+
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import pandas as pd
+import psycopg2
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from etl.ids import content_ids
+from synthetic_data import NDC_COLUMNS, ndc_directory, shortage_records
+
+SHORTAGE_COLUMNS = [
+    'id', 'generic_name', 'company_name', 'presentation', 'update_type', 'update_date',
+    'availability', 'related_info', 'resolved_note', 'reason_for_shortage',
+    'therapeutic_category', 'status', 'status_change_date', 'change_date', 'date_discontinued',
+    'shortage_status', 'ndc', 'created_at',
+]
+SHORTAGE_DDL = """
+    id BIGINT PRIMARY KEY,
+    generic_name TEXT, company_name TEXT, presentation TEXT, update_type TEXT, update_date DATE,
+    availability TEXT, related_info TEXT, resolved_note TEXT, reason_for_shortage TEXT,
+    therapeutic_category TEXT, status TEXT, status_change_date DATE, change_date DATE,
+    date_discontinued DATE, shortage_status TEXT, ndc TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+"""
+DOWNSTREAM_READS = ['stg_drug_shortages', 'int_shortage_ndc', 'drug_shortage_episodes']
+
+
+def connect():
+    return psycopg2.connect(
+        host=os.getenv('DBT_HOST'), port=os.getenv('DBT_PORT', 5432), user=os.getenv('DBT_USER'),
+        password=os.getenv('DBT_PASSWORD'), dbname=os.getenv('DBT_DATABASE'),
+    )
+
+
+def copy_frame(cursor, table: str, frame: pd.DataFrame):
+    buffer = io.StringIO()
+    frame.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ', '.join(f'"{column}"' for column in frame.columns)
+    cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def seed(conn, shortages: pd.DataFrame, staging_rows: int):
+    history, staging = shortages.iloc[:-staging_rows], shortages.iloc[-staging_rows:]
+    with conn, conn.cursor() as cursor:
+        for table in ['drug_shortages_classified_raw', 'drug_shortages_staging', 'ndc_fda']:
+            cursor.execute(f'DROP TABLE IF EXISTS public.{table} CASCADE')
+        cursor.execute(f'CREATE TABLE public.drug_shortages_classified_raw ({SHORTAGE_DDL})')
+        cursor.execute(f'CREATE TABLE public.drug_shortages_staging ({SHORTAGE_DDL})')
+        cursor.execute('CREATE INDEX ON public.drug_shortages_staging(created_at)')
+        columns = ', '.join(f'"{column}" {"DOUBLE PRECISION" if column == "single_source" else "TEXT"}'
+                            for column in NDC_COLUMNS)
+        cursor.execute(f'CREATE TABLE public.ndc_fda ({columns})')
+        copy_frame(cursor, 'public.drug_shortages_classified_raw', history[SHORTAGE_COLUMNS[:-1]])
+        copy_frame(cursor, 'public.drug_shortages_staging', staging[SHORTAGE_COLUMNS[:-1]])
+        copy_frame(cursor, 'public.ndc_fda', ndc_directory(shortages))
+        cursor.execute('ANALYZE')
+    print(f"seeded {len(history)} historical, {len(staging)} staging rows")
+
+
+def add_staging_batch(conn, shortages: pd.DataFrame, rows: int, batch: int):
+    # Re-issued updates: same content under new dates and ids, as a weekly API pull would insert
+    new = shortages.sample(rows, random_state=batch).copy()
+    new['update_date'] = (pd.Timestamp('2025-10-01') + pd.Timedelta(days=7 * batch)).date()
+    new['id'] = content_ids(new)
+    with conn, conn.cursor() as cursor:
+        copy_frame(cursor, 'public.drug_shortages_staging', new.drop_duplicates('id')[SHORTAGE_COLUMNS[:-1]])
+
+
+def dbt(project_dir: str, *args: str):
+    started = time.perf_counter()
+    subprocess.run(['dbt', *args, '--project-dir', project_dir, '--profiles-dir', project_dir, '--quiet'],
+                   check=True)
+    elapsed = time.perf_counter() - started
+    with open(os.path.join(project_dir, 'target', 'run_results.json')) as f:
+        results = json.load(f)['results']
+    models = {result['unique_id'].rsplit('.', 1)[-1]: result['execution_time'] for result in results}
+    return elapsed, models
+
+
+def read_times(conn, repeat: int = 3):
+    times = {}
+    with conn.cursor() as cursor:
+        for relation in DOWNSTREAM_READS:
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                cursor.execute(f'SELECT count(*) FROM {relation}')
+                cursor.fetchone()
+                best = min(best, time.perf_counter() - started)
+            times[relation] = best
+    conn.rollback()
+    return times
+
+
+def report(label: str, elapsed: float, models):
+    timings = ', '.join(f'{name} {seconds * 1000:.0f}' for name, seconds in models.items())
+    print(f"{label}: {elapsed:.1f} s wall; model ms: {timings}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='dbt model build benchmark on a local Postgres')
+    parser.add_argument('--project-dir', default=os.path.join(PROJECT_DIR, 'ds_db'))
+    parser.add_argument('--scale', type=int, default=1, help='copies of the sample history')
+    parser.add_argument('--staging-rows', type=int, default=2000)
+    parser.add_argument('--batch-rows', type=int, default=500)
+    args = parser.parse_args()
+
+    shortages = shortage_records(args.scale)
+    conn = connect()
+    seed(conn, shortages, args.staging_rows)
+    project_dir = os.path.abspath(args.project_dir)
+
+    dbt(project_dir, 'seed')
+    report('full build', *dbt(project_dir, 'run', '--full-refresh'))
+    reads = read_times(conn)
+    print('downstream reads ms: ' + ', '.join(f'{name} {seconds * 1000:.0f}' for name, seconds in reads.items()))
+
+    add_staging_batch(conn, shortages, args.batch_rows, batch=1)
+    report(f'after {args.batch_rows} new staging rows', *dbt(project_dir, 'run'))
+    with conn.cursor() as cursor:
+        cursor.execute('SELECT count(*) FROM drug_shortages_combined')
+        print(f"drug_shortages_combined rows: {cursor.fetchone()[0]}")
+    conn.close()
+
+
+if __name__ == '__main__':
+    main()
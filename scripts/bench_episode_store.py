@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Memory and speed of dashboard/episode_store.EpisodeStore against the plain
+object-string / datetime64 frames the dashboards used to hold.
+
+Episodes are built from data/shortage_2019_2024_classified.csv the way the
+drug_shortage_episodes model builds them: one row per update, ending at the
+next update of the same (generic_name, company_name, presentation). --scale
+repeats the episodes under new drug names to project larger tables.
+
+    python scripts/bench_episode_store.py --scale 1 10
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_DIR)
+from dashboard.episode_store import EpisodeStore
+
+CATEGORIES = ['generic_name', 'company_name', 'presentation', 'therapeutic_category', 'shortage_status']
+DATES = ['episode_start_date', 'episode_end_date']
+SERIES = ['generic_name', 'company_name', 'presentation']
+# Columns streamlit_app keeps in memory; presentation is only used server-side for paging
+DASHBOARD_COLUMNS = ['generic_name', 'company_name', 'therapeutic_category', 'shortage_status',
+                     'episode_start_date', 'episode_end_date', 'episode_duration_days']
+RANKING_KEYS = ['generic_name', 'company_name', 'therapeutic_category']
+STATUS = {'Current': 'continued', 'Resolved': 'ended', 'To be Discontinued': 'discontinued',
+          'To Be Discontinued': 'discontinued'}
+
+
+def make_episodes(scale: int = 1) -> pd.DataFrame:
+    raw = pd.read_csv(os.path.join(PROJECT_DIR, 'data', 'shortage_2019_2024_classified.csv'))
+    raw['update_date'] = pd.to_datetime(raw['update_date'], format='%m/%d/%y')
+    raw = raw.dropna(subset=['generic_name', 'update_date']).sort_values(SERIES + ['update_date'])
+    end = raw.groupby(SERIES, dropna=False)['update_date'].shift(-1).fillna(pd.Timestamp('2024-12-31'))
+    episodes = pd.DataFrame({
+        'generic_name': raw['generic_name'].to_numpy(),
+        'company_name': raw['company_name'].to_numpy(),
+        'presentation': raw['presentation'].to_numpy(),
+        'therapeutic_category': raw['therapeutic_category'].to_numpy(),
+        'shortage_status': raw['status'].map(STATUS).to_numpy(),
+        'episode_start_date': raw['update_date'].to_numpy(),
+        'episode_end_date': end.to_numpy(),
+    })
+    episodes['episode_duration_days'] = (episodes['episode_end_date'] - episodes['episode_start_date']).dt.days
+    episodes = episodes[episodes['episode_duration_days'] > 0]
+    copies = []
+    for i in range(scale):
+        copy = episodes.copy()
+        if i:
+            # A distinct drug per copy, so cardinality grows with the table like it would over time
+            copy['generic_name'] = copy['generic_name'] + f' #{i}'
+            copy['presentation'] = copy['presentation'] + f' #{i}'
+        copies.append(copy)
+    # What the dashboards held: object strings (pandas 2 builds these from JSON rows) and datetime64
+    episodes = pd.concat(copies, ignore_index=True)
+    return episodes.astype({column: object for column in CATEGORIES})
+
+
+def timed(fn, repeat: int = 5) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def check_parity(df: pd.DataFrame, store: EpisodeStore, drugs, start, end):
+    expected = (df['generic_name'].isin(drugs) & (df['episode_start_date'] >= start)
+                & (df['episode_end_date'] <= end)).to_numpy()
+    actual = store.isin('generic_name', drugs) & store.within('episode_start_date', 'episode_end_date', start, end)
+    np.testing.assert_array_equal(actual, expected)
+
+    group, labels = store.group_codes(RANKING_KEYS)
+    sums = np.bincount(group[group >= 0], weights=store.frame['episode_duration_days'].to_numpy()[group >= 0])
+    reference = df.groupby(RANKING_KEYS)['episode_duration_days'].sum()
+    assert len(reference) == len(labels)
+    np.testing.assert_array_equal(reference.loc[pd.MultiIndex.from_frame(labels.astype(object))].to_numpy(), sums)
+
+    decoded = store.to_frame()
+    for column in CATEGORIES:
+        assert decoded[column].astype(object).equals(df[column].astype(object)), column
+    for column in DATES:
+        np.testing.assert_array_equal(decoded[column].to_numpy(), df[column].to_numpy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EpisodeStore memory and speed')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10])
+    args = parser.parse_args()
+
+    for scale in args.scale:
+        df = make_episodes(scale)
+        store = EpisodeStore(df, CATEGORIES, DATES)
+        before = df.memory_usage(deep=True).sum()
+        after = store.memory_usage()
+        projected_before = df[DASHBOARD_COLUMNS].memory_usage(deep=True).sum()
+        projected_after = store.frame[DASHBOARD_COLUMNS].memory_usage(deep=True).sum()
+
+        drugs = list(pd.Series(df['generic_name'].unique()).sample(10, random_state=0))
+        start, end = pd.Timestamp('2020-01-01'), pd.Timestamp('2023-12-31')
+        check_parity(df, store, drugs, start, end)
+
+        filter_object = timed(lambda: df[df['generic_name'].isin(drugs) & (df['episode_start_date'] >= start)
+                                         & (df['episode_end_date'] <= end)])
+        filter_codes = timed(lambda: store.take(store.isin('generic_name', drugs)
+                                                & store.within('episode_start_date', 'episode_end_date', start, end)))
+        group_object = timed(lambda: df.groupby(RANKING_KEYS)['episode_duration_days'].sum())
+        group_codes = timed(lambda: store.group_codes(RANKING_KEYS))
+
+        print(f"{len(df):>8} episodes: {before / 2**20:7.1f} MiB -> {after / 2**20:6.1f} MiB "
+              f"({before / after:.1f}x smaller); without presentation "
+              f"{projected_before / 2**20:.1f} MiB -> {projected_after / 2**20:.1f} MiB "
+              f"({projected_before / projected_after:.1f}x)")
+        print(f"{'':>18}filter {filter_object * 1000:6.2f} -> {filter_codes * 1000:6.2f} ms, "
+              f"group keys {group_object * 1000:6.2f} -> {group_codes * 1000:6.2f} ms")
+        for column in df.columns:
+            print(f"{'':>18}{column:<22} {df[column].memory_usage(deep=True, index=False) / 2**10:9.0f} KiB -> "
+                  f"{store.frame[column].memory_usage(deep=True, index=False) / 2**10:7.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark for dashboard/rankings.RankingEngine against the
+lambda groupby + merge that streamlit_app.load_data used to run.
+
+The legacy code summed shortage days per (generic_name, therapeutic_category)
+and merged that onto (generic_name, company_name, therapeutic_category) rows,
+so every company of a drug got the drug-wide shortage days. The parity check
+runs it with the merge keyed on all three columns, which is what the engine
+computes; the reported mismatch count shows how many rows the old merge got
+wrong on the same data.
+
+    python scripts/bench_rankings.py --scale 1 10
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.episode_store import EpisodeStore
+from dashboard.rankings import RANKING_KEYS, RankingEngine
+from bench_episode_store import CATEGORIES, DATES, make_episodes, timed
+
+
+def legacy_rankings(episodes_df: pd.DataFrame, merge_keys) -> pd.DataFrame:
+    """The original load_data ranking code; merge_keys was ['generic_name', 'therapeutic_category']"""
+    rankings_df = episodes_df.groupby(['generic_name', 'company_name', 'therapeutic_category']).agg({
+        'episode_duration_days': ['sum', 'count'],
+        'shortage_status': lambda x: (x.isin(['new', 'continued'])).sum()
+    }).reset_index()
+    rankings_df.columns = ['generic_name', 'company_name', 'therapeutic_category',
+                           'total_days', 'total_episodes', 'shortage_episodes']
+    shortage_summary = episodes_df[
+        episodes_df['shortage_status'].isin(['new', 'continued'])
+    ].groupby(merge_keys)['episode_duration_days'].sum().reset_index()
+    shortage_summary = shortage_summary.rename(columns={'episode_duration_days': 'shortage_days'})
+    rankings_df = rankings_df.merge(shortage_summary, on=merge_keys, how='left')
+    rankings_df['shortage_days'] = rankings_df['shortage_days'].fillna(0)
+    rankings_df['shortage_pct'] = (rankings_df['shortage_days'] / rankings_df['total_days'] * 100).round(2)
+    return rankings_df.sort_values('shortage_days', ascending=False)
+
+
+def with_shortages(df: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    # The sample data only has continued/ended/discontinued; mark some episodes 'new' as the mart does
+    rng = np.random.default_rng(seed)
+    df = df.copy()
+    df.loc[rng.random(len(df)) < 0.2, 'shortage_status'] = 'new'
+    return df
+
+
+def check_parity(df: pd.DataFrame, engine: RankingEngine):
+    expected = legacy_rankings(df, RANKING_KEYS).set_index(RANKING_KEYS).sort_index()
+    actual = engine.table().astype({key: object for key in RANKING_KEYS}).set_index(RANKING_KEYS).sort_index()
+    assert expected.index.equals(actual.index)
+    for column in ['total_days', 'total_episodes', 'shortage_episodes', 'shortage_days', 'shortage_pct']:
+        np.testing.assert_allclose(actual[column].to_numpy(dtype=float), expected[column].to_numpy(dtype=float))
+
+    old = legacy_rankings(df, ['generic_name', 'therapeutic_category']).set_index(RANKING_KEYS).sort_index()
+    wrong = (old['shortage_days'] != expected['shortage_days']).sum()
+    over = (old['shortage_pct'] > 100).sum()
+    print(f"parity: {len(actual)} groups match; the 2-key merge misstated shortage_days on {wrong} rows "
+          f"({over} above 100%)")
+
+    for metric in ['shortage_days', 'shortage_pct', 'total_episodes']:
+        top = engine.top(20, metric)
+        full = engine.table(metric)
+        np.testing.assert_allclose(top[metric].to_numpy(dtype=float), full[metric].head(20).to_numpy(dtype=float))
+
+
+def check_incremental(df: pd.DataFrame, store: EpisodeStore):
+    full = RankingEngine.from_store(store).table()
+    half = len(df) // 2
+    engine = RankingEngine.from_store(EpisodeStore(df.iloc[:half], CATEGORIES, DATES))
+    engine.add(EpisodeStore(df.iloc[half:], CATEGORIES, DATES))
+    # A revised episode: retract it and add the new version
+    revised = df.iloc[[0]].copy()
+    engine.remove(EpisodeStore(revised, CATEGORIES, DATES))
+    engine.add(EpisodeStore(revised, CATEGORIES, DATES))
+    pd.testing.assert_frame_equal(
+        engine.table().astype({key: object for key in RANKING_KEYS}).sort_values(RANKING_KEYS, ignore_index=True),
+        full.astype({key: object for key in RANKING_KEYS}).sort_values(RANKING_KEYS, ignore_index=True))
+    print("incremental: two batches plus a retract/re-add match a single build")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ranking engine parity check and benchmark')
+    parser.add_argument('--scale', type=int, nargs='+', default=[1, 10])
+    args = parser.parse_args()
+
+    for i, scale in enumerate(args.scale):
+        df = with_shortages(make_episodes(scale))
+        store = EpisodeStore(df, CATEGORIES, DATES)
+        engine = RankingEngine.from_store(store)
+        if i == 0:
+            check_parity(df, engine)
+            check_incremental(df, store)
+
+        legacy = timed(lambda: legacy_rankings(df, ['generic_name', 'therapeutic_category']).head(20), repeat=3)
+        build = timed(lambda: RankingEngine.from_store(store))
+        top = timed(lambda: engine.top(20, 'shortage_days'))
+        batch = EpisodeStore(df.iloc[:100], CATEGORIES, DATES)
+        update = timed(lambda: engine.add(batch), repeat=1)
+        print(f"{len(df):>8} episodes, {len(engine):>6} groups: legacy {legacy * 1000:7.1f} ms, "
+              f"engine build {build * 1000:6.1f} ms, top-20 {top * 1000:5.2f} ms, "
+              f"add 100 episodes {update * 1000:5.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark for the vectorized Kaplan-Meier engine in
+dashboard/survival.py against the per-time loop it replaced in dash_app.
+
+Synthetic episodes mimic mart_shortage_survival: whole-day durations, ~70%
+resolved, a dozen route categories. The old loop is O(n * distinct times), so
+it is only timed up to --legacy-max episodes.
+
+    python scripts/bench_survival.py --sizes 10000 100000 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.survival import grouped_kaplan_meier, logrank_test
+
+ROUTES = ['injection', 'oral', 'topical', 'inhalation', 'ophthalmic', 'otic', 'nasal',
+          'rectal', 'vaginal', 'transdermal', 'irrigation', 'unknown']
+
+
+def legacy_kaplan_meier(durations, events):
+    """The original dash_app.kaplan_meier, kept verbatim as the reference"""
+    df = pd.DataFrame({'t': durations, 'e': events}).sort_values('t')
+    times = sorted(df['t'].unique())
+    n = len(df)
+    surv = 1.0
+    km_times = [0]
+    km_surv = [1.0]
+    for t in times:
+        at_risk = n
+        events_at_t = int(df[(df['t'] == t) & (df['e'] == True)].shape[0])
+        censored_at_t = int(df[(df['t'] == t) & (df['e'] == False)].shape[0])
+        if at_risk > 0 and events_at_t > 0:
+            surv *= (1 - events_at_t / at_risk)
+        km_times.append(t)
+        km_surv.append(surv)
+        n -= (events_at_t + censored_at_t)
+    return km_times, km_surv
+
+
+def make_episodes(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    route = rng.choice(ROUTES, size=n, p=np.linspace(2, 0.5, len(ROUTES)) / np.linspace(2, 0.5, len(ROUTES)).sum())
+    scale = 200 + 40 * pd.factorize(route, sort=True)[0]
+    return pd.DataFrame({
+        'route_category': route,
+        'duration_days': np.maximum(1, rng.exponential(scale)).astype(int),
+        'resolved': rng.random(n) < 0.7,
+    })
+
+
+def legacy_grouped(df: pd.DataFrame):
+    return {group: legacy_kaplan_meier(rows['duration_days'].values, rows['resolved'].values)
+            for group, rows in df.groupby('route_category')}
+
+
+def check_parity(df: pd.DataFrame):
+    curves = grouped_kaplan_meier(df['duration_days'], df['resolved'], df['route_category'])
+    reference = legacy_grouped(df)
+    assert curves.keys() == reference.keys()
+    for group, (times, survival) in reference.items():
+        np.testing.assert_array_equal(curves[group].times, times)
+        np.testing.assert_allclose(curves[group].survival, survival, rtol=1e-10, atol=1e-12)
+        assert (curves[group].ci_lower <= curves[group].survival + 1e-12).all()
+        assert (curves[group].ci_upper >= curves[group].survival - 1e-12).all()
+    print(f"parity: {len(reference)} groups match the legacy loop on {len(df)} episodes")
+
+
+def timed(fn, repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Kaplan-Meier parity check and benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--legacy-max', type=int, default=10_000)
+    args = parser.parse_args()
+
+    check_parity(make_episodes(3_000, seed=1))
+
+    for n in args.sizes:
+        df = make_episodes(n)
+        vectorized = timed(lambda: grouped_kaplan_meier(df['duration_days'], df['resolved'], df['route_category']))
+        logrank = timed(lambda: logrank_test(df['duration_days'], df['resolved'], df['route_category']))
+        line = f"{n:>9} episodes: grouped KM {vectorized * 1000:8.1f} ms, log-rank {logrank * 1000:8.1f} ms"
+        if n <= args.legacy_max:
+            legacy = timed(lambda: legacy_grouped(df), repeat=1)
+            line += f", legacy loop {legacy * 1000:9.1f} ms ({legacy / vectorized:.0f}x)"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
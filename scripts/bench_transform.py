@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Parity check and benchmark: row-wise vs columnar OpenFDAETL.transform_data.
+
+Builds synthetic openFDA records (including exact duplicates), asserts both
+paths produce identical frames apart from created_at, then times them.
+
+    python scripts/bench_transform.py --records 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.fetch_fda_data import OpenFDAETL
+
+UPDATE_TYPES = ['New', 'Revised', 'Reverified', ' revised ']
+STATUSES = ['Current', 'Resolved', 'To Be Discontinued', 'current ', 'Unknown']
+
+
+def make_records(n: int):
+    records = []
+    for i in range(n):
+        record = {
+            'generic_name': f'Drug {i % 1500}',
+            'company_name': f'Company {i % 120}',
+            'presentation': f'{i % 40} mg vial (NDC {i:05d}-001-01)',
+            'update_type': random.choice(UPDATE_TYPES),
+            'update_date': f'{random.randint(1, 12):02d}/{random.randint(1, 28):02d}/2024',
+            'availability': random.choice(['Available', 'Backordered', None]),
+            'related_info': 'Check wholesaler for inventory.',
+            'therapeutic_category': [random.choice(['Oncology', 'Anesthesia', 'Neurology'])],
+            'status': random.choice(STATUSES),
+            'change_date': '01/02/2024',
+            'package_ndc': f'{i:05d}-001-01',
+        }
+        if i % 3 == 0:
+            record['reason_for_shortage'] = 'Demand increase for the drug'
+        records.append(record)
+    # Exact duplicates must map to the same content id
+    records.extend(random.sample(records, max(1, n // 500)))
+    return records
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--records', type=int, default=100000)
+    args = parser.parse_args()
+
+    raw = make_records(args.records)
+    etl = OpenFDAETL()
+    rows, rows_time = timed(lambda: etl.transform_data(raw, columnar=False))
+    cols, cols_time = timed(lambda: etl.transform_data(raw, columnar=True))
+
+    rows = rows.drop(columns='created_at').astype(object)
+    cols = cols.drop(columns='created_at').astype(object)
+    pd.testing.assert_frame_equal(rows.where(rows.notna(), None), cols.where(cols.notna(), None))
+    assert cols['id'].nunique() == len(cols.drop_duplicates(['generic_name', 'company_name', 'presentation',
+                                                              'update_date', 'ndc']))
+
+    n = len(raw)
+    print(f'parity OK on {n} records')
+    print(f'row-wise : {rows_time:.3f}s ({n / rows_time:,.0f} records/sec)')
+    print(f'columnar : {cols_time:.3f}s ({n / cols_time:,.0f} records/sec)  {rows_time / cols_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
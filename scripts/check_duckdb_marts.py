@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Parity check for sql/duckdb_marts.sql, the DuckDB copy of the ds_db models:
+the same synthetic sources are built by dbt on a scratch Postgres and by
+DuckDBBackend.build_marts, and every model is compared on its row count and
+key columns. content_hash and the other md5 keys are left out; they are
+computed differently on purpose (see the head of sql/duckdb_marts.sql).
+
+Point DBT_* at a scratch database; the source tables are dropped and recreated.
+
+    DBT_HOST=localhost DBT_PORT=5432 DBT_USER=postgres DBT_PASSWORD= \\
+    DBT_DATABASE=postgres DBT_SCHEMA=public python scripts/check_duckdb_marts.py [--rows 3000]
+
+tests/test_duckdb_parity.py runs the same check when DBT_HOST is set.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.storage import DuckDBBackend, quote
+from bench_dbt_models import PROJECT_DIR, connect, dbt, seed
+from synthetic_data import ndc_directory, shortage_records
+
+# Columns compared per model, in build order
+MODEL_KEYS = {
+    'drug_shortages_combined': ['id', 'data_source'],
+    'stg_drug_shortages': ['id', 'ndc'],
+    'int_route_categories': ['route_name_raw', 'route_category'],
+    'int_shortage_ndc': ['id', 'ndc', 'drug_identifier', 'route_category', 'single_source'],
+    'int_shortage_episodes': ['generic_name', 'company_name', 'presentation', 'episode_start_date',
+                              'episode_end_date'],
+    'drug_shortage_episodes': ['generic_name', 'company_name', 'presentation', 'episode_start_date',
+                               'episode_end_date', 'episode_duration_days', 'is_open'],
+    'mart_shortage_characteristics': ['drug_identifier', 'route_category', 'single_source',
+                                      'first_update_date', 'last_update_date'],
+    'int_shortage_survival_episodes': ['drug_identifier', 'route_category', 'single_source', 'episode_number',
+                                       'shortage_start_date', 'resolution_date'],
+    'mart_shortage_survival': ['drug_identifier', 'route_category', 'single_source', 'episode_number',
+                               'shortage_start_date', 'resolution_date', 'resolved', 'duration_days'],
+}
+NUMERIC_COLUMNS = {'id', 'single_source', 'episode_number', 'episode_duration_days', 'duration_days'}
+
+
+def normalized(frame: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """`columns` as comparable text: dates as ISO, numbers without their type, nulls as '<null>'"""
+    out = {}
+    for column in columns:
+        values = frame[column].reset_index(drop=True)
+        if column.endswith('_date'):
+            values = pd.to_datetime(values).dt.strftime('%Y-%m-%d')
+        elif column in NUMERIC_COLUMNS:
+            values = pd.to_numeric(values).map(lambda value: f'{value:.15g}', na_action='ignore')
+        out[column] = values.astype(object).where(values.notna(), '<null>').astype(str)
+    return pd.DataFrame(out, columns=columns).sort_values(columns, ignore_index=True)
+
+
+def read_postgres(conn, table: str, columns: List[str]) -> pd.DataFrame:
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT {", ".join(map(quote, columns))} FROM {table}')
+        return pd.DataFrame(cursor.fetchall(), columns=columns)
+
+
+def compare(conn, storage: DuckDBBackend) -> Dict[str, Tuple[int, int, int]]:
+    """(Postgres rows, DuckDB rows, rows in only one of them) per model"""
+    results = {}
+    for table, columns in MODEL_KEYS.items():
+        postgres = normalized(read_postgres(conn, table, columns), columns)
+        duckdb = normalized(storage.fetch(table, columns), columns)
+        merged = postgres.assign(_n=postgres.groupby(columns).cumcount()).merge(
+            duckdb.assign(_n=duckdb.groupby(columns).cumcount()), how='outer', indicator=True)
+        results[table] = (len(postgres), len(duckdb), int((merged['_merge'] != 'both').sum()))
+    conn.rollback()
+    return results
+
+
+def build_and_compare(rows: int = 3000, staging_rows: int = 500,
+                      project_dir: str = os.path.join(PROJECT_DIR, 'ds_db')) -> Dict[str, Tuple[int, int, int]]:
+    """Build both stores from the newest `rows` seed records and compare them"""
+    shortages = shortage_records(1).iloc[-rows:].reset_index(drop=True)
+    directory = ndc_directory(shortages)
+
+    conn = connect()
+    seed(conn, shortages, staging_rows)
+    project_dir = os.path.abspath(project_dir)
+    dbt(project_dir, 'seed')
+    dbt(project_dir, 'run', '--full-refresh')
+
+    with tempfile.TemporaryDirectory() as scratch:
+        storage = DuckDBBackend(os.path.join(scratch, 'parity.duckdb'))
+        storage.load_seeds(shortages.drop(columns='created_at'), ndc_fda=directory, staging_rows=staging_rows)
+        storage.build_marts()
+        try:
+            return compare(conn, storage)
+        finally:
+            storage.close()
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the DuckDB models with the dbt ones on the same sources')
+    parser.add_argument('--rows', type=int, default=3000, help='seed records to build from')
+    parser.add_argument('--staging-rows', type=int, default=500)
+    parser.add_argument('--project-dir', default=os.path.join(PROJECT_DIR, 'ds_db'))
+    args = parser.parse_args()
+
+    results = build_and_compare(args.rows, args.staging_rows, args.project_dir)
+    for table, (postgres, duckdb, mismatched) in results.items():
+        print(f"{table:<32} postgres {postgres:>7}  duckdb {duckdb:>7}  mismatched {mismatched}")
+    if any(mismatched for _, _, mismatched in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Parity check for route classification: the CASE expression int_shortage_ndc
+used to evaluate per row, the int_route_categories table built from
+ds_db/seeds/route_category_rules.csv, and etl/route_category.py.
+
+Routes checked are a list of FDA SPL route names and combinations plus every
+distinct ROUTENAME in ndc_fda. The legacy CASE runs on Postgres through a
+VALUES list; int_route_categories is compared when it has been built.
+
+    DBT_HOST=localhost DBT_PORT=5432 DBT_USER=postgres DBT_PASSWORD= \\
+    DBT_DATABASE=postgres DBT_SCHEMA=public python scripts/check_route_categories.py
+"""
+
+import os
+import sys
+
+import pandas as pd
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.route_category import classify_routes
+from bench_dbt_models import connect
+
+# The CASE from int_shortage_ndc before route categories moved to a lookup table
+LEGACY_CASE = """
+    case
+        when lower(route_name_raw) like any(array[
+            '%intravenous%', '%intramuscular%', '%subcutaneous%', '%parenteral%',
+            '%epidural%', '%intrathecal%', '%intradermal%', '%intraperitoneal%',
+            '%intrapleural%', '%intravascular%', '%intracardiac%', '%intracavitary%',
+            '%intracoronary%', '%intraventricular%', '%intracerebral%', '%intramedullary%',
+            '%intralesional%', '%subarachnoid%', '%intraspinal%', '%perineural%',
+            '%infiltration%', '%submucosal%', '%intrathoracic%', '%intrauterine%',
+            '%intragastric%', '%intraepidermal%', '%intrasinal%', '%hemodialysis%',
+            '%extracorporeal%', '%retrobulbar%', '%subgingival%', '%endocervical%',
+            '%intraluminal%', '%intramedullary%', '%intracavernous%', '%intratympanic%'
+        ]) then 'injectable'
+        when lower(route_name_raw) like any(array[
+            '%inhalation%', '%endotracheal%', '%intrabronchial%',
+            '%laryngeal%', '%transtracheal%'
+        ]) then 'inhalation'
+        when lower(route_name_raw) like any(array[
+            '%ophthalmic%', '%intraocular%', '%intravitreal%',
+            '%intracameral%', '%intracanalicular%', '%suprachoroidal%', '%conjunctival%'
+        ]) then 'ophthalmic'
+        when lower(route_name_raw) like any(array[
+            '%oral%', '%sublingual%', '%buccal%', '%enteral%',
+            '%oropharyngeal%', '%nasogastric%', '%transmucosal%'
+        ]) then 'oral'
+        when lower(route_name_raw) like any(array[
+            '%topical%', '%cutaneous%', '%transdermal%', '%percutaneous%'
+        ]) then 'topical'
+        when lower(route_name_raw) like '%nasal%' then 'nasal'
+        when lower(route_name_raw) like any(array['%otic%', '%intratympanic%']) then 'otic'
+        when lower(route_name_raw) like '%rectal%' then 'rectal'
+        when lower(route_name_raw) like '%vaginal%' then 'vaginal'
+        when lower(route_name_raw) like any(array[
+            '%dental%', '%periodontal%', '%subgingival%'
+        ]) then 'dental'
+        when lower(route_name_raw) like any(array[
+            '%ureteral%', '%urethral%', '%intravesical%', '%irrigation%'
+        ]) then 'urological'
+        when route_name_raw is null then null
+        else 'other'
+    end as route_category
+"""
+
+# FDA SPL route of administration names, plus the combined forms ndc_fda uses
+SPL_ROUTES = [
+    'AURICULAR (OTIC)', 'BUCCAL', 'CONJUNCTIVAL', 'CUTANEOUS', 'DENTAL', 'ENDOCERVICAL',
+    'ENDOSINUSIAL', 'ENDOTRACHEAL', 'ENTERAL', 'EPIDURAL', 'EXTRACORPOREAL', 'EXTRA-AMNIOTIC',
+    'HEMODIALYSIS', 'INFILTRATION', 'INTERSTITIAL', 'INTRA-ABDOMINAL', 'INTRA-AMNIOTIC',
+    'INTRA-ARTERIAL', 'INTRA-ARTICULAR', 'INTRABRONCHIAL', 'INTRABURSAL', 'INTRACAMERAL',
+    'INTRACANALICULAR', 'INTRACARDIAC', 'INTRACAVERNOUS', 'INTRACAVITARY', 'INTRACEREBRAL',
+    'INTRACORONARY', 'INTRADERMAL', 'INTRADISCAL', 'INTRAEPIDERMAL', 'INTRAGASTRIC',
+    'INTRALESIONAL', 'INTRALUMINAL', 'INTRALYMPHATIC', 'INTRAMEDULLARY', 'INTRAMUSCULAR',
+    'INTRAOCULAR', 'INTRAPERITONEAL', 'INTRAPLEURAL', 'INTRAPROSTATIC', 'INTRASINAL',
+    'INTRASPINAL', 'INTRASYNOVIAL', 'INTRATHECAL', 'INTRATHORACIC', 'INTRATUMORAL',
+    'INTRATYMPANIC', 'INTRAUTERINE', 'INTRAVASCULAR', 'INTRAVENOUS', 'INTRAVENTRICULAR',
+    'INTRAVESICAL', 'INTRAVITREAL', 'IONTOPHORESIS', 'IRRIGATION', 'LARYNGEAL', 'NASAL',
+    'NASOGASTRIC', 'OPHTHALMIC', 'ORAL', 'OROPHARYNGEAL', 'PARENTERAL', 'PERCUTANEOUS',
+    'PERIARTICULAR', 'PERINEURAL', 'PERIODONTAL', 'RECTAL', 'RESPIRATORY (INHALATION)',
+    'RETROBULBAR', 'SOFT TISSUE', 'SUBARACHNOID', 'SUBCONJUNCTIVAL', 'SUBCUTANEOUS',
+    'SUBGINGIVAL', 'SUBLINGUAL', 'SUBMUCOSAL', 'SUPRACHOROIDAL', 'TOPICAL', 'TRANSDERMAL',
+    'TRANSMUCOSAL', 'TRANSTRACHEAL', 'URETERAL', 'URETHRAL', 'VAGINAL', 'NOT APPLICABLE',
+    'INTRAMUSCULAR; INTRAVENOUS', 'INTRAVENOUS; SUBCUTANEOUS', 'INTRAMUSCULAR; SUBCUTANEOUS',
+    'EPIDURAL; INFILTRATION; INTRACAUDAL; PERINEURAL', 'INTRA-ARTICULAR; INTRALESIONAL; INTRAMUSCULAR',
+    'ORAL; SUBLINGUAL', 'TOPICAL; TRANSDERMAL', 'DENTAL; INFILTRATION', 'OPHTHALMIC; TOPICAL',
+    'AURICULAR (OTIC); OPHTHALMIC', 'RECTAL; TOPICAL', 'NASAL; ORAL', 'INTRATYMPANIC; OTIC',
+    'SUBGINGIVAL; PERIODONTAL', 'VAGINAL; TOPICAL', 'IRRIGATION; URETHRAL', 'Oral',
+]
+
+
+def distinct_routes(cursor):
+    cursor.execute('SELECT to_regclass(\'ndc_fda\')')
+    if cursor.fetchone()[0] is None:
+        return []
+    cursor.execute('SELECT DISTINCT "ROUTENAME" FROM ndc_fda WHERE "ROUTENAME" IS NOT NULL')
+    return [row[0] for row in cursor.fetchall()]
+
+
+def legacy_categories(cursor, routes) -> list:
+    rows = execute_values(
+        cursor,
+        'SELECT ordinality, ' + LEGACY_CASE.replace('%', '%%') + ' FROM (VALUES %s) AS v(route_name_raw, ordinality)',
+        [(route, i) for i, route in enumerate(routes)], fetch=True, page_size=len(routes))
+    return [category for _, category in sorted(rows)]
+
+
+def table_categories(cursor) -> dict:
+    cursor.execute('SELECT to_regclass(\'int_route_categories\')')
+    if cursor.fetchone()[0] is None:
+        return {}
+    cursor.execute('SELECT route_name_raw, route_category FROM int_route_categories')
+    return dict(cursor.fetchall())
+
+
+def main():
+    conn = connect()
+    with conn.cursor() as cursor:
+        routes = sorted(set(SPL_ROUTES) | set(distinct_routes(cursor))) + [None]
+        compared = pd.DataFrame({
+            'route_name_raw': routes,
+            'legacy': legacy_categories(cursor, routes),
+            'python': classify_routes(pd.Series(routes, dtype=object)).to_numpy(),
+        })
+        stored = table_categories(cursor)
+    conn.close()
+
+    checks = ['python']
+    if stored:
+        compared['table'] = compared['route_name_raw'].map(stored)
+        checks.append('table')
+    in_table = compared['route_name_raw'].isin(stored.keys()) | compared['route_name_raw'].isna()
+    differs = compared['python'].fillna('<null>') != compared['legacy'].fillna('<null>')
+    if stored:
+        differs |= in_table & (compared['table'].fillna('<null>') != compared['legacy'].fillna('<null>'))
+    print(f"{len(compared)} routes checked against the legacy CASE: {', '.join(checks)}"
+          f"{f' ({in_table.sum() - 1} stored routes)' if stored else ''}")
+    if differs.any():
+        print(compared[differs].to_string(index=False))
+        sys.exit(1)
+    print(compared['legacy'].fillna('<null>').value_counts().to_string())
+
+
+if __name__ == '__main__':
+    main()
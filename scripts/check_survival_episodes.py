@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Parity check for multi-episode survival data: mart_shortage_survival as built
+by dbt (gaps and islands in int_shortage_survival_episodes) against
+dashboard/survival.survival_episodes, the NumPy run-length equivalent, on the
+same int_shortage_ndc rows.
+
+Build the project first (scripts/bench_dbt_models.py seeds a scratch database
+and runs dbt), then:
+
+    DBT_HOST=localhost DBT_PORT=5432 DBT_USER=postgres DBT_PASSWORD= \\
+    DBT_DATABASE=postgres DBT_SCHEMA=public python scripts/check_survival_episodes.py
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dashboard.survival import SURVIVAL_KEYS, survival_episodes
+from bench_dbt_models import connect
+from bench_episode_store import timed
+
+MART_COLUMNS = SURVIVAL_KEYS + ['episode_number', 'shortage_start_date', 'resolution_date', 'resolved',
+                                'duration_days']
+
+
+def read(conn, query: str) -> pd.DataFrame:
+    with conn.cursor() as cursor:
+        cursor.execute(query)
+        return pd.DataFrame(cursor.fetchall(), columns=[column.name for column in cursor.description])
+
+
+def normalized(df: pd.DataFrame) -> pd.DataFrame:
+    df = df[MART_COLUMNS].astype(object)
+    for column in ['shortage_start_date', 'resolution_date']:
+        df[column] = pd.to_datetime(df[column]).astype('datetime64[ns]')
+    df['duration_days'] = df['duration_days'].astype(int)
+    df['episode_number'] = df['episode_number'].astype(int)
+    df = df.fillna({'route_category': '<null>', 'single_source': -1.0})
+    return df.sort_values(SURVIVAL_KEYS + ['episode_number'], ignore_index=True)
+
+
+def main():
+    conn = connect()
+    rows = read(conn, 'SELECT drug_identifier, route_category, "single_source", shortage_status, update_date '
+                      'FROM int_shortage_ndc')
+    as_of = read(conn, 'SELECT max(source_created_at)::date AS as_of FROM drug_shortages_combined')['as_of'][0]
+    mart = read(conn, 'SELECT * FROM mart_shortage_survival')
+    conn.close()
+
+    local = survival_episodes(rows, as_of_date=as_of)
+    pd.testing.assert_frame_equal(normalized(local), normalized(mart))
+
+    drugs = mart.groupby(SURVIVAL_KEYS, dropna=False).ngroups
+    recurring = (mart['episode_number'] > 1).sum()
+    seconds = timed(lambda: survival_episodes(rows, as_of_date=as_of))
+    print(f"parity: {len(mart)} episodes over {drugs} drugs match ({recurring} recurrences the "
+          f"one-row-per-drug mart dropped); survival_episodes on {len(rows)} rows: {seconds * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+The whole pipeline on the embedded DuckDB store, with no Supabase, dbt or network:
+
+1. load the seed CSV under data/ into the source tables (--staging-rows of it into staging)
+2. load an NDC product directory: --ndc-csv, or a synthetic one covering the seed NDCs
+3. optionally replay recorded openFDA responses (cache/openfda) into staging
+4. build every model in sql/duckdb_marts.sql
+5. read the marts the way the dashboards do
+
+and prints the time each step took. The dashboards read the same file with
+
+    STORAGE_BACKEND=duckdb DUCKDB_PATH=cache/drug_shortage.duckdb python dashboard/dash_app.py
+
+    python scripts/run_local_pipeline.py [--path cache/drug_shortage.duckdb] [--scale 10]
+                                         [--ndc-csv ndc_fda.csv] [--replay] [--profile]
+
+--profile runs everything under cProfile and prints the most expensive calls.
+"""
+
+import argparse
+import cProfile
+import os
+import pstats
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.storage import DEFAULT_DUCKDB_PATH, DuckDBBackend
+from synthetic_data import NDC_COLUMNS, ndc_directory, shortage_records
+
+# What each dashboard reads: (table, columns, order_by)
+DASHBOARD_READS = [
+    ('mart_shortage_characteristics',
+     ['drug_identifier', 'route_category', 'single_source', 'first_update_date', 'last_update_date'],
+     ['drug_identifier', 'route_category', 'single_source']),
+    ('mart_shortage_survival',
+     ['drug_identifier', 'route_category', 'single_source', 'episode_number', 'shortage_start_date',
+      'resolution_date', 'resolved', 'duration_days'],
+     ['drug_identifier', 'route_category', 'single_source', 'episode_number']),
+    ('drug_shortage_episodes',
+     ['generic_name', 'company_name', 'therapeutic_category', 'shortage_status', 'episode_start_date',
+      'episode_end_date', 'episode_duration_days'],
+     ['generic_name', 'company_name', 'presentation', 'episode_start_date']),
+]
+
+
+class Steps:
+    def __init__(self):
+        self.timings = []
+
+    def run(self, label: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - started
+        self.timings.append((label, elapsed))
+        print(f"{label}: {elapsed * 1000:.0f} ms")
+        return result
+
+
+def read_ndc_csv(path: str) -> pd.DataFrame:
+    directory = pd.read_csv(path, dtype=str, usecols=lambda column: column in NDC_COLUMNS)
+    directory['single_source'] = pd.to_numeric(directory['single_source'], errors='coerce')
+    return directory
+
+
+def replay(storage: DuckDBBackend) -> bool:
+    from etl.fetch_fda_data import OpenFDAETL
+    # Same store as the rest of the run, whatever STORAGE_BACKEND says
+    etl = OpenFDAETL(replay=True, storage=storage)
+    return etl.replay_etl()
+
+
+def run(args):
+    steps = Steps()
+    if args.fresh and os.path.exists(args.path):
+        os.remove(args.path)
+    storage = steps.run('open', DuckDBBackend, args.path)
+
+    records = steps.run('read seed CSV', shortage_records, args.scale).drop(columns='created_at')
+    if args.ndc_csv:
+        directory = steps.run('read NDC directory', read_ndc_csv, args.ndc_csv)
+    else:
+        directory = steps.run('synthesize NDC directory', ndc_directory, records)
+    steps.run(f'load {len(records)} seed rows', storage.load_seeds, records, ndc_fda=directory,
+              staging_rows=args.staging_rows)
+    if args.replay and not steps.run('replay cached openFDA responses', replay, storage):
+        print("Replay failed; building the marts from the seeds alone", file=sys.stderr)
+
+    timings = steps.run('build marts', storage.build_marts)
+    print('  ' + ', '.join(f'{name} {seconds * 1000:.0f}' for name, seconds in timings.items()))
+
+    for table, columns, order_by in DASHBOARD_READS:
+        frame = steps.run(f'read {table}', storage.fetch, table, columns, order_by=order_by)
+        print(f"  {len(frame)} rows")
+    storage.close()
+    print(f"total: {sum(seconds for _, seconds in steps.timings):.2f} s -> {args.path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the pipeline locally on the embedded DuckDB store')
+    parser.add_argument('--path', default=os.getenv('DUCKDB_PATH', DEFAULT_DUCKDB_PATH))
+    parser.add_argument('--scale', type=int, default=1, help='copies of the seed history')
+    parser.add_argument('--staging-rows', type=int, default=2000)
+    parser.add_argument('--ndc-csv', help='ndc_fda export to load instead of the synthetic directory')
+    parser.add_argument('--replay', action='store_true', help='also replay the recorded openFDA responses')
+    parser.add_argument('--keep', dest='fresh', action='store_false',
+                        help='load into the existing file instead of starting from an empty one')
+    parser.add_argument('--profile', action='store_true', help='run under cProfile and print the top calls')
+    args = parser.parse_args()
+
+    if not args.profile:
+        run(args)
+        return
+    profiler = cProfile.Profile()
+    profiler.runcall(run, args)
+    pstats.Stats(profiler).sort_stats('cumulative').print_stats(25)
+
+
+if __name__ == '__main__':
+    main()
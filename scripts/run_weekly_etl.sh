@@ -46,8 +46,13 @@ mkdir -p "$LOG_DIR"
         exit 1
     fi
     
-    echo "Running dbt seed (if any seed files exist)..."
-    dbt seed --select state:modified+ || true
+    echo "Running dbt seed..."
+    dbt seed
+    
+    if [ $? -ne 0 ]; then
+        echo "ERROR: dbt seed failed"
+        exit 1
+    fi
     
     echo "Running dbt run..."
     dbt run
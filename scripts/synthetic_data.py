@@ -0,0 +1,65 @@
+"""
+Synthetic source tables built from the seed CSV under data/, shared by the
+benchmarks, scripts/run_local_pipeline.py and the DuckDB/dbt parity check:
+
+- shortage_records: the seed history, repeated `scale` times under new names
+- ndc_directory: an ndc_fda covering the shortage NDCs, since the real
+  directory is not in the repo
+"""
+
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from etl.ids import content_ids
+from etl.storage import seed_records
+
+NDC_COLUMNS = ['key', 'ApplNo', 'DrugName', 'SponsorName_x', 'single_source', 'ActiveIngredient',
+               'PROPRIETARYNAME', 'APPLICATIONNUMBER', 'PRODUCTNDC', 'ROUTENAME', 'SUBSTANCENAME',
+               'LABELERNAME']
+# A spread of real ndc_fda ROUTENAME values, most common first
+ROUTE_NAMES = ['ORAL', 'INTRAVENOUS', 'INTRAMUSCULAR; INTRAVENOUS', 'SUBCUTANEOUS', 'TOPICAL',
+               'OPHTHALMIC', 'RESPIRATORY (INHALATION)', 'INTRAMUSCULAR', 'NASAL', 'RECTAL',
+               'INTRAVENOUS; SUBCUTANEOUS', 'EPIDURAL; INFILTRATION; INTRACAUDAL; PERINEURAL',
+               'VAGINAL', 'SUBLINGUAL', 'TRANSDERMAL', 'OTIC', 'DENTAL', 'IRRIGATION',
+               'INTRAVESICAL', 'INTRATHECAL', 'INTRAVITREAL', 'CUTANEOUS', 'BUCCAL', 'URETHRAL']
+
+
+def shortage_records(scale: int) -> pd.DataFrame:
+    raw = seed_records()
+    copies = []
+    for i in range(scale):
+        copy = raw.copy()
+        if i:
+            copy['generic_name'] = copy['generic_name'] + f' #{i}'
+            copy['id'] = content_ids(copy)
+        copies.append(copy)
+    df = pd.concat(copies, ignore_index=True)
+    df['created_at'] = None
+    return df.drop_duplicates('id').sort_values('update_date', na_position='first', ignore_index=True)
+
+
+def ndc_directory(shortages: pd.DataFrame) -> pd.DataFrame:
+    products = shortages[['generic_name', 'ndc']].dropna()
+    products = products.assign(ndc=products['ndc'].str.split(',')).explode('ndc')
+    products['PRODUCTNDC'] = products['ndc'].str.strip().str.replace(r'-[^-]*$', '', regex=True)
+    products = products[products['PRODUCTNDC'] != ''].drop_duplicates('PRODUCTNDC', ignore_index=True)
+
+    # Deterministic per product, and about one in ten shortage NDCs missing from the directory
+    draw = pd.util.hash_array(products['PRODUCTNDC'].to_numpy(dtype=object)) % 1000
+    directory = products[draw >= 100].reset_index(drop=True)
+    draw = draw[draw >= 100]
+    weights = 1 / np.arange(1, len(ROUTE_NAMES) + 1)
+    edges = np.cumsum(weights / weights.sum()) * 900 + 100
+    route = np.searchsorted(edges, draw, side='right').clip(0, len(ROUTE_NAMES) - 1)
+    directory['ROUTENAME'] = np.array(ROUTE_NAMES)[route]
+    directory['SUBSTANCENAME'] = directory['generic_name'].str.split().str[0].str.upper()
+    directory['key'] = np.arange(len(directory))
+    directory['single_source'] = (draw % 3 == 0).astype(float)
+    for column in NDC_COLUMNS:
+        if column not in directory:
+            directory[column] = None
+    return directory[NDC_COLUMNS]
@@ -1,6 +1,6 @@
 -- Create the staging table for drug shortage data
 CREATE TABLE IF NOT EXISTS drug_shortages_staging (
-    id INTEGER PRIMARY KEY,
+    id BIGINT PRIMARY KEY,
     generic_name TEXT,
     company_name TEXT,
     presentation TEXT,
@@ -25,74 +25,6 @@ CREATE TABLE IF NOT EXISTS drug_shortages_staging (
 CREATE INDEX IF NOT EXISTS idx_status ON drug_shortages_staging(shortage_status);
 CREATE INDEX IF NOT EXISTS idx_update_date ON drug_shortages_staging(update_date);
 
--- Create a union view combining historical and staging data with deduplication
-CREATE OR REPLACE VIEW drug_shortages_combined AS
-WITH all_records AS (
-    SELECT 
-        id,
-        generic_name,
-        company_name,
-        presentation,
-        update_type,
-        update_date,
-        availability,
-        related_info,
-        resolved_note,
-        reason_for_shortage,
-        therapeutic_category,
-        status,
-        status_change_date,
-        change_date,
-        date_discontinued,
-        shortage_status,
-        ndc,
-        created_at,
-        'staging' as data_source
-    FROM drug_shortages_staging
-
-    UNION ALL
-
-    SELECT 
-        id,
-        generic_name,
-        company_name,
-        presentation,
-        update_type,
-        update_date,
-        availability,
-        related_info,
-        resolved_note,
-        reason_for_shortage,
-        therapeutic_category,
-        status,
-        status_change_date,
-        change_date,
-        date_discontinued,
-        shortage_status,
-        ndc,
-        CAST('2025-09-11 10:30:00' AS DATE) as created_at,
-        'historical' as data_source
-    FROM drug_shortages_classified_raw
-),
-deduplicated AS (
-    SELECT
-        *,
-        ROW_NUMBER() OVER(
-            PARTITION BY generic_name, company_name, presentation, update_type, 
-            update_date, availability, related_info, resolved_note, 
-            reason_for_shortage, therapeutic_category, status, 
-            status_change_date, change_date, date_discontinued, 
-            shortage_status, ndc
-        ) as row_num
-    FROM
-        all_records
-)
-
-SELECT 
-    id, generic_name, company_name, presentation, update_type, 
-    update_date, availability, related_info, resolved_note, 
-    reason_for_shortage, therapeutic_category, status, 
-    status_change_date, change_date, date_discontinued, 
-    shortage_status, ndc, created_at
-FROM deduplicated
-WHERE row_num = 1;
\ No newline at end of file
+-- drug_shortages_combined (historical + staging, deduplicated) is built by dbt as an
+-- incremental table: ds_db/models/staging/drug_shortages_combined.sql. An existing
+-- view of that name from older versions of this script is replaced on the next dbt run.
@@ -0,0 +1,282 @@
+-- The ds_db models in DuckDB SQL, for the embedded store (DuckDBBackend.build_marts).
+-- Each statement mirrors the dbt model of the same name and produces the same columns;
+-- keep them in step when a model changes. Every table is rebuilt in full: at embedded
+-- sizes that takes less time than the bookkeeping the incremental models need on
+-- Postgres. route_category_rules is loaded from ds_db/seeds beforehand, like `dbt seed`.
+-- Row hashes are md5s of the JSON array of the key columns, which keeps NULL and ''
+-- apart as the Postgres row text does; the values differ from the Postgres ones.
+-- Statements are split on a ';' that ends a line.
+
+-- drug_shortages_combined: historical and staging records, one per distinct content
+CREATE OR REPLACE TABLE drug_shortages_combined AS
+WITH all_records AS (
+    SELECT
+        id, generic_name, company_name, presentation, update_type, update_date,
+        availability, related_info, resolved_note, reason_for_shortage,
+        therapeutic_category, status, status_change_date, change_date,
+        date_discontinued, shortage_status, ndc,
+        created_at,
+        created_at AS source_created_at,
+        'staging' AS data_source
+    FROM drug_shortages_staging
+
+    UNION ALL
+
+    SELECT
+        id, generic_name, company_name, presentation, update_type, update_date,
+        availability, related_info, resolved_note, reason_for_shortage,
+        therapeutic_category, status, status_change_date, change_date,
+        date_discontinued, shortage_status, ndc,
+        CAST(CAST('2025-09-11 10:30:00' AS DATE) AS TIMESTAMP) AS created_at,
+        created_at AS source_created_at,
+        'historical' AS data_source
+    FROM drug_shortages_classified_raw
+),
+hashed AS (
+    SELECT
+        *,
+        md5(to_json([
+            generic_name, company_name, presentation, update_type,
+            CAST(update_date AS TEXT), availability, related_info, resolved_note,
+            reason_for_shortage, therapeutic_category, status,
+            CAST(status_change_date AS TEXT), CAST(change_date AS TEXT),
+            CAST(date_discontinued AS TEXT), shortage_status, ndc
+        ])::TEXT)::UUID AS content_hash
+    FROM all_records
+)
+SELECT * EXCLUDE (row_num)
+FROM (
+    SELECT
+        *,
+        ROW_NUMBER() OVER (PARTITION BY content_hash ORDER BY created_at, id) AS row_num
+    FROM hashed
+)
+WHERE row_num = 1;
+
+-- stg_drug_shortages: one row per (record, NDC), with the NDC package code stripped
+CREATE OR REPLACE TABLE stg_drug_shortages AS
+WITH exploded AS (
+    SELECT
+        id, generic_name, company_name, presentation, update_type, update_date,
+        availability, related_info, resolved_note, reason_for_shortage,
+        therapeutic_category, status, change_date, date_discontinued, shortage_status,
+        -- string_to_array('', ',') is empty in Postgres, so such a record has no rows
+        trim(regexp_replace(unnest(coalesce(
+            CASE WHEN ndc <> '' THEN string_split(ndc, ',') WHEN ndc = '' THEN []::TEXT[] END,
+            [NULL::TEXT]
+        )), '-[^-]*$', '')) AS ndc_raw,
+        created_at,
+        source_created_at,
+        content_hash
+    FROM drug_shortages_combined
+)
+SELECT
+    id, generic_name, company_name, presentation, update_type, update_date,
+    availability, related_info, resolved_note, reason_for_shortage,
+    therapeutic_category, status, change_date, date_discontinued, shortage_status,
+    nullif(ndc_raw, '') AS ndc,
+    created_at,
+    source_created_at,
+    content_hash
+FROM exploded;
+
+-- data_as_of_date(): the most recent load, where open episodes end. Historical rows
+-- carry a fixed created_at, so the load time is their source_created_at
+CREATE OR REPLACE MACRO data_as_of_date() AS (
+    SELECT CAST(max(source_created_at) AS DATE) FROM drug_shortages_combined
+);
+
+-- int_route_categories: the lowest-priority rule matching each distinct ROUTENAME
+CREATE OR REPLACE TABLE int_route_categories AS
+SELECT
+    r.route_name_raw,
+    coalesce(arg_min(rules.route_category, rules.priority), 'other') AS route_category
+FROM (
+    SELECT DISTINCT "ROUTENAME" AS route_name_raw
+    FROM ndc_fda
+    WHERE "ROUTENAME" IS NOT NULL
+) r
+LEFT JOIN route_category_rules rules
+    ON lower(r.route_name_raw) LIKE rules.pattern
+GROUP BY r.route_name_raw;
+
+-- int_shortage_ndc: shortage rows with their NDC directory entry and route category
+CREATE OR REPLACE VIEW int_shortage_ndc AS
+WITH classified AS (
+    SELECT
+        s.*,
+        n."key",
+        n."ApplNo",
+        n."DrugName",
+        n."SponsorName_x",
+        n."single_source",
+        n."ActiveIngredient",
+        n."PROPRIETARYNAME",
+        n."APPLICATIONNUMBER",
+        n."ROUTENAME" AS route_name_raw,
+        n."SUBSTANCENAME" AS substance_name,
+        n."LABELERNAME",
+        r.route_category
+    FROM stg_drug_shortages s
+    LEFT JOIN ndc_fda n
+        ON s.ndc = n."PRODUCTNDC"
+    LEFT JOIN int_route_categories r
+        ON r.route_name_raw = n."ROUTENAME"
+)
+SELECT
+    *,
+    lower(substance_name) || '_' || coalesce(route_category, 'unknown') AS drug_identifier
+FROM classified;
+
+-- int_shortage_episodes: episodes per (generic_name, company_name, presentation); open ones end null
+CREATE OR REPLACE TABLE int_shortage_episodes AS
+WITH episodes AS (
+    SELECT
+        md5(to_json([generic_name, company_name, presentation])::TEXT)::UUID AS series_key,
+        generic_name,
+        company_name,
+        presentation,
+        therapeutic_category,
+        shortage_status,
+        update_date AS episode_start_date,
+        lead(update_date) OVER (
+            PARTITION BY generic_name, company_name, presentation
+            ORDER BY update_date
+        ) AS episode_end_date,
+        max(source_created_at) OVER (
+            PARTITION BY generic_name, company_name, presentation
+        ) AS series_loaded_at
+    FROM stg_drug_shortages
+    WHERE generic_name IS NOT NULL
+      AND update_date IS NOT NULL
+)
+SELECT *
+FROM episodes
+WHERE episode_end_date > episode_start_date
+   OR episode_end_date IS NULL;
+
+-- drug_shortage_episodes: open episodes closed at data_as_of_date()
+CREATE OR REPLACE VIEW drug_shortage_episodes AS
+WITH episodes AS (
+    SELECT
+        generic_name,
+        company_name,
+        presentation,
+        therapeutic_category,
+        shortage_status,
+        episode_start_date,
+        coalesce(episode_end_date, data_as_of_date()) AS episode_end_date,
+        episode_end_date IS NULL AS is_open
+    FROM int_shortage_episodes
+)
+SELECT
+    generic_name,
+    company_name,
+    presentation,
+    therapeutic_category,
+    shortage_status,
+    episode_start_date,
+    episode_end_date,
+    episode_end_date - episode_start_date AS episode_duration_days,
+    is_open,
+    generic_name || ' (' || company_name || ')' AS drug_display_name,
+    CASE
+        WHEN shortage_status = 'new' THEN '#ff4444'
+        WHEN shortage_status = 'continued' THEN '#ff8800'
+        WHEN shortage_status = 'ended' THEN '#44ff44'
+        WHEN shortage_status = 'discontinued' THEN '#888888'
+        ELSE '#cccccc'
+    END AS status_color
+FROM episodes
+WHERE episode_end_date > episode_start_date;
+
+-- mart_shortage_characteristics: one row per drug with its characteristics and date range
+CREATE OR REPLACE TABLE mart_shortage_characteristics AS
+SELECT
+    drug_identifier,
+    route_category,
+    "single_source",
+    min(update_date) AS first_update_date,
+    max(update_date) AS last_update_date
+FROM int_shortage_ndc
+WHERE drug_identifier IS NOT NULL
+  AND update_date IS NOT NULL
+  AND (shortage_status IS NULL OR shortage_status != 'discontinued')
+GROUP BY drug_identifier, route_category, "single_source";
+
+-- int_shortage_survival_episodes: every shortage episode per drug (gaps and islands)
+CREATE OR REPLACE TABLE int_shortage_survival_episodes AS
+WITH daily AS (
+    SELECT
+        drug_identifier,
+        route_category,
+        "single_source",
+        update_date,
+        bool_or(shortage_status IN ('new', 'continued')) AS in_shortage,
+        max(source_created_at) AS loaded_at,
+        count(*) AS day_rows
+    FROM int_shortage_ndc
+    WHERE drug_identifier IS NOT NULL
+      AND update_date IS NOT NULL
+      AND shortage_status IS NOT NULL
+      AND shortage_status != 'discontinued'
+    GROUP BY drug_identifier, route_category, "single_source", update_date
+),
+state_changes AS (
+    SELECT
+        *,
+        lag(in_shortage) OVER (
+            PARTITION BY drug_identifier, route_category, "single_source"
+            ORDER BY update_date
+        ) AS previous_in_shortage,
+        max(loaded_at) OVER (
+            PARTITION BY drug_identifier, route_category, "single_source"
+        ) AS drug_loaded_at,
+        sum(day_rows) OVER (
+            PARTITION BY drug_identifier, route_category, "single_source"
+        ) AS source_rows
+    FROM daily
+),
+runs AS (
+    SELECT
+        drug_identifier,
+        route_category,
+        "single_source",
+        in_shortage,
+        update_date AS run_start_date,
+        lead(update_date) OVER drug_runs AS next_run_start_date,
+        count(*) FILTER (WHERE in_shortage) OVER drug_runs AS episode_number,
+        drug_loaded_at,
+        source_rows
+    FROM state_changes
+    WHERE in_shortage IS DISTINCT FROM previous_in_shortage
+    WINDOW drug_runs AS (
+        PARTITION BY drug_identifier, route_category, "single_source"
+        ORDER BY update_date
+    )
+)
+SELECT
+    md5(to_json([drug_identifier, route_category, CAST("single_source" AS TEXT)])::TEXT)::UUID AS drug_key,
+    drug_identifier,
+    route_category,
+    "single_source",
+    episode_number,
+    run_start_date AS shortage_start_date,
+    next_run_start_date AS resolution_date,
+    drug_loaded_at,
+    CAST(source_rows AS BIGINT) AS source_rows
+FROM runs
+WHERE in_shortage;
+
+-- mart_shortage_survival: one row per episode, censored at data_as_of_date()
+CREATE OR REPLACE VIEW mart_shortage_survival AS
+SELECT
+    drug_identifier,
+    route_category,
+    "single_source",
+    episode_number,
+    shortage_start_date,
+    resolution_date,
+    resolution_date IS NOT NULL AS resolved,
+    coalesce(resolution_date, data_as_of_date()) - shortage_start_date AS duration_days
+FROM int_shortage_survival_episodes;
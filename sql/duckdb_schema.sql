@@ -0,0 +1,60 @@
+-- Source tables of the embedded DuckDB store (etl/storage.py, DuckDBBackend).
+-- Same columns and keys as the Supabase tables: create_staging_table.sql for the
+-- two shortage tables, and the NDC product directory the dbt sources read.
+
+CREATE TABLE IF NOT EXISTS drug_shortages_staging (
+    id BIGINT PRIMARY KEY,
+    generic_name TEXT,
+    company_name TEXT,
+    presentation TEXT,
+    update_type TEXT,
+    update_date DATE,
+    availability TEXT,
+    related_info TEXT,
+    resolved_note TEXT,
+    reason_for_shortage TEXT,
+    therapeutic_category TEXT,
+    status TEXT,
+    status_change_date DATE,
+    change_date DATE,
+    date_discontinued DATE,
+    shortage_status TEXT,
+    ndc TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS drug_shortages_classified_raw (
+    id BIGINT PRIMARY KEY,
+    generic_name TEXT,
+    company_name TEXT,
+    presentation TEXT,
+    update_type TEXT,
+    update_date DATE,
+    availability TEXT,
+    related_info TEXT,
+    resolved_note TEXT,
+    reason_for_shortage TEXT,
+    therapeutic_category TEXT,
+    status TEXT,
+    status_change_date DATE,
+    change_date DATE,
+    date_discontinued DATE,
+    shortage_status TEXT,
+    ndc TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS ndc_fda (
+    "key" TEXT,
+    "ApplNo" TEXT,
+    "DrugName" TEXT,
+    "SponsorName_x" TEXT,
+    "single_source" DOUBLE,
+    "ActiveIngredient" TEXT,
+    "PROPRIETARYNAME" TEXT,
+    "APPLICATIONNUMBER" TEXT,
+    "PRODUCTNDC" TEXT,
+    "ROUTENAME" TEXT,
+    "SUBSTANCENAME" TEXT,
+    "LABELERNAME" TEXT
+);
@@ -0,0 +1,8 @@
+-- Widen record ids to BIGINT for the 64-bit content-addressed ids (etl/ids.py).
+-- Run once before `python etl/rekey_ids.py`, then `dbt run` to rebuild the views.
+
+-- Postgres cannot change a column type while views depend on it
+DROP VIEW IF EXISTS drug_shortages_combined CASCADE;
+
+ALTER TABLE drug_shortages_staging ALTER COLUMN id TYPE BIGINT;
+ALTER TABLE drug_shortages_classified_raw ALTER COLUMN id TYPE BIGINT;
@@ -0,0 +1,127 @@
+"""
+A local stand-in for the openFDA drug shortages endpoint.
+
+It serves synthetic shortage records for a date range and honours
+search/skip/limit like api.fda.gov: an empty search is a 404 NOT_FOUND and a
+skip above the cap is a 400. It can inject latency and 429s so the backoff path
+is exercised, and logs every request it answers. Used by tests/test_fetch_engine.py
+and scripts/bench_fetch.py.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+from urllib.parse import parse_qs, urlparse
+
+from etl.fetch_engine import MAX_SKIP
+
+SEARCH_RE = re.compile(r'update_date:\[(\d{4}-\d{2}-\d{2}) TO (\d{4}-\d{2}-\d{2})\]')
+
+
+def make_records(n: int, start: datetime, days: int) -> List[Dict]:
+    records = []
+    for i in range(n):
+        day = start + timedelta(days=i * days // n)
+        records.append({
+            'generic_name': f'Drug {i % 997}',
+            'company_name': f'Company {i % 89}',
+            'presentation': f'{i} mg vial (NDC {i:05d}-{i % 1000:03d}-01)',
+            'update_type': random.choice(['New', 'Revised', 'Reverified']),
+            'update_date': day.strftime('%Y-%m-%d'),
+            'status': random.choice(['Current', 'Resolved', 'To Be Discontinued']),
+            'therapeutic_category': ['Oncology'],
+            'package_ndc': f'{i:05d}-{i % 1000:03d}-01',
+        })
+    return records
+
+
+class OpenFDAStub:
+    """
+    Serve `records` on a local port until stopped (or for the length of a with block).
+
+    Every `throttle_rate` share of requests, and the first `throttle_first` of them,
+    is answered 429 with Retry-After: 0. `requests` holds one dict per request
+    answered: search window, skip, limit and status.
+    """
+
+    def __init__(self, records: List[Dict], latency_ms: float = 0, throttle_rate: float = 0.0,
+                 throttle_first: int = 0, max_skip: int = MAX_SKIP):
+        self.records = records
+        self.latency_ms = latency_ms
+        self.throttle_rate = throttle_rate
+        self.throttle_first = throttle_first
+        self.max_skip = max_skip
+        self.requests: List[Dict] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._make_handler())
+
+    @property
+    def url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_address[1]}/drug/shortages.json'
+
+    def start(self) -> 'OpenFDAStub':
+        threading.Thread(target=self._server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _answer(self, query: Dict) -> tuple:
+        """(status, body, headers) for one request; logs it"""
+        match = SEARCH_RE.search(query.get('search', [''])[0])
+        skip = int(query.get('skip', ['0'])[0])
+        limit = int(query.get('limit', ['1'])[0])
+        with self._lock:
+            throttled = len(self.requests) < self.throttle_first or (
+                self.throttle_rate and random.random() < self.throttle_rate)
+            if throttled:
+                status, body, headers = 429, {'error': {'code': 'TOO_MANY_REQUESTS'}}, {'Retry-After': '0'}
+            elif skip > self.max_skip:
+                status, body, headers = 400, {'error': {'code': 'BAD_REQUEST',
+                                                        'message': f'Skip value must {self.max_skip} or less.'}}, {}
+            else:
+                lo, hi = match.groups()
+                hits = [r for r in self.records if lo <= r['update_date'] <= hi]
+                if hits:
+                    status, headers = 200, {}
+                    body = {'meta': {'results': {'skip': skip, 'limit': limit, 'total': len(hits)}},
+                            'results': hits[skip:skip + limit]}
+                else:
+                    status, body, headers = 404, {'error': {'code': 'NOT_FOUND', 'message': 'No matches found!'}}, {}
+            self.requests.append({'window': match.groups() if match else None, 'skip': skip,
+                                  'limit': limit, 'status': status})
+        return status, body, headers
+
+    def _make_handler(self):
+        stub = self
+
+        class StubHandler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                status, body, headers = stub._answer(parse_qs(urlparse(self.path).query))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return StubHandler
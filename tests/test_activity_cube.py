@@ -0,0 +1,53 @@
+"""ActivityCube counts against a direct pandas count of distinct drugs"""
+
+import pandas as pd
+import pytest
+
+from dashboard.activity_cube import ActivityCube
+from dashboard.episode_store import NULL_DAY, to_day_numbers
+
+
+@pytest.fixture
+def characteristics():
+    return pd.DataFrame({
+        'drug_identifier': ['a', 'a', 'b', 'c', 'd', 'e'],
+        'route_category': ['oral', 'injectable', 'oral', 'oral', 'injectable', 'oral'],
+        'first_update_date': pd.to_datetime(['2020-01-15', '2021-06-01', '2020-03-01', None, '2022-01-01',
+                                             '2020-02-01']),
+        'last_update_date': pd.to_datetime(['2020-04-01', '2021-07-01', '2020-03-20', '2021-01-01', None,
+                                            '2020-02-01']),
+    })
+
+
+def reference_counts(df, start_date, end_date):
+    active = df[(df['first_update_date'] <= end_date) & (df['last_update_date'] >= start_date)]
+    return active.groupby('route_category')['drug_identifier'].nunique()
+
+
+@pytest.mark.parametrize('as_day_numbers', [False, True])
+def test_undated_rows_only_count_unfiltered(characteristics, as_day_numbers):
+    frame = characteristics.copy()
+    if as_day_numbers:
+        for column in ['first_update_date', 'last_update_date']:
+            frame[column] = to_day_numbers(frame[column])
+        assert (frame['first_update_date'] == NULL_DAY).sum() == 1
+    cube = ActivityCube(frame, ['route_category'])
+    assert cube.n_months == 19
+
+    unfiltered = cube.counts('route_category')
+    assert unfiltered.to_dict() == {'injectable': 2, 'oral': 4}
+
+    for start, end in [('2020-01-01', '2020-02-28'), ('2020-03-01', '2021-06-30'), ('2019-01-01', '2030-01-01')]:
+        counts = cube.counts('route_category', start, end)
+        expected = reference_counts(characteristics, pd.Timestamp(start), pd.Timestamp(end))
+        assert counts[counts > 0].to_dict() == expected.to_dict()
+
+
+def test_all_rows_undated():
+    frame = pd.DataFrame({'drug_identifier': ['a', 'b'], 'route_category': ['oral', 'oral'],
+                          'first_update_date': pd.to_datetime([None, None]),
+                          'last_update_date': pd.to_datetime(['2020-01-01', None])})
+    cube = ActivityCube(frame, ['route_category'])
+    assert cube.n_months == 0
+    assert cube.counts('route_category').to_dict() == {'oral': 2}
+    assert cube.counts('route_category', '2020-01-01', '2020-12-31').to_dict() == {'oral': 0}
@@ -0,0 +1,65 @@
+"""Streaming reads of openFDA bulk files, with buffer edges falling inside every token"""
+
+import io
+import json
+import zipfile
+from datetime import datetime
+
+import pytest
+
+from etl.bulk_download import batched, iter_results, iter_zip_records
+from etl.fetch_fda_data import OpenFDAETL
+from etl.storage import DuckDBBackend
+from tests.openfda_stub import make_records
+
+RECORDS = make_records(12, datetime(2024, 1, 1), 6)
+# Top-level numbers of every shape, so read sizes cut them after '.', 'e', '+' and '-'
+DOCUMENT = json.dumps({
+    'meta': {'disclaimer': 'Do not rely on openFDA — "quoted" \\ text', 'results': {'total': 12}},
+    'count': 4444.5,
+    'exponent': 1e+300,
+    'negative': -12.75e-3,
+    'flag': True,
+    'results': RECORDS + [4444.25, -1e-7, 12, None],
+    'last_updated': '2024-06-30',
+})
+EXPECTED = json.loads(DOCUMENT)['results']
+
+
+@pytest.mark.parametrize('read_size', [1, 2, 3, 5, 7, 11, 64, 4096])
+def test_results_match_json_loads_at_every_buffer_size(read_size):
+    assert list(iter_results(io.StringIO(DOCUMENT), read_size)) == EXPECTED
+
+
+def test_number_cut_after_its_point_is_read_whole():
+    # 4444. ends the first read; a scanner that stopped there would yield 4444
+    document = '{"results": [4444.5, 1e3]}'
+    cut = document.index('.') + 1
+    assert list(iter_results(io.StringIO(document), read_size=cut)) == [4444.5, 1000.0]
+
+
+def test_malformed_document_raises():
+    with pytest.raises(json.JSONDecodeError):
+        list(iter_results(io.StringIO('{"results": [{"a": 1}, {"b": '), read_size=4))
+
+
+def test_zip_member_is_streamed(tmp_path):
+    path = tmp_path / 'drug-shortages-0001-of-0001.json.zip'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('drug-shortages-0001-of-0001.json', DOCUMENT)
+    assert list(iter_zip_records(str(path), read_size=5)) == EXPECTED
+    assert [len(batch) for batch in batched(iter_zip_records(str(path)), 5)] == [5, 5, 5, 1]
+
+
+def test_run_bulk_load_writes_every_record_to_staging(tmp_path):
+    path = tmp_path / 'drug-shortages.json.zip'
+    with zipfile.ZipFile(path, 'w') as archive:
+        archive.writestr('drug-shortages.json', json.dumps({'meta': {}, 'results': RECORDS}))
+    storage = DuckDBBackend(str(tmp_path / 'store.duckdb'))
+    etl = OpenFDAETL(state_dir=str(tmp_path / 'state'), cache_dir=str(tmp_path / 'cache'), storage=storage)
+
+    assert etl.run_bulk_load(str(path), batch_size=5)
+    assert storage.count('drug_shortages_staging') == len(RECORDS)
+    # Each batch advanced the watermark; the last record's date is the newest
+    assert etl.state.watermark == max(record['update_date'] for record in RECORDS)
+    storage.close()
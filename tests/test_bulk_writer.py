@@ -0,0 +1,88 @@
+"""BulkWriter splits chunks only on row-level errors and statement timeouts"""
+
+import pandas as pd
+import pytest
+
+from etl.bulk_writer import BulkWriter, is_statement_timeout, is_transient
+
+
+class APIError(Exception):
+    def __init__(self, message: str, code: str):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeClient:
+    """Stands in for the Supabase client; `fail(records)` returns an error to raise or None"""
+
+    def __init__(self, fail):
+        self.fail = fail
+        self.requests = []
+        self.stored = []
+
+    def table(self, name):
+        return self
+
+    def upsert(self, records, on_conflict=None, ignore_duplicates=False):
+        self.pending = records
+        return self
+
+    def execute(self):
+        self.requests.append(len(self.pending))
+        error = self.fail(self.pending)
+        if error is not None:
+            raise error
+        self.stored.extend(self.pending)
+
+
+def records(n: int) -> pd.DataFrame:
+    return pd.DataFrame({'id': range(n), 'generic_name': [f'Drug {i}' for i in range(n)]})
+
+
+def writer(client) -> BulkWriter:
+    # Tiny chunks so 64 rows take several requests; one worker keeps the order fixed
+    return BulkWriter(client, 'drug_shortages_staging', max_workers=1, target_chunk_bytes=512,
+                      min_chunk_bytes=512, max_retries=2, backoff_base=0)
+
+
+def test_row_level_error_isolates_the_bad_row():
+    bad_id = 37
+    client = FakeClient(lambda rows: APIError('invalid input syntax for type date', '22007')
+                        if any(r['id'] == bad_id for r in rows) else None)
+    stats = writer(client).write(records(64))
+    assert [r['id'] for r in stats.failed_records] == [bad_id]
+    assert stats.rows_written == 63
+    assert sorted(r['id'] for r in client.stored) == [i for i in range(64) if i != bad_id]
+
+
+def test_statement_timeout_splits_the_chunk():
+    client = FakeClient(lambda rows: APIError('canceling statement due to statement timeout', '57014')
+                        if len(rows) > 4 else None)
+    stats = writer(client).write(records(64))
+    assert stats.rows_written == 64
+    assert not stats.failed_records
+
+
+@pytest.mark.parametrize('error', [APIError('Service Unavailable', '503'), APIError('Too Many Requests', '429'),
+                                   APIError('too many connections for role', '53300')])
+def test_sustained_transient_error_fails_the_rest_without_splitting(error):
+    client = FakeClient(lambda rows: error)
+    stats = writer(client).write(records(64))
+    # The first chunk is retried, then everything is marked failed in one go
+    assert len(client.requests) == 3
+    assert stats.rows_written == 0
+    assert sorted(r['id'] for r in stats.failed_records) == list(range(64))
+    assert stats.errors == [str(error)]
+
+
+@pytest.mark.parametrize('code, transient', [
+    ('503', True), ('429', True), ('504', True), ('57014', True), ('40P01', True),
+    ('53300', True), ('08006', True), ('54000', False), ('501', False), ('23505', False), ('42P01', False),
+])
+def test_is_transient_codes(code, transient):
+    assert is_transient(APIError('error', code)) is transient
+
+
+def test_is_statement_timeout():
+    assert is_statement_timeout(APIError('canceling statement due to statement timeout', '57014'))
+    assert not is_statement_timeout(APIError('Service Unavailable', '503'))
@@ -0,0 +1,18 @@
+"""sql/duckdb_marts.sql builds the same models as the dbt project; needs a scratch Postgres and dbt"""
+
+import os
+import shutil
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not (os.getenv('DBT_HOST') and shutil.which('dbt')),
+                                reason='set DBT_* to a scratch Postgres and install dbt')
+
+
+def test_duckdb_marts_match_dbt():
+    from check_duckdb_marts import build_and_compare
+
+    results = build_and_compare(rows=1500, staging_rows=300)
+    for table, (postgres, duckdb, mismatched) in results.items():
+        assert postgres == duckdb, table
+        assert mismatched == 0, table
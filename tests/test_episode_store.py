@@ -0,0 +1,71 @@
+"""EpisodeStore adopting a published snapshot without copying it"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.episode_store import EpisodeStore
+from dashboard.snapshot import open_snapshot, publish_snapshot
+
+CATEGORIES = ['drug_identifier', 'route_category', 'single_source']
+DATES = ['shortage_start_date', 'resolution_date']
+
+
+def mapped_ranges(path):
+    """Address ranges this process has mapped from `path`, read from /proc/self/maps"""
+    ranges = []
+    with open('/proc/self/maps') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) >= 6 and fields[5] == path:
+                start, end = (int(address, 16) for address in fields[0].split('-'))
+                ranges.append((start, end))
+    return ranges
+
+
+@pytest.fixture
+def survival():
+    rng = np.random.default_rng(3)
+    n = 500
+    start = pd.Timestamp('2019-01-01') + pd.to_timedelta(rng.integers(0, 1500, n), unit='D')
+    duration = rng.integers(1, 400, n)
+    resolved = rng.random(n) < 0.7
+    return pd.DataFrame({
+        'drug_identifier': [f'drug_{i}' for i in rng.integers(0, 80, n)],
+        'route_category': rng.choice(['oral', 'injectable', 'topical', None], n),
+        'single_source': rng.choice(['Single Source', 'Multiple Sources'], n),
+        'episode_number': rng.integers(1, 4, n),
+        'shortage_start_date': start,
+        'resolution_date': (start + pd.to_timedelta(duration, unit='D')).where(resolved),
+        'resolved': resolved,
+        'duration_days': duration,
+    })
+
+
+@pytest.mark.skipif(not os.path.exists('/proc/self/maps'), reason='needs /proc/self/maps')
+def test_snapshot_columns_stay_in_the_memory_map(tmp_path, survival):
+    encoded = EpisodeStore(survival, CATEGORIES, DATES)
+    version = publish_snapshot(str(tmp_path), {'mart_shortage_survival': encoded.frame})
+    snapshot = open_snapshot(str(tmp_path), ['mart_shortage_survival'])
+    store = EpisodeStore(snapshot.frames['mart_shortage_survival'], CATEGORIES, DATES)
+
+    ranges = mapped_ranges(str(tmp_path / f'mart_shortage_survival.v{version}.arrow'))
+    assert ranges
+    for column in store.frame.columns:
+        if column in CATEGORIES:
+            continue
+        values = store.frame[column].array
+        assert isinstance(values.dtype, pd.ArrowDtype), column
+        address = values._pa_array.chunks[0].buffers()[1].address
+        assert any(start <= address < end for start, end in ranges), column
+    # Day numbers are read straight off the map as well
+    address = store.days('shortage_start_date').__array_interface__['data'][0]
+    assert any(start <= address < end for start, end in ranges)
+
+    pd.testing.assert_frame_equal(store.to_frame(DATES + ['duration_days']).astype({'duration_days': np.int64}),
+                                  encoded.to_frame(DATES + ['duration_days']).astype({'duration_days': np.int64}))
+    np.testing.assert_array_equal(store.frame['resolved'].to_numpy(), survival['resolved'].to_numpy())
+    for column in CATEGORIES:
+        assert store.frame[column].tolist() == encoded.frame[column].tolist()
@@ -0,0 +1,77 @@
+"""OpenFDAFetcher against a local openFDA stub: paging, window bisection, 404s and 429s"""
+
+from datetime import datetime
+
+import pytest
+import requests
+
+from etl import fetch_engine
+from etl.fetch_engine import OpenFDAFetcher
+from tests.openfda_stub import OpenFDAStub, make_records
+
+START = datetime(2024, 1, 1)
+
+
+def fetcher(stub: OpenFDAStub, **kwargs) -> OpenFDAFetcher:
+    options = dict(max_workers=4, window_days=30, backoff_base=0, max_retries=3)
+    options.update(kwargs)
+    return OpenFDAFetcher(stub.url, **options)
+
+
+def presentations(records):
+    return [r['presentation'] for r in records]
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_pages_every_window_in_order(workers):
+    records = make_records(2500, START, 90)
+    with OpenFDAStub(records) as stub:
+        client = fetcher(stub, max_workers=workers)
+        results = client.fetch('2024-01-01', '2024-03-30', page_size=100)
+    assert presentations(results) == presentations(records)
+    assert client.last_stats.records == len(records)
+    assert all(request['status'] == 200 for request in stub.requests)
+    # Later pages were requested, not just the first page of each window
+    assert max(request['skip'] for request in stub.requests) > 0
+
+
+def test_windows_past_the_skip_cap_are_bisected(monkeypatch):
+    # A cap of 200 rows per query, so one 30-day window of 1000 records must be split
+    monkeypatch.setattr(fetch_engine, 'MAX_SKIP', 150)
+    records = make_records(1000, START, 30)
+    with OpenFDAStub(records, max_skip=150) as stub:
+        results = fetcher(stub).fetch('2024-01-01', '2024-01-30', page_size=50)
+    assert presentations(results) == presentations(records)
+    assert all(request['status'] != 400 for request in stub.requests)
+    windows = {request['window'] for request in stub.requests}
+    assert ('2024-01-01', '2024-01-30') in windows
+    assert len(windows) > 1
+
+
+def test_empty_search_404_is_an_empty_result():
+    records = make_records(300, START, 10)
+    with OpenFDAStub(records) as stub:
+        client = fetcher(stub)
+        assert client.fetch('2023-01-01', '2023-02-28') == []
+        # Windows without matches inside a range with matches are skipped, not fatal
+        results = client.fetch('2023-12-01', '2024-01-10')
+    assert presentations(results) == presentations(records)
+    assert any(request['status'] == 404 for request in stub.requests)
+
+
+def test_429_is_retried():
+    records = make_records(500, START, 20)
+    with OpenFDAStub(records, throttle_first=3) as stub:
+        client = fetcher(stub, max_workers=1)
+        results = client.fetch('2024-01-01', '2024-01-20', page_size=100)
+    assert presentations(results) == presentations(records)
+    assert client.last_stats.retries == 3
+    assert [request['status'] for request in stub.requests[:4]] == [429, 429, 429, 200]
+
+
+def test_429_past_the_retries_raises():
+    records = make_records(100, START, 5)
+    with OpenFDAStub(records, throttle_rate=1.0) as stub:
+        with pytest.raises(requests.HTTPError, match='429'):
+            fetcher(stub, max_retries=2).fetch('2024-01-01', '2024-01-05')
+        assert len(stub.requests) == 3
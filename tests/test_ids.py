@@ -0,0 +1,44 @@
+"""Content ids are persisted keys: pin their values for fixed records"""
+
+import numpy as np
+import pandas as pd
+
+from etl.ids import content_id, content_ids
+
+RECORD = {
+    'generic_name': 'Cisplatin Injection',
+    'company_name': 'Teva Pharmaceuticals USA, Inc.',
+    'presentation': 'Cisplatin Injection, 1 mg/mL; 50 mL vial (NDC 0703-5748-11)',
+    'update_date': '04/26/2024',
+    'ndc': '0703-5748',
+}
+# Changing either value changes every id stored in the database
+RECORD_ID = 5051455311526922305
+RECORD_WITHOUT_NDC_ID = 7759593936326378177
+
+
+def test_golden_id():
+    assert content_id(RECORD) == RECORD_ID
+    assert content_ids(pd.DataFrame([RECORD])).tolist() == [RECORD_ID]
+
+
+def test_update_date_is_normalized_and_text_is_stripped():
+    same = dict(RECORD, update_date='2024-04-26', generic_name=' Cisplatin Injection ')
+    assert content_id(same) == RECORD_ID
+
+
+def test_null_and_empty_fields_hash_alike():
+    # Ids treat a missing, null, NaN or '' field as the same empty value
+    variants = [dict(RECORD, ndc=None), dict(RECORD, ndc=''), dict(RECORD, ndc=np.nan),
+                {field: value for field, value in RECORD.items() if field != 'ndc'}]
+    assert [content_id(variant) for variant in variants] == [RECORD_WITHOUT_NDC_ID] * 4
+    assert content_ids(pd.DataFrame(variants)).tolist() == [RECORD_WITHOUT_NDC_ID] * 4
+    assert RECORD_WITHOUT_NDC_ID != RECORD_ID
+
+
+def test_ids_fit_a_signed_bigint():
+    frame = pd.DataFrame([dict(RECORD, presentation=f'{i} mg vial') for i in range(1000)])
+    ids = content_ids(frame)
+    assert ids.dtype == np.int64
+    assert (ids >= 0).all()
+    assert len(np.unique(ids)) == len(ids)
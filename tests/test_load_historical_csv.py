@@ -0,0 +1,84 @@
+"""An interrupted historical CSV load resumes from its checkpoint without re-reading committed rows"""
+
+import json
+
+import pandas as pd
+
+from etl import load_historical_csv
+from etl.bulk_writer import WriteStats
+from etl.load_historical_csv import load_csv_to_historical
+from etl.storage import DuckDBBackend
+
+ROWS = 23
+CHUNKSIZE = 5
+
+
+class FailingBackend(DuckDBBackend):
+    """Writes the first `chunks_ok` chunks, then fails every row of the next ones"""
+
+    def __init__(self, path: str, chunks_ok: int):
+        super().__init__(path)
+        self.chunks_ok = chunks_ok
+
+    def write(self, table, df, on_conflict='id', ignore_duplicates=False):
+        if self.chunks_ok == 0:
+            stats = WriteStats(table)
+            stats.failed_records = df.to_dict('records')
+            return stats
+        self.chunks_ok -= 1
+        return super().write(table, df, on_conflict, ignore_duplicates)
+
+
+def write_csv(path):
+    rows = [{
+        'generic_name': f'Drug {i}',
+        'company_name': f'Company {i % 4}',
+        # A quoted newline: the resume offset counts records, not lines
+        'presentation': f'{i} mg vial\n(NDC {i:05d}-001-01)' if i % 6 == 0 else f'{i} mg vial',
+        'update_type': 'New' if i % 2 else 'Revised',
+        'update_date': f'2024-01-{i + 1:02d}',
+        'therapeutic_category': 'Oncology',
+        'status': 'Current' if i % 3 else 'Resolved',
+        'ndc': f'{i:05d}-001',
+        'year': '2024',
+        'month': '1',
+    } for i in range(ROWS)]
+    pd.DataFrame(rows).to_csv(path, index=False)
+
+
+def test_interrupted_load_resumes_from_the_checkpoint(tmp_path, monkeypatch):
+    csv_path = str(tmp_path / 'historical.csv')
+    checkpoint_path = str(tmp_path / 'historical.checkpoint.json')
+    store_path = str(tmp_path / 'store.duckdb')
+    write_csv(csv_path)
+
+    failing = FailingBackend(store_path, chunks_ok=2)
+    assert not load_csv_to_historical(csv_path, chunksize=CHUNKSIZE, checkpoint_path=checkpoint_path,
+                                      storage=failing)
+    assert failing.count('drug_shortages_classified_raw') == 2 * CHUNKSIZE
+    failing.close()
+    with open(checkpoint_path) as f:
+        assert json.load(f)['rows_committed'] == 2 * CHUNKSIZE
+
+    # Count the rows the parser hands back on the resumed run
+    parsed = []
+    read_csv = pd.read_csv
+
+    def counting_read_csv(*args, **kwargs):
+        for chunk in read_csv(*args, **kwargs):
+            parsed.append(chunk)
+            yield chunk
+
+    monkeypatch.setattr(load_historical_csv.pd, 'read_csv', counting_read_csv)
+    storage = DuckDBBackend(store_path)
+    assert load_csv_to_historical(csv_path, chunksize=CHUNKSIZE, checkpoint_path=checkpoint_path, storage=storage)
+
+    resumed = pd.concat(parsed)
+    assert len(resumed) == ROWS - 2 * CHUNKSIZE
+    assert resumed['generic_name'].iloc[0] == f'Drug {2 * CHUNKSIZE}'
+    stored = storage.fetch('drug_shortages_classified_raw', ['generic_name', 'presentation'])
+    assert sorted(stored['generic_name']) == sorted(f'Drug {i}' for i in range(ROWS))
+    assert (stored['presentation'] == '12 mg vial\n(NDC 00012-001-01)').sum() == 1
+    with open(checkpoint_path) as f:
+        assert json.load(f)['rows_committed'] == ROWS
+    storage.close()
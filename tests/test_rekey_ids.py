@@ -0,0 +1,124 @@
+"""rekey_table moves legacy md5 ids to content ids, inserting before it deletes"""
+
+import pandas as pd
+import pytest
+
+from etl.ids import content_ids
+from etl.rekey_ids import LEGACY_ID_CEILING, rekey_table
+
+
+class FakeTable:
+    """The slice of the Supabase query builder rekey_table uses, over a dict of rows by id"""
+
+    def __init__(self, client):
+        self.client = client
+        self.filters = []
+        self.action = None
+
+    def select(self, columns):
+        self.action = ('select',)
+        return self
+
+    def gt(self, column, value):
+        self.filters.append(lambda row: row[column] > value)
+        return self
+
+    def lt(self, column, value):
+        self.filters.append(lambda row: row[column] < value)
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.count = count
+        return self
+
+    def upsert(self, records, on_conflict='id', ignore_duplicates=False):
+        self.action = ('upsert', records, ignore_duplicates)
+        return self
+
+    def delete(self):
+        self.action = ('delete',)
+        return self
+
+    def in_(self, column, values):
+        self.action = ('delete', list(values))
+        return self
+
+    def execute(self):
+        rows = self.client.rows
+        kind = self.action[0]
+        if kind == 'select':
+            matching = sorted((row for row in rows.values() if all(f(row) for f in self.filters)),
+                              key=lambda row: row['id'])
+            return type('Result', (), {'data': [dict(row) for row in matching[:self.count]]})
+        self.client.log.append((kind, len(self.action[1])))
+        if kind == 'delete' and self.client.fail_deletes:
+            raise RuntimeError('connection lost')
+        if kind == 'upsert':
+            for record in self.action[1]:
+                if not (self.action[2] and record['id'] in rows):
+                    rows[record['id']] = dict(record)
+        else:
+            for row_id in self.action[1]:
+                rows.pop(row_id, None)
+        return type('Result', (), {'data': []})
+
+
+class FakeClient:
+    def __init__(self, rows):
+        self.rows = {row['id']: dict(row) for row in rows}
+        self.log = []
+        self.fail_deletes = False
+
+    def table(self, name):
+        return FakeTable(self)
+
+
+def legacy_rows():
+    rows = [{'id': 1000 + i, 'generic_name': f'Drug {i}', 'company_name': 'Company',
+             'presentation': f'{i} mg vial', 'update_date': '2024-01-02', 'ndc': f'{i:05d}-001'}
+            for i in range(7)]
+    # Same content as Drug 3 under another legacy id (an old linear-probe increment)
+    rows.append(dict(rows[3], id=2 ** 32 + 5))
+    return rows
+
+
+def expected_rows(rows):
+    frame = pd.DataFrame(rows)
+    frame['id'] = content_ids(frame)
+    return {int(row['id']): row['generic_name'] for row in frame.drop_duplicates('id').to_dict('records')}
+
+
+def test_rows_move_to_their_content_ids():
+    rows = legacy_rows()
+    client = FakeClient(rows)
+    assert rekey_table(client, 'drug_shortages_staging', batch_size=3) == len(rows)
+    assert {row_id: row['generic_name'] for row_id, row in client.rows.items()} == expected_rows(rows)
+    assert all(row_id >= LEGACY_ID_CEILING for row_id in client.rows)
+    # Each batch inserts its rows under the new ids before deleting the old ones
+    kinds = [kind for kind, _ in client.log]
+    assert kinds == ['upsert', 'delete'] * 3
+
+
+def test_dry_run_writes_nothing():
+    rows = legacy_rows()
+    client = FakeClient(rows)
+    assert rekey_table(client, 'drug_shortages_staging', batch_size=3, dry_run=True) == len(rows)
+    assert client.log == []
+    assert set(client.rows) == {row['id'] for row in rows}
+
+
+def test_rerun_after_a_failed_delete_completes_without_loss():
+    rows = legacy_rows()
+    client = FakeClient(rows)
+    client.fail_deletes = True
+    with pytest.raises(RuntimeError):
+        rekey_table(client, 'drug_shortages_staging', batch_size=3)
+    # The first batch was inserted under its new ids; nothing is lost
+    assert len(client.rows) == len(rows) + 3
+
+    client.fail_deletes = False
+    rekey_table(client, 'drug_shortages_staging', batch_size=3)
+    assert {row_id: row['generic_name'] for row_id, row in client.rows.items()} == expected_rows(rows)
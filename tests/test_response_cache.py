@@ -0,0 +1,94 @@
+"""ResponseCache round-trips, eviction and run log, and replaying a recorded fetch"""
+
+import os
+import time
+from datetime import datetime
+
+from etl.fetch_fda_data import OpenFDAETL
+from etl.response_cache import ResponseCache
+from etl.storage import DuckDBBackend
+from tests.openfda_stub import OpenFDAStub, make_records
+
+URL = 'https://api.fda.gov/drug/shortages.json'
+DATA = {'meta': {'results': {'total': 2}}, 'results': [{'generic_name': 'Drug 1'}, {'generic_name': 'Drug 2'}]}
+
+
+def params(skip: int = 0, **extra):
+    return {'search': 'update_date:[2024-01-01 TO 2024-01-30]', 'limit': 100, 'skip': skip, **extra}
+
+
+def age(cache: ResponseCache, request: dict, seconds: float):
+    path = cache._path(cache.key(URL, request))
+    mtime = time.time() - seconds
+    os.utime(path, (mtime, mtime))
+
+
+def test_hit_and_miss_round_trip(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get(URL, params()) is None
+    cache.put(URL, params(), DATA)
+    assert cache.get(URL, params()) == DATA
+    # api_key is not part of the key; skip is
+    assert cache.get(URL, params(api_key='secret')) == DATA
+    assert cache.get(URL, params(skip=100)) is None
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_expired_entries_miss_and_are_evicted(tmp_path):
+    cache = ResponseCache(str(tmp_path), max_age_days=1)
+    cache.put(URL, params(), DATA)
+    cache.put(URL, params(skip=100), DATA)
+    age(cache, params(), 2 * 86400)
+    assert cache.get(URL, params()) is None
+
+    cache.evict()
+    assert len(cache._entries()) == 1
+    assert cache.get(URL, params(skip=100)) == DATA
+
+
+def test_least_recently_used_entries_are_evicted_first(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.put(URL, params(0), DATA)
+    entry_size = cache._entries()[0][1]
+    cache.max_bytes = int(entry_size * 2.5)
+    cache.put(URL, params(100), DATA)
+    age(cache, params(0), 300)
+    age(cache, params(100), 200)
+    # Reading the oldest entry makes the other one least recently used
+    assert cache.get(URL, params(0)) == DATA
+
+    cache.put(URL, params(200), DATA)
+    assert cache.get(URL, params(100)) is None
+    assert cache.get(URL, params(0)) == DATA
+    assert cache.get(URL, params(200)) == DATA
+
+
+def test_runs_are_logged_in_order(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    assert cache.recorded_runs() == []
+    cache.record_run('2024-01-01', '2024-01-30', 30, 1000)
+    cache.record_run('2024-02-01', '2024-02-29', 7, 100)
+    runs = cache.recorded_runs()
+    assert [(run['start_date'], run['end_date'], run['window_days'], run['page_size']) for run in runs] == [
+        ('2024-01-01', '2024-01-30', 30, 1000),
+        ('2024-02-01', '2024-02-29', 7, 100),
+    ]
+    assert os.path.exists(os.path.join(str(tmp_path), 'runs.jsonl'))
+
+
+def test_replay_uses_the_recorded_window_and_page_size(tmp_path):
+    records = make_records(250, datetime(2024, 1, 1), 20)
+    cache_dir = str(tmp_path / 'cache')
+    with OpenFDAStub(records) as stub:
+        live = OpenFDAETL(window_days=7, state_dir=str(tmp_path / 'state'), cache_dir=cache_dir)
+        live.fetcher.base_url = stub.url
+        assert len(live.fetch_shortage_data('2024-01-01', '2024-01-20', limit=100)) == len(records)
+        base_url = stub.url
+
+    storage = DuckDBBackend(str(tmp_path / 'store.duckdb'))
+    replay = OpenFDAETL(state_dir=str(tmp_path / 'state'), cache_dir=cache_dir, replay=True, storage=storage)
+    replay.fetcher.base_url = base_url
+    assert replay.replay_etl()
+    assert replay.cache.misses == 0
+    assert storage.count('drug_shortages_staging') == len(records)
+    storage.close()
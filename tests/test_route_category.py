@@ -0,0 +1,69 @@
+"""Route categories from the rules seed against the CASE ladder they replaced"""
+
+import os
+import re
+
+import pandas as pd
+import pytest
+
+from check_route_categories import LEGACY_CASE
+from etl.route_category import OTHER_CATEGORY, classify_routes, like_to_regex
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'ndc_fda_routenames.csv')
+
+
+def legacy_ladder():
+    """(category, LIKE patterns) per WHEN of LEGACY_CASE, in order"""
+    branches = re.findall(r"when lower\(route_name_raw\) like (any\(array\[.*?\]\)|'[^']*') then '(\w+)'",
+                          LEGACY_CASE, flags=re.DOTALL)
+    return [(category, re.findall(r"'([^']*)'", patterns)) for patterns, category in branches]
+
+
+def legacy_category(route_name, ladder):
+    if route_name is None:
+        return None
+    lowered = route_name.lower()
+    for category, patterns in ladder:
+        if any(re.fullmatch(like_to_regex(pattern), lowered, flags=re.DOTALL) for pattern in patterns):
+            return category
+    return OTHER_CATEGORY
+
+
+@pytest.fixture(scope='module')
+def routes():
+    names = pd.read_csv(FIXTURE, dtype=str)['ROUTENAME']
+    return names.drop_duplicates().astype(object).where(names.notna(), None).tolist()
+
+
+@pytest.fixture(scope='module')
+def legacy(routes):
+    ladder = legacy_ladder()
+    assert [category for category, _ in ladder] == [
+        'injectable', 'inhalation', 'ophthalmic', 'oral', 'topical', 'nasal', 'otic', 'rectal', 'vaginal',
+        'dental', 'urological']
+    return {route: legacy_category(route, ladder) for route in routes}
+
+
+def test_rules_match_legacy_case(routes, legacy):
+    classified = classify_routes(pd.Series(routes, dtype=object))
+    differs = {route: (legacy[route], category) for route, category in zip(routes, classified)
+               if legacy[route] != category}
+    assert not differs
+    # Every category of the ladder is exercised by the fixture
+    assert set(legacy.values()) >= {category for category, _ in legacy_ladder()} | {OTHER_CATEGORY, None}
+
+
+def test_duckdb_route_table_matches_legacy_case(routes, legacy):
+    pytest.importorskip('duckdb')
+    from etl.storage import DuckDBBackend
+
+    storage = DuckDBBackend(':memory:')
+    with storage.cursor() as cursor:
+        cursor.register('incoming', pd.DataFrame({'ROUTENAME': pd.Series(routes, dtype=object)}))
+        cursor.execute('INSERT INTO ndc_fda BY NAME SELECT * FROM incoming')
+    storage.build_marts()
+    stored = storage.fetch('int_route_categories', ['route_name_raw', 'route_category'])
+    storage.close()
+    assert len(stored) == len(routes) - 1
+    assert dict(zip(stored['route_name_raw'], stored['route_category'])) == {
+        route: category for route, category in legacy.items() if route is not None}
@@ -0,0 +1,81 @@
+"""Events diff_sequence derives from three tiny consecutive shortage-list snapshots"""
+
+import pandas as pd
+
+from etl.snapshot_diff import diff_sequence
+from etl.transform import PASSTHROUGH_FIELDS
+
+DATES = ['2024-01-01', '2024-02-01', '2024-03-01']
+
+
+def listing(name: str, update_type: str, status: str, **fields) -> dict:
+    row = {column: None for column in PASSTHROUGH_FIELDS}
+    row.update(generic_name=name, company_name=f'{name} Inc', presentation=f'{name} 10 mg vial',
+               update_type=update_type, update_date='2023-12-15', status=status,
+               availability='Backordered', ndc=f'{len(name):05d}-001')
+    row.update(fields)
+    return row
+
+
+def snapshot(*rows) -> pd.DataFrame:
+    return pd.DataFrame(list(rows), columns=PASSTHROUGH_FIELDS + ['ndc'])
+
+
+ALPHA = listing('Alpha', 'Revised', 'Current')
+BETA = listing('Beta', 'New', 'Current')
+GAMMA = listing('Gamma', 'Revised', 'Resolved')
+DELTA = listing('Delta', 'Reverified', 'Current')
+ALPHA_REVISED = dict(ALPHA, availability='Available', update_date='2024-01-20')
+
+SNAPSHOTS = [
+    snapshot(ALPHA, BETA, GAMMA),
+    # Alpha's availability changes, Beta (open) and Gamma (resolved) drop off, Delta appears
+    snapshot(ALPHA_REVISED, DELTA),
+    # Beta is listed again, unchanged; nothing else moves
+    snapshot(ALPHA_REVISED, DELTA, BETA),
+]
+
+
+def events_by_date():
+    events = diff_sequence(SNAPSHOTS, DATES)
+    return {date: group.set_index('generic_name') for date, group in events.groupby('snapshot_date')}, events
+
+
+def test_first_snapshot_is_all_inserts():
+    by_date, _ = events_by_date()
+    first = by_date[DATES[0]]
+    assert set(first['change_type']) == {'inserted'}
+    # A listing first seen while current is a new shortage whatever its update_type
+    assert first['shortage_status'].to_dict() == {'Alpha': 'new', 'Beta': 'new', 'Gamma': 'ended'}
+    assert first['previous_status'].isna().all()
+
+
+def test_change_removal_and_insert():
+    by_date, _ = events_by_date()
+    second = by_date[DATES[1]]
+    assert second['change_type'].to_dict() == {'Alpha': 'changed', 'Beta': 'removed', 'Delta': 'inserted'}
+
+    alpha = second.loc['Alpha']
+    assert (alpha['availability'], alpha['previous_status'], alpha['shortage_status']) == \
+        ('Available', 'continued', 'continued')
+
+    # Beta left the list while open: it ended on the day the snapshot showed it gone
+    beta = second.loc['Beta']
+    assert (beta['shortage_status'], beta['previous_status'], beta['status']) == ('ended', 'new', 'Resolved')
+    assert beta['update_date'] == DATES[1]
+    assert beta['update_type'] is None
+
+    # Gamma was already resolved when it dropped off, so its removal is no event
+    assert 'Gamma' not in second.index
+
+
+def test_reappearance_is_a_new_insert():
+    by_date, events = events_by_date()
+    third = by_date[DATES[2]]
+    assert third['change_type'].to_dict() == {'Beta': 'inserted'}
+    beta = third.loc['Beta']
+    assert (beta['shortage_status'], beta['previous_status']) == ('new', 'ended')
+    # Dated when it came back, so it does not share its first insert's id
+    assert beta['update_date'] == DATES[2]
+    assert events['id'].is_unique
+    assert len(events) == 3 + 3 + 1
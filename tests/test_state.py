@@ -0,0 +1,72 @@
+"""ETLState fingerprints: unchanged records are dropped, changed ones kept, old ones pruned"""
+
+import copy
+from datetime import datetime
+
+import numpy as np
+
+from etl.fetch_fda_data import OpenFDAETL
+from etl.state import ETLState, to_day
+from tests.openfda_stub import make_records
+
+RECORDS = make_records(40, datetime(2024, 3, 1), 20)
+# All within a 3-day overlap of their latest update_date, so none is pruned
+RECENT = make_records(40, datetime(2024, 3, 1), 3)
+
+
+def make_etl(tmp_path, overlap_days: int = 3) -> OpenFDAETL:
+    return OpenFDAETL(state_dir=str(tmp_path / 'state'), cache_dir=str(tmp_path / 'cache'),
+                      overlap_days=overlap_days)
+
+
+def test_seen_matches_exact_fingerprints(tmp_path):
+    state = ETLState(str(tmp_path))
+    assert not state.seen(np.array([1, 2], dtype=np.int64)).any()
+    state.commit(np.array([40, -7, 15], dtype=np.int64), np.zeros(3, dtype=np.int32), None)
+    # Below, between, equal to and above the stored values
+    probe = np.array([-100, -7, 0, 15, 16, 40, 10**12], dtype=np.int64)
+    assert state.seen(probe).tolist() == [False, True, False, True, False, True, False]
+
+
+def test_unchanged_records_are_dropped_and_changed_ones_kept(tmp_path):
+    etl = make_etl(tmp_path)
+    changed, fingerprints, update_days, watermark = etl.drop_unchanged(RECENT)
+    assert len(changed) == len(RECENT)
+    etl.commit_state(fingerprints, update_days, watermark)
+    assert etl.state.watermark == max(record['update_date'] for record in RECENT)
+
+    # The overlap window serves the same records again, one of them edited, plus a new one
+    served = copy.deepcopy(RECENT)
+    served[-1]['status'] = 'Resolved' if served[-1]['status'] != 'Resolved' else 'Current'
+    served.append(dict(served[0], presentation='new presentation'))
+    changed, fingerprints, _, _ = etl.drop_unchanged(served)
+    assert changed == [served[-2], served[-1]]
+    assert len(fingerprints) == 2
+
+
+def test_commit_prunes_fingerprints_older_than_the_next_window(tmp_path):
+    etl = make_etl(tmp_path, overlap_days=3)
+    _, fingerprints, update_days, watermark = etl.drop_unchanged(RECORDS)
+    etl.commit_state(fingerprints, update_days, watermark)
+
+    keep_from_day = to_day(watermark) - 3
+    assert 0 < len(etl.state.fingerprints) < len(RECORDS)
+    assert len(etl.state.fingerprints) == int((update_days >= keep_from_day).sum())
+    assert (etl.state.update_days >= keep_from_day).all()
+    assert np.all(np.diff(etl.state.fingerprints) > 0)
+    # Records inside the overlap window are still recognized
+    recent = [record for record, day in zip(RECORDS, update_days) if day >= keep_from_day]
+    assert etl.drop_unchanged(recent)[0] == []
+
+
+def test_state_survives_a_save_and_load(tmp_path):
+    state = ETLState(str(tmp_path))
+    state.commit(np.array([5, 3, 9, 3], dtype=np.int64), np.array([10, 11, 12, 11], dtype=np.int32), '2024-03-20')
+    # An older watermark never moves it back
+    state.commit(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int32), '2024-01-01')
+
+    loaded = ETLState(str(tmp_path))
+    assert loaded.watermark == '2024-03-20'
+    assert loaded.fingerprints.tolist() == [3, 5, 9]
+    assert loaded.update_days.tolist() == [11, 10, 12]
+    assert loaded.fingerprints.dtype == np.int64 and loaded.update_days.dtype == np.int32
@@ -0,0 +1,113 @@
+"""grouped_kaplan_meier and logrank_test against textbook, loop-per-time references"""
+
+import math
+from statistics import NormalDist
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dashboard.survival import _chi2_sf, grouped_kaplan_meier, kaplan_meier_curve, logrank_test
+
+
+def reference_km(durations, events, alpha=0.05):
+    """Product-limit estimate, Greenwood variance and log(-log) band, one distinct time at a time"""
+    z = NormalDist().inv_cdf(1 - alpha / 2)
+    rows = [(0.0, 1.0, len(durations), 0, 0, 1.0, 1.0)]
+    survival, variance = 1.0, 0.0
+    for t in sorted(set(durations)):
+        at_risk = sum(1 for d in durations if d >= t)
+        deaths = sum(1 for d, e in zip(durations, events) if d == t and e)
+        censored = sum(1 for d, e in zip(durations, events) if d == t and not e)
+        survival *= 1 - deaths / at_risk
+        if deaths < at_risk:
+            variance += deaths / (at_risk * (at_risk - deaths))
+        if 0 < survival < 1:
+            spread = z * math.sqrt(variance) / math.log(survival)
+            lower = math.exp(-math.exp(math.log(-math.log(survival)) - spread))
+            upper = math.exp(-math.exp(math.log(-math.log(survival)) + spread))
+        else:
+            lower = upper = survival
+        rows.append((t, survival, at_risk, deaths, censored, lower, upper))
+    return [np.array(column) for column in zip(*rows)]
+
+
+def reference_logrank(durations, events, groups):
+    """Chi-square statistic of the k-sample log-rank test, accumulated per distinct event time"""
+    labels = sorted(set(groups))
+    k = len(labels)
+    observed_minus_expected = np.zeros(k)
+    covariance = np.zeros((k, k))
+    for t in sorted(set(durations)):
+        at_risk = np.array([sum(1 for d, g in zip(durations, groups) if d >= t and g == label) for label in labels])
+        deaths = np.array([sum(1 for d, e, g in zip(durations, events, groups) if d == t and e and g == label)
+                           for label in labels])
+        n, d = at_risk.sum(), deaths.sum()
+        if d == 0 or n < 2:
+            continue
+        observed_minus_expected += deaths - d * at_risk / n
+        for i in range(k):
+            for j in range(k):
+                share = at_risk[i] / n
+                covariance[i, j] += d * (n - d) / (n - 1) * share * ((i == j) - at_risk[j] / n)
+    difference = observed_minus_expected[:-1]
+    return float(difference @ np.linalg.solve(covariance[:-1, :-1], difference))
+
+
+@pytest.fixture
+def episodes():
+    # Small, fixed, and tie-heavy: whole-day durations in three groups of different sizes
+    rng = np.random.default_rng(7)
+    groups = np.repeat(['injectable', 'oral', 'topical'], [40, 25, 15])
+    durations = rng.integers(1, 30, size=len(groups)) * np.where(groups == 'oral', 2, 1)
+    events = rng.random(len(groups)) < 0.7
+    return pd.DataFrame({'duration_days': durations, 'resolved': events, 'route_category': groups})
+
+
+def test_hand_worked_curve():
+    curve = kaplan_meier_curve([1, 2, 2, 3, 4, 5], [True, True, False, True, False, True])
+    np.testing.assert_array_equal(curve.times, [0, 1, 2, 3, 4, 5])
+    np.testing.assert_allclose(curve.survival, [1, 5 / 6, 2 / 3, 4 / 9, 4 / 9, 0])
+    np.testing.assert_array_equal(curve.at_risk, [6, 6, 5, 3, 2, 1])
+    assert curve.median() == 3
+
+
+def test_grouped_curves_match_reference(episodes):
+    curves = grouped_kaplan_meier(episodes['duration_days'], episodes['resolved'], episodes['route_category'])
+    assert sorted(curves) == ['injectable', 'oral', 'topical']
+    for group, rows in episodes.groupby('route_category'):
+        times, survival, at_risk, deaths, censored, lower, upper = reference_km(
+            rows['duration_days'].tolist(), rows['resolved'].tolist())
+        curve = curves[group]
+        np.testing.assert_array_equal(curve.times, times)
+        np.testing.assert_allclose(curve.survival, survival, rtol=1e-12, atol=1e-12)
+        np.testing.assert_array_equal(curve.at_risk, at_risk)
+        np.testing.assert_array_equal(curve.events, deaths)
+        np.testing.assert_array_equal(curve.censored, censored)
+        np.testing.assert_allclose(curve.ci_lower, lower, rtol=1e-10, atol=1e-12)
+        np.testing.assert_allclose(curve.ci_upper, upper, rtol=1e-10, atol=1e-12)
+
+
+def test_logrank_matches_reference(episodes):
+    statistic, dof, p_value = logrank_test(episodes['duration_days'], episodes['resolved'],
+                                           episodes['route_category'])
+    expected = reference_logrank(episodes['duration_days'].tolist(), episodes['resolved'].tolist(),
+                                 episodes['route_category'].tolist())
+    assert statistic == pytest.approx(expected, rel=1e-9)
+    assert dof == 2
+    # Two degrees of freedom: the chi-square tail is exp(-x / 2)
+    assert p_value == pytest.approx(math.exp(-expected / 2), rel=1e-9)
+
+
+def test_logrank_two_groups_p_value(episodes):
+    two = episodes[episodes['route_category'] != 'topical']
+    statistic, dof, p_value = logrank_test(two['duration_days'], two['resolved'], two['route_category'])
+    assert statistic == pytest.approx(reference_logrank(two['duration_days'].tolist(), two['resolved'].tolist(),
+                                                        two['route_category'].tolist()), rel=1e-9)
+    assert dof == 1
+    assert p_value == pytest.approx(math.erfc(math.sqrt(statistic / 2)), rel=1e-9)
+
+
+@pytest.mark.parametrize('statistic, dof', [(3.841459, 1), (5.991465, 2), (7.814728, 3), (9.487729, 4)])
+def test_chi2_critical_values(statistic, dof):
+    assert _chi2_sf(statistic, dof) == pytest.approx(0.05, abs=1e-6)
@@ -0,0 +1,57 @@
+"""Row-wise and columnar OpenFDAETL.transform_data must build identical staging frames"""
+
+import random
+
+import pandas as pd
+import pytest
+
+from etl.fetch_fda_data import OpenFDAETL
+
+UPDATE_TYPES = ['New', 'Revised', 'Reverified', ' revised ']
+STATUSES = ['Current', 'Resolved', 'To Be Discontinued', 'current ', 'Unknown']
+
+
+def make_records(n: int, seed: int = 0):
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        record = {
+            'generic_name': f'Drug {i % 150}',
+            'company_name': f'Company {i % 12}',
+            'presentation': f'{i % 40} mg vial (NDC {i:05d}-001-01)',
+            'update_type': rng.choice(UPDATE_TYPES),
+            'update_date': f'{rng.randint(1, 12):02d}/{rng.randint(1, 28):02d}/2024',
+            'availability': rng.choice(['Available', 'Backordered', None]),
+            'related_info': 'Check wholesaler for inventory.',
+            'therapeutic_category': [rng.choice(['Oncology', 'Anesthesia', 'Neurology'])],
+            'status': rng.choice(STATUSES),
+            'change_date': '01/02/2024',
+            'package_ndc': f'{i:05d}-001-01',
+        }
+        if i % 3 == 0:
+            record['reason_for_shortage'] = 'Demand increase for the drug'
+        if i % 7 == 0:
+            del record['package_ndc']
+        records.append(record)
+    # Exact duplicates must map to the same content id
+    records.extend(rng.sample(records, n // 20))
+    return records
+
+
+@pytest.fixture
+def etl(tmp_path):
+    return OpenFDAETL(state_dir=str(tmp_path / 'state'), cache_dir=str(tmp_path / 'cache'))
+
+
+def test_columnar_matches_row_wise(etl):
+    raw = make_records(2000)
+    rows = etl.transform_data(raw, columnar=False).drop(columns='created_at').astype(object)
+    cols = etl.transform_data(raw, columnar=True).drop(columns='created_at').astype(object)
+
+    pd.testing.assert_frame_equal(rows.where(rows.notna(), None), cols.where(cols.notna(), None))
+
+
+def test_duplicates_share_content_id(etl):
+    cols = etl.transform_data(make_records(2000), columnar=True)
+    keys = cols.drop_duplicates(['generic_name', 'company_name', 'presentation', 'update_date', 'ndc'])
+    assert cols['id'].nunique() == len(keys)